@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+
+
+# Lightweight latency and token instrumentation for agents, cheap enough to leave on in
+# production (explore_event_stream.py dumps every astream_events v2 event instead).
+# Records into fixed-bucket histograms:
+#   agent_turn_seconds                         one whole invoke/stream call
+#   agent_node_seconds{node}                   wall time of each graph node
+#   agent_tool_seconds{tool}                   wall time of each tool call
+#   agent_model_seconds{model}                 wall time of each model call
+#   agent_model_ttft_seconds{model}            time to first token of streamed model calls
+#   agent_model_input_tokens{model}            input tokens of each model call
+#   agent_model_output_tokens{model}           output tokens of each model call
+#   agent_checkpoint_write_seconds{op}         checkpointer put / put_writes time
+# Sampling is decided once per turn in metrics.config(): an unsampled turn runs with no
+# callback attached at all, so it costs one random() call. A sampled turn is also flagged
+# in its configurable, so the instrumented checkpointer only times the writes of sampled
+# turns and passes the others straight through.
+#
+# Usage:
+#   metrics = AgentMetrics(sample_rate=0.1)
+#   agent = create_agent(model=..., checkpointer=metrics.instrument(InMemorySaver()))
+#   async for chunk in agent.astream(input, metrics.config({"configurable": {"thread_id": "1"}})):
+#       ...
+#   metrics.write_prometheus("metrics/agent.prom")   # node_exporter textfile collector
+#   metrics.write_jsonl("metrics/agent.jsonl")
+
+SECONDS_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+)
+TOKEN_BUCKETS = tuple(2**i for i in range(4, 18))
+
+# metric name -> (label name, buckets, help)
+METRICS = {
+    "agent_turn_seconds": (None, SECONDS_BUCKETS, "Wall time of one agent turn."),
+    "agent_node_seconds": ("node", SECONDS_BUCKETS, "Wall time of one graph node run."),
+    "agent_tool_seconds": ("tool", SECONDS_BUCKETS, "Wall time of one tool call."),
+    "agent_model_seconds": ("model", SECONDS_BUCKETS, "Wall time of one model call."),
+    "agent_model_ttft_seconds": ("model", SECONDS_BUCKETS, "Time to first token of one streamed model call."),
+    "agent_model_input_tokens": ("model", TOKEN_BUCKETS, "Input tokens of one model call."),
+    "agent_model_output_tokens": ("model", TOKEN_BUCKETS, "Output tokens of one model call."),
+    "agent_checkpoint_write_seconds": ("op", SECONDS_BUCKETS, "Checkpointer write time."),
+}
+
+
+@dataclass
+class HistogramStats:
+    count: int
+    total: float
+    p50: float
+    p99: float
+
+
+class Histogram:
+    """Fixed-bucket histogram. The bucket counts are allocated once, observe() only increments."""
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        # one count per bound, plus the +Inf bucket
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket, like Prometheus."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def stats(self) -> HistogramStats:
+        return HistogramStats(self.count, self.total, self.quantile(0.5), self.quantile(0.99))
+
+
+class AgentMetrics(BaseCallbackHandler):
+    """Callback handler that records per-node, per-tool and per-model latency into histograms.
+
+    Args:
+        sample_rate: Fraction of turns that are recorded, from 0 (off) to 1 (every turn).
+        sampled_key: Configurable key that marks a sampled turn for TimedSaver. Keys
+            starting with "__" are not copied into checkpoint metadata.
+    """
+
+    # Run the handler on the caller's thread. Otherwise, under astream, langchain hands
+    # every sync callback to a thread pool.
+    run_inline = True
+
+    def __init__(self, sample_rate: float = 1.0, *, sampled_key: str = "__agent_metrics_sampled__") -> None:
+        self.sample_rate = sample_rate
+        self.sampled_key = sampled_key
+        # (metric name, label value) -> histogram
+        self.histograms: dict[tuple[str, str | None], Histogram] = {}
+        # run ID -> (metric name, label value, start time) of the runs in progress
+        self.runs: dict[UUID, tuple[str, str | None, float]] = {}
+        # run ID of a model call -> whether its first token has been seen
+        self.first_token: dict[UUID, bool] = {}
+        self.sampled_turns = 0
+        self.skipped_turns = 0
+        self.lock = threading.Lock()
+
+    # ---------------------------------------------------------------- sampling
+
+    def config(self, config: RunnableConfig | None = None) -> RunnableConfig:
+        """Return config with this handler attached and the sampled flag set if the turn is sampled."""
+        config = dict(config or {})
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            self.skipped_turns += 1
+            return config
+        self.sampled_turns += 1
+        config["callbacks"] = [*(config.get("callbacks") or []), self]
+        config["configurable"] = {**(config.get("configurable") or {}), self.sampled_key: True}
+        return config
+
+    def instrument(self, saver: BaseCheckpointSaver) -> BaseCheckpointSaver:
+        """Wrap a checkpointer so the writes of sampled turns are recorded in agent_checkpoint_write_seconds."""
+        return TimedSaver(saver, self)
+
+    # ---------------------------------------------------------------- recording
+
+    def observe(self, name: str, label: str | None, value: float) -> None:
+        key = (name, label)
+        with self.lock:
+            if (histogram := self.histograms.get(key)) is None:
+                histogram = self.histograms[key] = Histogram(METRICS[name][1])
+            histogram.observe(value)
+
+    def _start(self, run_id: UUID, name: str, label: str | None) -> None:
+        self.runs[run_id] = (name, label, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> None:
+        if (run := self.runs.pop(run_id, None)) is not None:
+            self.observe(run[0], run[1], time.perf_counter() - run[2])
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        if parent_run_id is None:
+            self._start(run_id, "agent_turn_seconds", None)
+        elif metadata and (node := metadata.get("langgraph_node")) and kwargs.get("name") == node:
+            self._start(run_id, "agent_node_seconds", node)
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._start(run_id, "agent_tool_seconds", (serialized or {}).get("name") or kwargs.get("name"))
+
+    def on_tool_end(self, output, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name")
+        self._start(run_id, "agent_model_seconds", model)
+        self.first_token[run_id] = False
+
+    def on_llm_new_token(self, token, *, chunk=None, run_id, parent_run_id=None, **kwargs):
+        if self.first_token.get(run_id) is False and (run := self.runs.get(run_id)) is not None:
+            self.first_token[run_id] = True
+            self.observe("agent_model_ttft_seconds", run[1], time.perf_counter() - run[2])
+
+    def on_llm_end(self, response, *, run_id, parent_run_id=None, **kwargs):
+        self.first_token.pop(run_id, None)
+        run = self.runs.get(run_id)
+        self._end(run_id)
+        if run is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.observe("agent_model_input_tokens", run[1], usage.get("input_tokens", 0))
+                    self.observe("agent_model_output_tokens", run[1], usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self.first_token.pop(run_id, None)
+        self._end(run_id)
+
+    # ---------------------------------------------------------------- export
+
+    def stats(self) -> dict[str, HistogramStats]:
+        """Return a snapshot of every histogram, keyed like `agent_node_seconds{node="model"}`."""
+        with self.lock:
+            return {_series(name, label): histogram.stats() for (name, label), histogram in self.histograms.items()}
+
+    def to_prometheus(self) -> str:
+        """Render the histograms in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, (label_name, _, help) in METRICS.items():
+                series = sorted(
+                    ((label, histogram) for (metric, label), histogram in self.histograms.items() if metric == name),
+                    key=lambda item: item[0] or "",
+                )
+                if not series:
+                    continue
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} histogram")
+                for label, histogram in series:
+                    labels = f'{label_name}="{_escape(label)}",' if label_name else ""
+                    cumulative = 0
+                    for bound, count in zip((*histogram.bounds, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+                    labels = f"{{{labels.rstrip(',')}}}" if labels else ""
+                    lines.append(f"{name}_sum{labels} {histogram.total}")
+                    lines.append(f"{name}_count{labels} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """Atomically replace a .prom file, for the node_exporter textfile collector."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def write_jsonl(self, path: str | Path) -> None:
+        """Append one line with the current stats of every histogram."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "timestamp": time.time(),
+            "sampled_turns": self.sampled_turns,
+            "skipped_turns": self.skipped_turns,
+            "metrics": {series: vars(stats) for series, stats in self.stats().items()},
+        }
+        with path.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+class TimedSaver(BaseCheckpointSaver):
+    """Checkpointer wrapper that records the write time of sampled turns into AgentMetrics.
+
+    Args:
+        saver: The checkpointer to wrap.
+        metrics: Where to record agent_checkpoint_write_seconds.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, metrics: AgentMetrics) -> None:
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.metrics = metrics
+
+    @property
+    def config_specs(self) -> list:
+        return self.saver.config_specs
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.saver.get_next_version(current, channel)
+
+    def _sampled(self, config: RunnableConfig) -> bool:
+        return bool(config.get("configurable", {}).get(self.metrics.sampled_key))
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.saver.get_tuple(config)
+
+    def list(self, config: RunnableConfig | None, **kwargs: Any) -> Iterator[CheckpointTuple]:
+        return self.saver.list(config, **kwargs)
+
+    def put(
+        self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        if not self._sampled(config):
+            return self.saver.put(config, checkpoint, metadata, new_versions)
+        start = time.perf_counter()
+        try:
+            return self.saver.put(config, checkpoint, metadata, new_versions)
+        finally:
+            self.metrics.observe("agent_checkpoint_write_seconds", "put", time.perf_counter() - start)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if not self._sampled(config):
+            return self.saver.put_writes(config, writes, task_id, task_path)
+        start = time.perf_counter()
+        try:
+            self.saver.put_writes(config, writes, task_id, task_path)
+        finally:
+            self.metrics.observe("agent_checkpoint_write_seconds", "put_writes", time.perf_counter() - start)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await self.saver.aget_tuple(config)
+
+    async def alist(self, config: RunnableConfig | None, **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        async for item in self.saver.alist(config, **kwargs):
+            yield item
+
+    async def aput(
+        self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        if not self._sampled(config):
+            return await self.saver.aput(config, checkpoint, metadata, new_versions)
+        start = time.perf_counter()
+        try:
+            return await self.saver.aput(config, checkpoint, metadata, new_versions)
+        finally:
+            self.metrics.observe("agent_checkpoint_write_seconds", "put", time.perf_counter() - start)
+
+    async def aput_writes(
+        self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = ""
+    ) -> None:
+        if not self._sampled(config):
+            return await self.saver.aput_writes(config, writes, task_id, task_path)
+        start = time.perf_counter()
+        try:
+            await self.saver.aput_writes(config, writes, task_id, task_path)
+        finally:
+            self.metrics.observe("agent_checkpoint_write_seconds", "put_writes", time.perf_counter() - start)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.saver.adelete_thread(thread_id)
+
+
+def _series(name: str, label: str | None) -> str:
+    label_name = METRICS[name][0]
+    return f'{name}{{{label_name}="{label}"}}' if label_name else name
+
+
+def _escape(value: str | None) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
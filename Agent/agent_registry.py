@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+from langchain.agents import create_agent
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+
+
+# Registry of compiled agents, so a new conversation or agent variant never pays for a
+# graph compile or a TLS handshake. The scripts call create_agent(model="gpt-4o-mini", ...)
+# for every agent, which builds a new chat model client and compiles a new graph each time.
+#   - agent(...) compiles each configuration (model, tools, middleware, checkpointer,
+#     system prompt, ...) once, keyed by a hash of the configuration, and returns the same
+#     compiled graph afterwards. Conversations are then just new thread_ids.
+#   - model(...) creates one chat model per model spec, and every model of a provider
+#     shares one pooled HTTP client (sync and async).
+#   - awarm() opens keep-alive connections to every provider ahead of the first turn.
+# Objects in a configuration (tools, middleware, checkpointers, model instances) are keyed
+# by identity, strings and numbers by value.
+#
+# Usage:
+#   registry = AgentRegistry()
+#   agent = registry.agent(model="gpt-4o-mini", tools=[get_weather], checkpointer=checkpointer)
+#   await registry.awarm()
+#   same = registry.agent(model="gpt-4o-mini", tools=[get_weather], checkpointer=checkpointer)  # cached
+#   print(registry.stats())
+
+logger = logging.getLogger(__name__)
+
+# provider -> (base URL environment variable, default base URL) for the providers whose
+# chat model accepts http_client / http_async_client
+PROVIDER_BASE_URLS = {
+    "openai": ("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+}
+
+
+@dataclass
+class RegistryStats:
+    agents: int = 0
+    models: int = 0
+    hits: int = 0
+    misses: int = 0
+    compile_seconds: float = 0.0
+    warmed_connections: int = 0
+
+
+def model_provider(spec: str) -> str | None:
+    """Provider of a model spec like "openai:gpt-4o-mini" or "gpt-4o-mini"."""
+    if ":" in spec:
+        return spec.split(":", 1)[0]
+    if spec.startswith(("gpt-", "o1", "o3", "o4", "chatgpt")):
+        return "openai"
+    if spec.startswith("claude"):
+        return "anthropic"
+    return None
+
+
+def _fingerprint(value: Any) -> str:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_fingerprint(item) for item in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{key!r}:{_fingerprint(value[key])}" for key in sorted(value)) + "}"
+    # Tools, middleware, checkpointers and model instances: the object itself.
+    return f"{type(value).__qualname__}@{id(value):x}"
+
+
+def config_key(**config: Any) -> str:
+    """Hash of an agent configuration."""
+    return hashlib.sha256(_fingerprint(config).encode()).hexdigest()[:16]
+
+
+class AgentRegistry:
+    """Compiles each agent configuration once and shares model clients across agents.
+
+    Args:
+        max_connections: Size of the HTTP connection pool of each provider.
+        max_keepalive_connections: Idle connections kept open in each pool.
+        timeout_seconds: Request timeout of the pooled HTTP clients.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        timeout_seconds: float = 600,
+    ) -> None:
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.timeout = httpx.Timeout(timeout_seconds, connect=5.0)
+        # provider -> (sync client, async client, base URL)
+        self.clients: dict[str, tuple[httpx.Client, httpx.AsyncClient, str]] = {}
+        # model key -> chat model
+        self.models: dict[str, BaseChatModel] = {}
+        # config key -> compiled agent
+        self.agents: dict[str, Any] = {}
+        self.lock = threading.RLock()
+        self._stats = RegistryStats()
+
+    def stats(self) -> RegistryStats:
+        """Return a snapshot of the registry counters."""
+        with self.lock:
+            return RegistryStats(**{**vars(self._stats), "agents": len(self.agents), "models": len(self.models)})
+
+    # ---------------------------------------------------------------- models
+
+    def _provider_clients(self, provider: str) -> tuple[httpx.Client, httpx.AsyncClient, str] | None:
+        if provider not in PROVIDER_BASE_URLS:
+            return None
+        if (clients := self.clients.get(provider)) is None:
+            env, default = PROVIDER_BASE_URLS[provider]
+            base_url = os.getenv(env) or default
+            clients = self.clients[provider] = (
+                httpx.Client(limits=self.limits, timeout=self.timeout, follow_redirects=True),
+                httpx.AsyncClient(limits=self.limits, timeout=self.timeout, follow_redirects=True),
+                base_url,
+            )
+        return clients
+
+    def model(self, spec: str | BaseChatModel, **kwargs: Any) -> BaseChatModel:
+        """Return the shared chat model for a spec, creating it on first use."""
+        if isinstance(spec, BaseChatModel):
+            return spec
+        key = config_key(spec=spec, **kwargs)
+        with self.lock:
+            if (model := self.models.get(key)) is None:
+                clients = self._provider_clients(model_provider(spec) or "")
+                if clients is not None:
+                    kwargs = {"http_client": clients[0], "http_async_client": clients[1], **kwargs}
+                model = self.models[key] = init_chat_model(spec, **kwargs)
+            return model
+
+    # ---------------------------------------------------------------- agents
+
+    def agent(
+        self,
+        *,
+        model: str | BaseChatModel,
+        tools: Sequence[Any] = (),
+        middleware: Sequence[Any] = (),
+        checkpointer: Any = None,
+        system_prompt: str | None = None,
+        model_kwargs: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Return the compiled agent of a configuration, compiling it on first use.
+
+        Takes the arguments of create_agent; model_kwargs are passed to init_chat_model
+        when model is a spec string.
+        """
+        key = config_key(
+            model=model,
+            tools=list(tools),
+            middleware=list(middleware),
+            checkpointer=checkpointer,
+            system_prompt=system_prompt,
+            model_kwargs=model_kwargs or {},
+            **kwargs,
+        )
+        with self.lock:
+            if (agent := self.agents.get(key)) is not None:
+                self._stats.hits += 1
+                return agent
+            self._stats.misses += 1
+            start = time.perf_counter()
+            agent = self.agents[key] = create_agent(
+                model=self.model(model, **(model_kwargs or {})),
+                tools=list(tools),
+                middleware=list(middleware),
+                checkpointer=checkpointer,
+                system_prompt=system_prompt,
+                **kwargs,
+            )
+            self._stats.compile_seconds += time.perf_counter() - start
+            return agent
+
+    # ---------------------------------------------------------------- connections
+
+    async def awarm(self, connections: int = 2) -> int:
+        """Open keep-alive connections to every provider in use. Returns how many opened.
+
+        Any HTTP response, even 401 or 404, leaves a connection with a finished TLS
+        handshake in the pool.
+        """
+
+        async def open_one(client: httpx.AsyncClient, base_url: str) -> bool:
+            try:
+                await client.get(f"{base_url}/models")
+                return True
+            except httpx.HTTPError as e:
+                logger.info("Could not warm %s: %s", base_url, e)
+                return False
+
+        with self.lock:
+            targets = [(clients[1], clients[2]) for clients in self.clients.values()]
+        # Concurrent requests, so the pool opens several connections instead of reusing one.
+        results = await asyncio.gather(
+            *(open_one(client, base_url) for client, base_url in targets for _ in range(connections))
+        )
+        with self.lock:
+            self._stats.warmed_connections += sum(results)
+        return sum(results)
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP clients and forget the models and agents bound to them.
+
+        The registry stays usable: the next model() or agent() call builds new clients.
+        """
+        with self.lock:
+            clients = list(self.clients.values())
+            self.clients.clear()
+            self.models.clear()
+            self.agents.clear()
+        for client, async_client, _ in clients:
+            client.close()
+            await async_client.aclose()
@@ -3,8 +3,13 @@ from langchain.agents import create_agent
 from langchain_core.tools import tool
 from datetime import datetime
 from langchain_core.messages import AIMessageChunk
-from IPython.display import Image
+from pathlib import Path
 import asyncio
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.hedged_model import HedgedModelMiddleware
+from Agent.tool_executor import ToolExecutor, ToolLimits
 
 
 @tool
@@ -26,28 +31,49 @@ def get_news(topic: str = "technology") -> str:
 
 load_dotenv()
 
+# Tool calls of one step run concurrently on a bounded pool. A slow tool is cut off by its
+# timeout instead of stalling the turn, weather and news are memoized for a few minutes,
+# and per-tool latency is printed at the end.
+tool_executor = ToolExecutor(
+    max_workers=8,
+    default=ToolLimits(timeout_seconds=10),
+    limits={
+        "get_weather": ToolLimits(timeout_seconds=5, cache_ttl_seconds=600),
+        "get_news": ToolLimits(timeout_seconds=5, max_concurrency=2, cache_ttl_seconds=300),
+    },
+)
+
+# A model call still silent after its recent p95 is sent again and the first answer wins;
+# while gpt-4o-mini's p95 to first token is over 4 s, calls go to gpt-4.1-nano instead.
+hedging = HedgedModelMiddleware(fallback="gpt-4.1-nano", slo_seconds=4)
+
 agent = create_agent(
     model="gpt-4o-mini",
-    tools=[get_current_time, get_weather, get_news],
+    tools=tool_executor.wrap([get_current_time, get_weather, get_news]),
+    middleware=[hedging, tool_executor],
     debug=False,
     system_prompt="you are a helpful assistant that can use tools to help the user. Please use to the tools first if the tools can help answer the user questions."
 )
 
-# This is just to show the graph of the agent.
+# This is just to show the graph of the agent: uv run Agent/agent_tools.py --graph
 # This agent has tools, so it will show the tools in the graph.
-mermaid = agent.get_graph(xray=True).draw_mermaid_png()
-with open("agent_graph_with_tools.png", "wb") as f:
-    f.write(mermaid)
+if "--graph" in sys.argv[1:]:
+    from Agent.graph_render import render_graph
+    render_graph(agent, "agent_graph_with_tools.png")
 
 
 async def stream_agent():
-    input = {"messages": [{"role": "user", "content": "What is the current time in Sydney?"}]}
+    input = {"messages": [{"role": "user", "content": "What is the current time and the weather in Sydney, and any technology news?"}]}
     async for result in agent.astream(input, stream_mode="messages"):
         message = result[0]
         if isinstance(message, AIMessageChunk):
             print(result[0].content, end="", flush=True)
 
     print()  # Add a newline at the end
+    for name, stats in tool_executor.stats().items():
+        print(f"{name}: calls={stats.calls} cache_hits={stats.cache_hits} timeouts={stats.timeouts} p50={stats.latency.p50 * 1000:.1f} ms")
+    stats = hedging.router.stats()
+    print(f"model: calls={stats.calls} hedged={stats.hedged} hedge_wins={stats.hedge_wins} routed_to_fallback={stats.routed_to_fallback}")
 
 
 
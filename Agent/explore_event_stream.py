@@ -2,6 +2,12 @@ import os
 import asyncio
 from dotenv import load_dotenv
 from langchain.agents import create_agent
+from langgraph.checkpoint.memory import InMemorySaver
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_metrics import AgentMetrics
 
 
 load_dotenv()
@@ -120,15 +126,35 @@ async def explore_all_stream_modes():
         except Exception as e:
             print(f"Error with stream_mode='{mode}': {e}")
 
+async def explore_latency_breakdown():
+    """Show where a turn's time goes, without paying for astream_events."""
+    metrics = AgentMetrics(sample_rate=1.0)
+    timed_agent = create_agent(model="gpt-4o-mini", tools=[], checkpointer=metrics.instrument(InMemorySaver()))
+    input = {"messages": [{"role": "user", "content": "Write me a poem about a cat?"}]}
+
+    config = metrics.config({"configurable": {"thread_id": "1"}})
+    async for message, _ in timed_agent.astream(input, config, stream_mode="messages"):
+        if message.content:
+            print(message.content, end="", flush=True)
+    print("\n")
+
+    for series, stats in metrics.stats().items():
+        print(f"{series}: count={stats.count} total={stats.total:.4f} p50~{stats.p50:.4f}")
+
+    metrics.write_prometheus("metrics/agent.prom")
+    metrics.write_jsonl("metrics/agent.jsonl")
+    print("\nWrote metrics/agent.prom and metrics/agent.jsonl")
+
 # Run the async streaming function
 if __name__ == "__main__":
     print("Choose an exploration mode:\n")
     print("1. Token-by-token streaming (astream_events)")
     print("2. Explore astream_events structure")
     print("3. Explore astream with 'messages' mode")
-    print("4. Explore all astream stream_modes\n")
+    print("4. Explore all astream stream_modes")
+    print("5. Latency breakdown per node, tool and model (AgentMetrics)\n")
 
-    choice = input("Enter choice (1-4, or press Enter for #1): ").strip() or "1"
+    choice = input("Enter choice (1-5, or press Enter for #1): ").strip() or "1"
 
     if choice == "1":
         asyncio.run(stream_agent_response())
@@ -138,6 +164,8 @@ if __name__ == "__main__":
         asyncio.run(explore_astream_structure())
     elif choice == "4":
         asyncio.run(explore_all_stream_modes())
+    elif choice == "5":
+        asyncio.run(explore_latency_breakdown())
     else:
         print("Invalid choice. Running option 1 by default.")
         asyncio.run(stream_agent_response())
\ No newline at end of file
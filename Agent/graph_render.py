@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+
+# On-demand, cached, offline-first rendering of agent graphs.
+# draw_mermaid_png() sends the graph to the mermaid.ink web service on every run, and the
+# scripts imported IPython just to show it, so startup was slow and failed offline.
+# render_graph() keys the picture by a hash of the graph topology and caches it in
+# .graph_cache/, so a graph is rendered once. It always writes the Mermaid (.mmd) and DOT
+# (.dot) text, which need nothing to produce, then renders the PNG with the first renderer
+# available:
+#   1. Graphviz `dot`            (apt install graphviz / brew install graphviz)
+#   2. mermaid-cli `mmdc`        (npm install -g @mermaid-js/mermaid-cli)
+#   3. the mermaid.ink service   (only if allow_remote=True, and failures are ignored)
+# Without any of them you get the .mmd file, which https://mermaid.live or the VS Code
+# Mermaid preview can show.
+#
+# Usage:
+#   from Agent.graph_render import display_graph, render_graph
+#   path = render_graph(agent, "agent_graph.png")   # agent_graph.png, or agent_graph.mmd offline
+#   display_graph(path)                             # shows it inline in Jupyter, no-op elsewhere
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".graph_cache"
+RENDER_TIMEOUT_SECONDS = 30
+
+
+def graph_key(graph: Any) -> str:
+    """Hash of the nodes and edges of a langchain_core Graph."""
+    topology = {
+        "nodes": sorted([node.id, node.name, node.metadata or {}] for node in graph.nodes.values()),
+        "edges": sorted(
+            [edge.source, edge.target, edge.conditional, None if edge.data is None else str(edge.data)]
+            for edge in graph.edges
+        ),
+    }
+    return hashlib.sha256(json.dumps(topology, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def to_dot(graph: Any) -> str:
+    """Graphviz DOT text of a graph, drawn like draw_mermaid (conditional edges dashed)."""
+    lines = ["digraph agent {", '  node [shape=box, style="rounded,filled", fillcolor="#f2f0ff", fontname="Helvetica"];']
+    for node in graph.nodes.values():
+        if node.id in ("__start__", "__end__"):
+            lines.append(f'  "{node.id}" [label="{node.name}", shape=oval, fillcolor="#bfb6fc"];')
+        else:
+            lines.append(f'  "{node.id}" [label="{node.name}"];')
+    for edge in graph.edges:
+        attributes = [f'label="{edge.data}"'] if edge.data is not None else []
+        if edge.conditional:
+            attributes.append("style=dashed")
+        lines.append(f'  "{edge.source}" -> "{edge.target}" [{", ".join(attributes)}];')
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _render_dot(dot: str) -> bytes | None:
+    if shutil.which("dot") is None:
+        return None
+    result = subprocess.run(["dot", "-Tpng"], input=dot.encode(), capture_output=True, timeout=RENDER_TIMEOUT_SECONDS)
+    return result.stdout if result.returncode == 0 else None
+
+
+def _render_mmdc(mermaid: str) -> bytes | None:
+    if shutil.which("mmdc") is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        source, target = Path(tmp) / "graph.mmd", Path(tmp) / "graph.png"
+        source.write_text(mermaid)
+        result = subprocess.run(
+            ["mmdc", "-i", str(source), "-o", str(target), "-b", "white"],
+            capture_output=True,
+            timeout=RENDER_TIMEOUT_SECONDS,
+        )
+        return target.read_bytes() if result.returncode == 0 and target.exists() else None
+
+
+def _render_remote(graph: Any) -> bytes | None:
+    try:
+        return graph.draw_mermaid_png(max_retries=1)
+    except Exception as e:
+        logger.info("mermaid.ink rendering failed: %s", e)
+        return None
+
+
+def render_graph(
+    agent: Any,
+    output: str | Path,
+    *,
+    xray: bool = True,
+    cache_dir: str | Path = CACHE_DIR,
+    allow_remote: bool = True,
+) -> Path:
+    """Render the agent's graph to a PNG, from the cache when its topology was seen before.
+
+    Returns the path written: output itself, or output with a .mmd suffix when no
+    renderer is available.
+    """
+    graph = agent.get_graph(xray=xray)
+    key = graph_key(graph)
+    output = Path(output)
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cached = cache_dir / f"{key}.png"
+
+    if not cached.exists():
+        # mermaid.ink is only tried the first time a topology is seen; delete the cache to retry it.
+        first_time = not (cache_dir / f"{key}.mmd").exists()
+        mermaid = graph.draw_mermaid()
+        dot = to_dot(graph)
+        (cache_dir / f"{key}.mmd").write_text(mermaid)
+        (cache_dir / f"{key}.dot").write_text(dot)
+        png = _render_dot(dot) or _render_mmdc(mermaid) or (_render_remote(graph) if allow_remote and first_time else None)
+        if png is None:
+            text = output.with_suffix(".mmd")
+            text.write_text(mermaid)
+            logger.warning("No graph renderer available, wrote %s (install Graphviz or mermaid-cli for a PNG)", text)
+            return text
+        cached.write_bytes(png)
+
+    shutil.copyfile(cached, output)
+    return output
+
+
+def display_graph(path: str | Path) -> None:
+    """Show a rendered graph inline when running under IPython/Jupyter; no-op otherwise."""
+    # IPython takes about half a second to import, so only touch it if it is already running.
+    if "IPython" not in sys.modules:
+        return
+    from IPython import get_ipython
+
+    if get_ipython() is None:
+        return
+    from IPython.display import Image, Markdown, display
+
+    path = Path(path)
+    if path.suffix == ".png":
+        display(Image(filename=str(path)))
+    else:
+        display(Markdown(f"```mermaid\n{path.read_text()}\n```"))
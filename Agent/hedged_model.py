@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.chat_models import init_chat_model
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from Agent.agent_metrics import SECONDS_BUCKETS, Histogram, HistogramStats
+
+
+# Hedged requests and latency-aware routing for chat models, against the occasional slow
+# provider response that dominates p99 turn latency.
+#   - Hedging: a call that has not answered after the recent p95 latency of its model is
+#     sent a second time; whichever answers first is used and the other is cancelled. Only
+#     the slowest ~5% of calls are duplicated, so the extra load is small, and a hedge
+#     budget (max_hedge_ratio) keeps it small when the whole provider slows down. The delay
+#     is capped at hedge_multiplier x the recent median: after a slow spell the p95 is the
+#     stall itself, and would otherwise stop hedging until the spell leaves the window.
+#   - Routing: when the recent p95 of the primary model breaches slo_seconds, calls go to
+#     the fallback model for cooldown_seconds. The primary then starts over with an empty
+#     window, so one bad minute does not keep it out for good.
+# Streamed calls are timed to the first chunk, and hedged on it: the winner is the first
+# stream to produce a chunk, and only its chunks are passed on, so streaming and tool call
+# chunks work as with the wrapped model. Other calls are timed and hedged on the whole
+# response. Sync calls are routed but not hedged (no event loop to race the two on).
+#
+# Usage:
+#   hedging = HedgedModelMiddleware(fallback="gpt-4.1-nano", slo_seconds=4)
+#   agent = create_agent(model="gpt-4o-mini", tools=[...], middleware=[hedging])
+#   print(hedging.router.stats())
+#   model = HedgedChatModel(primary=init_chat_model("gpt-4o-mini"), router=HedgeRouter())   # without an agent
+
+PRIMARY, FALLBACK = "primary", "fallback"
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    recovered_errors: int = 0
+    routed_to_fallback: int = 0
+    route_switches: int = 0
+    estimated_seconds_saved: float = 0.0
+    latency: HistogramStats = field(default_factory=lambda: HistogramStats(0, 0.0, 0.0, 0.0))
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.calls if self.calls else 0.0
+
+
+class LatencyWindow:
+    """Latency samples of the last `window_seconds`, at most `size` of them."""
+
+    def __init__(self, size: int, window_seconds: float) -> None:
+        self.samples: deque[tuple[float, float]] = deque(maxlen=size)
+        self.window_seconds = window_seconds
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append((time.monotonic(), seconds))
+
+    def values(self) -> list[float]:
+        cutoff = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return sorted(seconds for _, seconds in self.samples)
+
+    def quantile(self, q: float, min_samples: int) -> float | None:
+        values = self.values()
+        if len(values) < min_samples:
+            return None
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    def expected_excess(self, elapsed: float) -> float:
+        """Mean time still to wait for a call that has taken `elapsed` so far, from the samples above it."""
+        above = [seconds for seconds in self.values() if seconds > elapsed]
+        return sum(above) / len(above) - elapsed if above else 0.0
+
+    def clear(self) -> None:
+        self.samples.clear()
+
+
+class HedgeRouter:
+    """Latency windows, hedge delays and routing decisions, shared by every HedgedChatModel of an agent.
+
+    Args:
+        hedge_quantile: Quantile of recent latency after which a call is hedged.
+        initial_hedge_delay: Hedge delay until min_samples latencies are known.
+        min_hedge_delay: Floor of the hedge delay, so fast models are not hedged on noise.
+        hedge_multiplier: Cap of the hedge delay, as a multiple of the recent median latency.
+        max_hedge_ratio: Hedges allowed per call, on average (a token bucket). 0 turns hedging off.
+        slo_seconds: Recent p95 of the primary above which calls go to the fallback. None never routes.
+        slo_quantile: Quantile compared to slo_seconds.
+        cooldown_seconds: How long calls stay on the fallback.
+        window: Latency samples kept per model and kind of call.
+        window_seconds: Age after which a sample is dropped.
+        min_samples: Samples needed before a window is trusted.
+    """
+
+    def __init__(
+        self,
+        *,
+        hedge_quantile: float = 0.95,
+        initial_hedge_delay: float = 2.0,
+        min_hedge_delay: float = 0.05,
+        hedge_multiplier: float = 3.0,
+        max_hedge_ratio: float = 0.1,
+        slo_seconds: float | None = None,
+        slo_quantile: float = 0.95,
+        cooldown_seconds: float = 60.0,
+        window: int = 100,
+        window_seconds: float = 60.0,
+        min_samples: int = 20,
+    ) -> None:
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.hedge_multiplier = hedge_multiplier
+        self.max_hedge_ratio = max_hedge_ratio
+        self.slo_seconds = slo_seconds
+        self.slo_quantile = slo_quantile
+        self.cooldown_seconds = cooldown_seconds
+        self.window = window
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        # (model role, "first_chunk" | "response") -> recent latencies
+        self.windows: dict[tuple[str, str], LatencyWindow] = {}
+        self.fallback_until = 0.0
+        self.hedge_tokens = 1.0
+        self.histogram = Histogram(SECONDS_BUCKETS)
+        self.lock = threading.Lock()
+        self._stats = HedgeStats()
+
+    def stats(self) -> HedgeStats:
+        """Return a snapshot of the hedging counters and the latency of delivered calls."""
+        with self.lock:
+            return HedgeStats(**{**vars(self._stats), "latency": self.histogram.stats()})
+
+    def _window(self, role: str, kind: str) -> LatencyWindow:
+        if (window := self.windows.get((role, kind))) is None:
+            window = self.windows[(role, kind)] = LatencyWindow(self.window, self.window_seconds)
+        return window
+
+    def route(self, kind: str, has_fallback: bool) -> str:
+        """Pick the model of a new call: the fallback while the primary breaches its SLO."""
+        with self.lock:
+            self._stats.calls += 1
+            self.hedge_tokens = min(10.0, self.hedge_tokens + self.max_hedge_ratio)
+            if not has_fallback or self.slo_seconds is None:
+                return PRIMARY
+            now = time.monotonic()
+            if now < self.fallback_until:
+                self._stats.routed_to_fallback += 1
+                return FALLBACK
+            tail = self._window(PRIMARY, kind).quantile(self.slo_quantile, self.min_samples)
+            if tail is not None and tail > self.slo_seconds:
+                self.fallback_until = now + self.cooldown_seconds
+                self._window(PRIMARY, kind).clear()
+                self._stats.route_switches += 1
+                self._stats.routed_to_fallback += 1
+                return FALLBACK
+            return PRIMARY
+
+    def hedge_delay(self, role: str, kind: str) -> float | None:
+        """Seconds to wait before hedging a call to `role`, or None when the hedge budget is spent."""
+        with self.lock:
+            if self.hedge_tokens < 1:
+                return None
+            window = self._window(role, kind)
+            if (delay := window.quantile(self.hedge_quantile, self.min_samples)) is None:
+                return max(self.min_hedge_delay, self.initial_hedge_delay)
+            median = window.quantile(0.5, self.min_samples)
+            return max(self.min_hedge_delay, min(delay, self.hedge_multiplier * median))
+
+    def start_hedge(self) -> bool:
+        with self.lock:
+            if self.hedge_tokens < 1:
+                return False
+            self.hedge_tokens -= 1
+            self._stats.hedged += 1
+            return True
+
+    def observe(self, role: str, kind: str, seconds: float) -> None:
+        """Record the latency of a call that answered."""
+        with self.lock:
+            self._window(role, kind).observe(seconds)
+            self.histogram.observe(seconds)
+
+    def observe_hedge(self, role: str, kind: str, seconds: float, first_won: bool, first_failed: bool) -> None:
+        """Record the outcome of a hedged call that answered after `seconds`.
+
+        A cancelled first attempt counts as a sample of `seconds`: a lower bound of its
+        latency, which keeps a slow spell visible in the window.
+        """
+        with self.lock:
+            window = self._window(role, kind)
+            self.histogram.observe(seconds)
+            if first_won:
+                window.observe(seconds)
+                return
+            if first_failed:
+                self._stats.recovered_errors += 1
+            else:
+                self._stats.hedge_wins += 1
+                self._stats.estimated_seconds_saved += window.expected_excess(seconds)
+                window.observe(seconds)
+
+
+class _Attempt:
+    """One request of a hedged call: the model's stream, read one chunk ahead."""
+
+    def __init__(self, stream: AsyncIterator[ChatGenerationChunk]) -> None:
+        self.stream = stream
+        self.task: asyncio.Task = asyncio.ensure_future(anext(stream, None))
+
+    async def cancel(self) -> None:
+        self.task.cancel()
+        with contextlib.suppress(BaseException):
+            await self.task
+        with contextlib.suppress(Exception):
+            await self.stream.aclose()
+
+
+class HedgedChatModel(BaseChatModel):
+    """Chat model that hedges slow calls to the wrapped model and routes to a fallback when it breaches its SLO.
+
+    Args:
+        primary: The chat model to wrap.
+        fallback: Model used while the primary breaches the router's SLO. None never routes.
+        router: Latency windows and policy, shared with other HedgedChatModels.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    primary: BaseChatModel
+    fallback: BaseChatModel | None = None
+    router: HedgeRouter
+
+    @property
+    def _llm_type(self) -> str:
+        return f"hedged-{self.primary._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return self.primary._identifying_params
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        # Each model formats the tools its own way; the call passes each its own arguments.
+        bound = {PRIMARY: getattr(self.primary.bind_tools(tools, **kwargs), "kwargs", {})}
+        if self.fallback is not None:
+            bound[FALLBACK] = getattr(self.fallback.bind_tools(tools, **kwargs), "kwargs", {})
+        return self.bind(model_kwargs=bound)
+
+    def _model(self, role: str, kwargs: dict[str, Any]) -> tuple[BaseChatModel, dict[str, Any]]:
+        kwargs = dict(kwargs)
+        bound = kwargs.pop("model_kwargs", {})
+        model = self.fallback if role == FALLBACK else self.primary
+        return model, {**kwargs, **bound.get(role, {})}
+
+    # ---------------------------------------------------------------- sync
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        role = self.router.route("response", self.fallback is not None)
+        model, model_kwargs = self._model(role, kwargs)
+        start = time.perf_counter()
+        result = model._generate(messages, stop=stop, **model_kwargs)
+        self.router.observe(role, "response", time.perf_counter() - start)
+        return result
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        role = self.router.route("first_chunk", self.fallback is not None)
+        model, model_kwargs = self._model(role, kwargs)
+        start = time.perf_counter()
+        first = True
+        for chunk in model._stream(messages, stop=stop, **model_kwargs):
+            if first:
+                self.router.observe(role, "first_chunk", time.perf_counter() - start)
+                first = False
+            yield chunk
+
+    # ---------------------------------------------------------------- async
+
+    async def _race(self, role: str, kind: str, start_attempt: Callable[[], _Attempt]) -> tuple[_Attempt, float]:
+        """Run the call, hedging it after the hedge delay; return the attempt that answered first and its latency."""
+        start = time.perf_counter()
+        first = start_attempt()
+        hedge = None
+        try:
+            delay = self.router.hedge_delay(role, kind)
+            done, _ = await asyncio.wait({first.task}, timeout=delay)
+            if done or not self.router.start_hedge():
+                await first.task
+                self.router.observe(role, kind, time.perf_counter() - start)
+                return first, time.perf_counter() - start
+
+            hedge = start_attempt()
+            pending = {first.task, hedge.task}
+            winner = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # On a tie the first attempt wins; a failed attempt leaves the race to the other.
+                for attempt in (first, hedge):
+                    if attempt.task in done and attempt.task.exception() is None:
+                        winner = attempt
+                        break
+            if winner is None:
+                first.task.result()
+            loser = hedge if winner is first else first
+            await loser.cancel()
+        except BaseException:
+            # Both failed, or the caller was cancelled (tool or turn timeout, disconnect):
+            # no attempt is left running with its stream open.
+            await first.cancel()
+            if hedge is not None:
+                await hedge.cancel()
+            raise
+        seconds = time.perf_counter() - start
+        first_failed = first.task.done() and not first.task.cancelled() and first.task.exception() is not None
+        self.router.observe_hedge(role, kind, seconds, first_won=winner is first, first_failed=first_failed)
+        return winner, seconds
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        role = self.router.route("response", self.fallback is not None)
+        model, model_kwargs = self._model(role, kwargs)
+
+        async def generate() -> AsyncIterator[ChatResult]:
+            yield await model._agenerate(messages, stop=stop, **model_kwargs)
+
+        winner, _ = await self._race(role, "response", lambda: _Attempt(generate()))
+        return winner.task.result()
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        role = self.router.route("first_chunk", self.fallback is not None)
+        model, model_kwargs = self._model(role, kwargs)
+        winner, _ = await self._race(
+            role, "first_chunk", lambda: _Attempt(model._astream(messages, stop=stop, **model_kwargs))
+        )
+        try:
+            if (chunk := winner.task.result()) is None:
+                return
+            yield chunk
+            async for chunk in winner.stream:
+                yield chunk
+        finally:
+            await winner.stream.aclose()
+
+
+class HedgedModelMiddleware(AgentMiddleware):
+    """Hedges slow model calls of an agent and routes them to a fallback model when the primary breaches its SLO.
+
+    Args:
+        fallback: Model name for init_chat_model, or a chat model. None only hedges.
+        max_wrappers: Wrapped models kept, for middleware that picks a model per call; least recently used go first.
+        **router_options: Options of the HedgeRouter, e.g. slo_seconds and hedge_quantile.
+    """
+
+    def __init__(self, fallback: str | BaseChatModel | None = None, *, max_wrappers: int = 32, **router_options: Any) -> None:
+        super().__init__()
+        self.fallback = init_chat_model(fallback) if isinstance(fallback, str) else fallback
+        self.router = HedgeRouter(**router_options)
+        self.max_wrappers = max_wrappers
+        # id(primary model) -> (primary, its wrapper), least recently used first; the primary
+        # is kept so its id is not reused while the entry lives
+        self.wrappers: OrderedDict[int, tuple[BaseChatModel, HedgedChatModel]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _hedged(self, request: ModelRequest) -> ModelRequest:
+        with self.lock:
+            entry = self.wrappers.get(id(request.model))
+            if entry is None or entry[0] is not request.model:
+                entry = (request.model, HedgedChatModel(primary=request.model, fallback=self.fallback, router=self.router))
+                self.wrappers[id(request.model)] = entry
+            self.wrappers.move_to_end(id(request.model))
+            while len(self.wrappers) > self.max_wrappers:
+                self.wrappers.popitem(last=False)
+        return request.override(model=entry[1])
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        return handler(self._hedged(request))
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        return await handler(self._hedged(request))
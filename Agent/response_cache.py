@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManager,
+    AsyncCallbackManagerForLLMRun,
+    CallbackManager,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    message_chunk_to_message,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import ConfigDict
+
+
+# Response cache around a chat model, for traffic that keeps asking the same questions.
+# CachedChatModel wraps any chat model and answers from the cache before calling it:
+#   1. exact tier: a hash of the normalized message list (whitespace collapsed, case
+#      folded, message and tool call IDs dropped) and of the model's parameters and tools;
+#   2. similarity tier (optional): when the conversation so far is identical, the new user
+#      message has the same content words as a cached one (only articles, "please" and
+#      "what" are ignored) and is close enough to it (cosine similarity of hashed words and
+#      word bigrams, top-k over a NumPy matrix), e.g. "What is the capital of France?" and
+#      "what is the capital of France, please". Tense, modals, negations, numbers and operators
+#      always count, so "Who is ..." never answers "Who was ...".
+# Entries expire after ttl_seconds. MemoryCacheBackend evicts least recently used entries;
+# RedisCacheBackend stores them under REDIS_URL, shared by every process, and leaves LRU
+# eviction to Redis (maxmemory-policy allkeys-lru). The similarity index is per process.
+# Cached answers are replayed as a token stream, so astream / stream_mode="messages"
+# clients see the same chunks as for a live answer.
+#
+# Usage:
+#   cache = ResponseCache(MemoryCacheBackend(), similarity_threshold=0.9)
+#   model = CachedChatModel(model=init_chat_model("gpt-4o-mini"), response_cache=cache)
+#   agent = create_agent(model=model, tools=[...])
+#   print(cache.stats())
+
+
+@dataclass
+class ResponseCacheStats:
+    exact_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    upstream_seconds: float = 0.0
+    seconds_saved: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def _message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(block.get("text", "") for block in message.content if isinstance(block, dict))
+
+
+def normalize_messages(messages: Sequence[BaseMessage]) -> list:
+    """Messages reduced to what determines the answer: no IDs, no whitespace or case differences."""
+    normalized = []
+    for message in messages:
+        item = [message.type, normalize_text(_message_text(message))]
+        if isinstance(message, AIMessage) and message.tool_calls:
+            item.append(sorted([call["name"], json.dumps(call["args"], sort_keys=True)] for call in message.tool_calls))
+        normalized.append(item)
+    return normalized
+
+
+def _hash(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+# Only words that never change what is asked are dropped: "What is the capital of France?"
+# and "What's the capital of France" are the same question, but tense ("is"/"was"), modals
+# ("should"/"can"), negations, pronouns, prepositions, numbers and operators ("2+2"/"2*2")
+# all make a different one, so they are kept.
+STOP_WORDS = frozenset("a an the please what whats s".split())
+
+# For recall rather than answering, function words are noise: "What is my favorite food?"
+# should find "The user's favorite food is sushi". Negations are kept.
+FUNCTION_WORDS = frozenset(
+    "a an the is are was were be been am do does did can could would should will shall may might "
+    "i me my we our you your it its he she they them their this that these those of in on at to for "
+    "from by with about as and or so if then than please tell what s whats how who whom which there here".split()
+)
+
+# Words and numbers, plus arithmetic and comparison operators as tokens of their own.
+TOKEN = re.compile(r"\w+|[-+*/^%=<>]")
+
+
+class HashingVectorizer:
+    """Embeds text as hashed content words and word bigrams, L2-normalized. No model, no network.
+
+    Args:
+        dim: Number of hashed features.
+        stop_words: Words left out. FUNCTION_WORDS suits recall of related texts.
+    """
+
+    def __init__(self, dim: int = 1024, stop_words: frozenset[str] = STOP_WORDS) -> None:
+        self.dim = dim
+        self.stop_words = stop_words
+
+    def content_words(self, text: str) -> list[str]:
+        """Tokens of text without stop words (all tokens when only stop words are left)."""
+        words = TOKEN.findall(text.casefold())
+        return [word for word in words if word not in self.stop_words] or words
+
+    def __call__(self, text: str) -> np.ndarray:
+        words = self.content_words(text)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in [*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SimilarityIndex:
+    """Fixed-capacity matrix of vectors searched by dot product; the oldest rows are overwritten.
+
+    Args:
+        dim: Vector size.
+        capacity: Number of rows.
+    """
+
+    def __init__(self, dim: int, capacity: int) -> None:
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        # row -> (context hash, cache key)
+        self.rows: list[tuple[str, str] | None] = [None] * capacity
+        self.next_row = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def add(self, context: str, vector: np.ndarray, key: str) -> None:
+        with self.lock:
+            row = self.next_row
+            self.vectors[row] = vector
+            self.rows[row] = (context, key)
+            self.next_row = (row + 1) % len(self.rows)
+            self.size = min(self.size + 1, len(self.rows))
+
+    def search(self, context: str, vector: np.ndarray, k: int, threshold: float) -> list[tuple[float, str]]:
+        """Keys of the k most similar rows with the same context, above threshold, best first."""
+        with self.lock:
+            if not self.size:
+                return []
+            scores = self.vectors[: self.size] @ vector
+            top = np.argpartition(-scores, min(k, self.size) - 1)[:k] if self.size > k else np.arange(self.size)
+            matches = [
+                (float(scores[row]), self.rows[row][1])
+                for row in top
+                if scores[row] >= threshold and self.rows[row][0] == context
+            ]
+        return sorted(matches, reverse=True)
+
+
+class MemoryCacheBackend:
+    """In-process LRU of cache entries.
+
+    Args:
+        max_entries: Entries kept before the least recently used one is evicted.
+    """
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        # key -> (expires at, entry), least recently used first
+        self.entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, entry: dict, ttl_seconds: float) -> None:
+        with self.lock:
+            self.entries[key] = (time.time() + ttl_seconds, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    async def aget(self, key: str) -> dict | None:
+        return self.get(key)
+
+    async def aset(self, key: str, entry: dict, ttl_seconds: float) -> None:
+        self.set(key, entry, ttl_seconds)
+
+
+class RedisCacheBackend:
+    """Cache entries stored in Redis as JSON strings with a TTL.
+
+    Args:
+        redis_url: Redis connection URL, usually REDIS_URL.
+        prefix: Key prefix of the entries.
+    """
+
+    def __init__(self, redis_url: str, *, prefix: str = "llm_cache:") -> None:
+        import redis
+        import redis.asyncio
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(redis_url)
+        self.async_client = redis.asyncio.Redis.from_url(redis_url)
+
+    def get(self, key: str) -> dict | None:
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, entry: dict, ttl_seconds: float) -> None:
+        self.client.set(self.prefix + key, json.dumps(entry), ex=max(1, int(ttl_seconds)))
+
+    async def aget(self, key: str) -> dict | None:
+        value = await self.async_client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    async def aset(self, key: str, entry: dict, ttl_seconds: float) -> None:
+        await self.async_client.set(self.prefix + key, json.dumps(entry), ex=max(1, int(ttl_seconds)))
+
+    async def aclose(self) -> None:
+        self.client.close()
+        await self.async_client.aclose()
+
+
+class ResponseCache:
+    """Exact and similarity lookups of model answers over a cache backend.
+
+    Args:
+        backend: MemoryCacheBackend or RedisCacheBackend. Defaults to memory.
+        ttl_seconds: How long an answer stays valid.
+        similarity_threshold: Minimum cosine similarity of the last user message for a
+            similarity hit; its content words must also be the same. None turns the
+            similarity tier off.
+        max_similar_entries: Rows of the similarity index.
+        top_k: Candidates checked per similarity lookup.
+    """
+
+    def __init__(
+        self,
+        backend: MemoryCacheBackend | RedisCacheBackend | None = None,
+        *,
+        ttl_seconds: float = 24 * 3600,
+        similarity_threshold: float | None = None,
+        max_similar_entries: int = 10_000,
+        top_k: int = 4,
+        vectorizer: HashingVectorizer | None = None,
+    ) -> None:
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.top_k = top_k
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.index = SimilarityIndex(self.vectorizer.dim, max_similar_entries) if similarity_threshold else None
+        self.lock = threading.Lock()
+        self._stats = ResponseCacheStats()
+
+    def stats(self) -> ResponseCacheStats:
+        """Return a snapshot of the cache counters."""
+        with self.lock:
+            return ResponseCacheStats(**vars(self._stats))
+
+    def keys(self, messages: Sequence[BaseMessage], llm_string: str) -> tuple[str, str | None, np.ndarray | None]:
+        """Return (exact key, similarity context, similarity vector) of a model call."""
+        normalized = normalize_messages(messages)
+        key = _hash(llm_string, normalized)
+        # The similarity tier only covers a new user message on top of an identical conversation.
+        if self.index is None or not messages or not isinstance(messages[-1], HumanMessage):
+            return key, None, None
+        # A similarity hit also needs the same set of content words: the vector only decides
+        # whether a different order or repetition of those words is still the same question.
+        text = normalized[-1][1]
+        context = _hash(llm_string, normalized[:-1], sorted(set(self.vectorizer.content_words(text))))
+        return key, context, self.vectorizer(text)
+
+    def _hit(self, kind: str, entry: dict) -> AIMessage:
+        with self.lock:
+            if kind == "exact":
+                self._stats.exact_hits += 1
+            else:
+                self._stats.similar_hits += 1
+            self._stats.seconds_saved += entry["seconds"]
+        return messages_from_dict([entry["message"]])[0]
+
+    def _miss(self) -> None:
+        with self.lock:
+            self._stats.misses += 1
+
+    def _entry(self, message: AIMessage, seconds: float) -> dict:
+        with self.lock:
+            self._stats.upstream_seconds += seconds
+        message = message.model_copy(update={"id": None, "usage_metadata": None})
+        return {"message": message_to_dict(message), "seconds": seconds}
+
+    def lookup(self, key: str, context: str | None, vector: np.ndarray | None) -> AIMessage | None:
+        if (entry := self.backend.get(key)) is not None:
+            return self._hit("exact", entry)
+        if context is not None:
+            for _, similar_key in self.index.search(context, vector, self.top_k, self.similarity_threshold):
+                if (entry := self.backend.get(similar_key)) is not None:
+                    return self._hit("similar", entry)
+        self._miss()
+        return None
+
+    async def alookup(self, key: str, context: str | None, vector: np.ndarray | None) -> AIMessage | None:
+        if (entry := await self.backend.aget(key)) is not None:
+            return self._hit("exact", entry)
+        if context is not None:
+            for _, similar_key in self.index.search(context, vector, self.top_k, self.similarity_threshold):
+                if (entry := await self.backend.aget(similar_key)) is not None:
+                    return self._hit("similar", entry)
+        self._miss()
+        return None
+
+    def store(self, key: str, context: str | None, vector: np.ndarray | None, message: AIMessage, seconds: float) -> None:
+        self.backend.set(key, self._entry(message, seconds), self.ttl_seconds)
+        if context is not None:
+            self.index.add(context, vector, key)
+
+    async def astore(
+        self, key: str, context: str | None, vector: np.ndarray | None, message: AIMessage, seconds: float
+    ) -> None:
+        await self.backend.aset(key, self._entry(message, seconds), self.ttl_seconds)
+        if context is not None:
+            self.index.add(context, vector, key)
+
+
+def _cacheable(message: AIMessage) -> bool:
+    return bool(message.content or message.tool_calls) and not message.invalid_tool_calls
+
+
+def _replay_chunks(message: AIMessage) -> Iterator[ChatGenerationChunk]:
+    """Split a cached answer into chunks like a live stream: words and whitespace, then tool calls."""
+    text = message.content if isinstance(message.content, str) else _message_text(message)
+    for token in re.split(r"(\s+)", text):
+        if token:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+    yield ChatGenerationChunk(message=AIMessageChunk(
+        content="",
+        tool_call_chunks=[
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+            for index, call in enumerate(message.tool_calls)
+        ],
+        response_metadata={"cache_hit": True},
+    ))
+
+
+def _as_chunk(message: BaseMessage) -> AIMessageChunk:
+    # stream() of a model without streaming support yields its whole answer as one AIMessage.
+    if isinstance(message, AIMessageChunk):
+        return message
+    return AIMessageChunk(**message.model_dump(exclude={"type"}))
+
+
+def _fresh_tool_call_ids(message: AIMessage) -> AIMessage:
+    # A replayed tool call gets a new ID, so its ToolMessage cannot collide with an earlier one.
+    if not message.tool_calls:
+        return message
+    return message.model_copy(update={
+        "tool_calls": [{**call, "id": f"call_{uuid.uuid4().hex[:24]}"} for call in message.tool_calls]
+    })
+
+
+class CachedChatModel(BaseChatModel):
+    """Chat model that answers from a ResponseCache before calling the wrapped model.
+
+    Args:
+        model: The chat model to wrap.
+        response_cache: Where answers are looked up and stored.
+        replay_tokens_per_second: Pace of replayed answers. 0 replays without delay.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    response_cache: ResponseCache
+    replay_tokens_per_second: float = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.model._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return self.model._identifying_params
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        # Let the wrapped model format the tools, then bind the result to the cache.
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def _keys(self, messages: list[BaseMessage], stop: list[str] | None, **kwargs: Any):
+        return self.response_cache.keys(messages, self.model._get_llm_string(stop=stop, **kwargs))
+
+    def _replay_delay(self) -> float:
+        return 1 / self.replay_tokens_per_second if self.replay_tokens_per_second else 0
+
+    def _child_config(self, run_manager: CallbackManagerForLLMRun | AsyncCallbackManagerForLLMRun | None) -> RunnableConfig:
+        # The wrapped model runs through its public API as a child run, so its callbacks, tracing
+        # and rate limiter apply. TAG_NOSTREAM keeps stream_mode="messages" from emitting its
+        # tokens a second time; they reach the stream as this model's chunks.
+        if run_manager is None:
+            return {"tags": [TAG_NOSTREAM]}
+        manager_class = AsyncCallbackManager if isinstance(run_manager, AsyncCallbackManagerForLLMRun) else CallbackManager
+        child = manager_class(
+            handlers=run_manager.inheritable_handlers,
+            inheritable_handlers=run_manager.inheritable_handlers,
+            parent_run_id=run_manager.run_id,
+            tags=run_manager.inheritable_tags,
+            inheritable_tags=run_manager.inheritable_tags,
+            metadata=run_manager.inheritable_metadata,
+            inheritable_metadata=run_manager.inheritable_metadata,
+        )
+        return {"callbacks": child, "tags": [TAG_NOSTREAM]}
+
+    # ---------------------------------------------------------------- sync
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        keys = self._keys(messages, stop, **kwargs)
+        if (cached := self.response_cache.lookup(*keys)) is not None:
+            return ChatResult(generations=[ChatGeneration(message=_fresh_tool_call_ids(cached))])
+        start = time.perf_counter()
+        message = self.model.invoke(messages, self._child_config(run_manager), stop=stop, **kwargs)
+        if isinstance(message, AIMessage) and _cacheable(message):
+            self.response_cache.store(*keys, message, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        keys = self._keys(messages, stop, **kwargs)
+        if (cached := self.response_cache.lookup(*keys)) is not None:
+            for chunk in _replay_chunks(_fresh_tool_call_ids(cached)):
+                if delay := self._replay_delay():
+                    time.sleep(delay)
+                yield chunk
+            return
+        start = time.perf_counter()
+        full: ChatGenerationChunk | None = None
+        for message_chunk in self.model.stream(messages, self._child_config(run_manager), stop=stop, **kwargs):
+            chunk = ChatGenerationChunk(message=_as_chunk(message_chunk))
+            full = chunk if full is None else full + chunk
+            yield chunk
+        if full is not None and _cacheable(message := message_chunk_to_message(full.message)):
+            self.response_cache.store(*keys, message, time.perf_counter() - start)
+
+    # ---------------------------------------------------------------- async
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        keys = self._keys(messages, stop, **kwargs)
+        if (cached := await self.response_cache.alookup(*keys)) is not None:
+            return ChatResult(generations=[ChatGeneration(message=_fresh_tool_call_ids(cached))])
+        start = time.perf_counter()
+        message = await self.model.ainvoke(messages, self._child_config(run_manager), stop=stop, **kwargs)
+        if isinstance(message, AIMessage) and _cacheable(message):
+            await self.response_cache.astore(*keys, message, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        keys = self._keys(messages, stop, **kwargs)
+        if (cached := await self.response_cache.alookup(*keys)) is not None:
+            for chunk in _replay_chunks(_fresh_tool_call_ids(cached)):
+                if delay := self._replay_delay():
+                    await asyncio.sleep(delay)
+                yield chunk
+            return
+        start = time.perf_counter()
+        full: ChatGenerationChunk | None = None
+        async for message_chunk in self.model.astream(messages, self._child_config(run_manager), stop=stop, **kwargs):
+            chunk = ChatGenerationChunk(message=_as_chunk(message_chunk))
+            full = chunk if full is None else full + chunk
+            yield chunk
+        if full is not None and _cacheable(message := message_chunk_to_message(full.message)):
+            await self.response_cache.astore(*keys, message, time.perf_counter() - start)
@@ -1,6 +1,10 @@
 import os
 from dotenv import load_dotenv
 from langchain.agents import create_agent
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 
 load_dotenv()
@@ -12,14 +16,12 @@ agent = create_agent(
     debug=False,   
 )
 
-# This is just to show the graph of the agent.
+# This is just to show the graph of the agent: uv run Agent/simple_agent.py --graph
 # This agent doesn't have any tools, so it will just return the answer to the question.
-from IPython.display import Image, display
-mermaid = agent.get_graph(xray=True).draw_mermaid_png()
-with open("agent_graph.png", "wb") as f:
-    f.write(mermaid)
-
-display(Image(mermaid))
+# The picture is cached by graph topology and rendered offline when Graphviz or mermaid-cli is installed.
+if "--graph" in sys.argv[1:]:
+    from Agent.graph_render import display_graph, render_graph
+    display_graph(render_graph(agent, "agent_graph.png"))
 
 input = {"messages": [{"role": "user", "content": "What is the capital of USA?"}]}
 results = agent.stream(
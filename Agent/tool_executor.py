@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.types import Command
+
+from Agent.agent_metrics import SECONDS_BUCKETS, Histogram, HistogramStats
+
+
+# Tool execution layer for agents. create_agent already sends every tool call of an AI
+# message to the tools node as its own task, but under astream a sync tool then runs on
+# asyncio's default thread pool, with no bound per tool, no timeout and no numbers.
+# ToolExecutor is both:
+#   - a tool wrapper: wrap(tools) gives each sync tool a coroutine that runs it on the
+#     executor's bounded thread pool (async tools are left as they are);
+#   - a middleware: every tool call goes through wrap_tool_call / awrap_tool_call, which
+#       * caps the calls of a tool in flight (max_concurrency; the others wait their turn),
+#       * answers calls of pure tools from a memo keyed by arguments, for cache_ttl_seconds,
+#       * gives up after timeout_seconds (waiting included) with an error ToolMessage, so the
+#         model can answer without that tool instead of stalling the turn,
+#       * records a latency histogram per tool (cache hits included).
+# A timed-out sync tool keeps its pool thread until it returns; threads cannot be killed.
+#
+# Usage:
+#   executor = ToolExecutor(limits={"get_weather": ToolLimits(timeout_seconds=5, cache_ttl_seconds=600)})
+#   agent = create_agent(model=..., tools=executor.wrap([get_weather, get_news]), middleware=[executor])
+#   print(executor.stats()["get_weather"])
+
+
+@dataclass
+class ToolLimits:
+    """Execution limits of one tool.
+
+    Args:
+        timeout_seconds: Time a call may take, waiting for a slot included. None waits forever.
+        max_concurrency: Calls of this tool in flight at once. None leaves it to the pool.
+        cache_ttl_seconds: Memoize results by arguments for this long. Only for pure tools; 0 is off.
+        max_cache_entries: Memoized results kept before the least recently used one is evicted.
+    """
+
+    timeout_seconds: float | None = 30.0
+    max_concurrency: int | None = None
+    cache_ttl_seconds: float = 0.0
+    max_cache_entries: int = 1024
+
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    cache_hits: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    latency: HistogramStats = field(default_factory=lambda: HistogramStats(0, 0.0, 0.0, 0.0))
+
+
+@dataclass
+class _ToolState:
+    limits: ToolLimits
+    histogram: Histogram = field(default_factory=lambda: Histogram(SECONDS_BUCKETS))
+    stats: ToolStats = field(default_factory=ToolStats)
+    # arguments key -> (expires at, content, artifact), least recently used first
+    memo: OrderedDict[str, tuple[float, Any, Any]] = field(default_factory=OrderedDict)
+    slots: threading.BoundedSemaphore | None = None
+    # asyncio primitives are bound to the loop that first waits on them, so each loop gets its own
+    async_slots: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = field(
+        default_factory=weakref.WeakKeyDictionary
+    )
+
+
+class ToolExecutor(AgentMiddleware):
+    """Runs tool calls on a bounded pool, with per-tool timeouts, concurrency caps, memoization and latency histograms.
+
+    Args:
+        max_workers: Threads of the pool that runs sync tools.
+        limits: Tool name -> its limits.
+        default: Limits of the tools not in `limits`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_workers: int = 8,
+        limits: dict[str, ToolLimits] | None = None,
+        default: ToolLimits | None = None,
+    ) -> None:
+        super().__init__()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self.limits = limits or {}
+        self.default = default or ToolLimits()
+        self.tool_states: dict[str, _ToolState] = {}
+        self.lock = threading.Lock()
+
+    def _state(self, name: str) -> _ToolState:
+        with self.lock:
+            if (state := self.tool_states.get(name)) is None:
+                limits = self.limits.get(name, self.default)
+                state = self.tool_states[name] = _ToolState(limits)
+                if limits.max_concurrency:
+                    state.slots = threading.BoundedSemaphore(limits.max_concurrency)
+            return state
+
+    def _async_slots(self, state: _ToolState) -> asyncio.Semaphore | None:
+        if not state.limits.max_concurrency:
+            return None
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if (slots := state.async_slots.get(loop)) is None:
+                slots = state.async_slots[loop] = asyncio.Semaphore(state.limits.max_concurrency)
+            return slots
+
+    def stats(self) -> dict[str, ToolStats]:
+        """Return a snapshot of the counters and latency of every tool called so far."""
+        with self.lock:
+            return {
+                name: ToolStats(**{**vars(state.stats), "latency": state.histogram.stats()})
+                for name, state in self.tool_states.items()
+            }
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------------------------------------------------------------- tools
+
+    def wrap(self, tools: Sequence[BaseTool]) -> list[BaseTool]:
+        """Give each sync tool a coroutine that runs it on the pool, so astream never uses the default executor."""
+        return [self._pooled(tool) if isinstance(tool, StructuredTool) and tool.coroutine is None else tool for tool in tools]
+
+    def _pooled(self, tool: StructuredTool) -> StructuredTool:
+        func = tool.func
+
+        async def run_on_pool(**kwargs: Any) -> Any:
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self.pool, partial(context.run, func, **kwargs))
+
+        return tool.model_copy(update={"coroutine": run_on_pool})
+
+    # ---------------------------------------------------------------- calls
+
+    def _cached(self, state: _ToolState, key: str, request: ToolCallRequest) -> ToolMessage | None:
+        if not state.limits.cache_ttl_seconds:
+            return None
+        with self.lock:
+            entry = state.memo.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                state.memo.pop(key, None)
+                return None
+            state.memo.move_to_end(key)
+            state.stats.cache_hits += 1
+        call = request.tool_call
+        return ToolMessage(content=entry[1], artifact=entry[2], name=call["name"], tool_call_id=call["id"])
+
+    def _finish(self, state: _ToolState, key: str, result: ToolMessage | Command, start: float, timed_out: bool = False) -> None:
+        with self.lock:
+            state.stats.calls += 1
+            state.histogram.observe(time.perf_counter() - start)
+            if timed_out:
+                state.stats.timeouts += 1
+            elif isinstance(result, ToolMessage) and result.status == "error":
+                state.stats.errors += 1
+            elif isinstance(result, ToolMessage) and state.limits.cache_ttl_seconds:
+                now = time.monotonic()
+                state.memo[key] = (now + state.limits.cache_ttl_seconds, result.content, result.artifact)
+                state.memo.move_to_end(key)
+                if len(state.memo) > state.limits.max_cache_entries:
+                    # Expired entries go first, then the least recently used ones.
+                    for stale in [stale for stale, entry in state.memo.items() if entry[0] <= now]:
+                        del state.memo[stale]
+                    while len(state.memo) > state.limits.max_cache_entries:
+                        state.memo.popitem(last=False)
+
+    def _timed_out(self, request: ToolCallRequest, timeout: float | None) -> ToolMessage:
+        call = request.tool_call
+        within = "in time" if timeout is None else f"within {timeout:g} seconds"
+        return ToolMessage(
+            content=f"Error: {call['name']} did not finish {within}. Answer without it.",
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+        )
+
+    def wrap_tool_call(
+        self, request: ToolCallRequest, handler: Callable[[ToolCallRequest], ToolMessage | Command]
+    ) -> ToolMessage | Command:
+        state = self._state(request.tool_call["name"])
+        key = _args_key(request.tool_call["args"])
+        start = time.perf_counter()
+        if (cached := self._cached(state, key, request)) is not None:
+            self._finish(state, key, cached, start)
+            return cached
+        timeout = state.limits.timeout_seconds
+
+        def run() -> ToolMessage | Command:
+            if state.slots is None:
+                return handler(request)
+            if not state.slots.acquire(timeout=timeout):
+                raise FutureTimeoutError
+            try:
+                return handler(request)
+            finally:
+                state.slots.release()
+
+        future = self.pool.submit(contextvars.copy_context().run, run)
+        try:
+            result = future.result(timeout)
+        except FutureTimeoutError:
+            result = self._timed_out(request, timeout)
+            self._finish(state, key, result, start, timed_out=True)
+            return result
+        self._finish(state, key, result, start)
+        return result
+
+    async def awrap_tool_call(
+        self, request: ToolCallRequest, handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]]
+    ) -> ToolMessage | Command:
+        state = self._state(request.tool_call["name"])
+        key = _args_key(request.tool_call["args"])
+        start = time.perf_counter()
+        if (cached := self._cached(state, key, request)) is not None:
+            self._finish(state, key, cached, start)
+            return cached
+        timeout = state.limits.timeout_seconds
+
+        slots = self._async_slots(state)
+
+        async def run() -> ToolMessage | Command:
+            if slots is None:
+                return await handler(request)
+            async with slots:
+                return await handler(request)
+
+        try:
+            result = await asyncio.wait_for(run(), timeout)
+        except asyncio.TimeoutError:
+            result = self._timed_out(request, timeout)
+            self._finish(state, key, result, start, timed_out=True)
+            return result
+        self._finish(state, key, result, start)
+        return result
+
+
+def _args_key(args: dict[str, Any]) -> str:
+    return json.dumps(args, sort_keys=True, default=str)
@@ -1,32 +1,51 @@
 from dotenv import load_dotenv
 from langchain.agents import create_agent
-from langgraph.checkpoint.memory import InMemorySaver
+from pathlib import Path
 import os
+import sys
 import asyncio
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent_Memory.bounded_saver import BoundedInMemorySaver
+from Agent_Memory.history_compaction import HistoryCompactionMiddleware
+from Agent_Memory.long_term_memory import LongTermMemory, LongTermMemoryMiddleware
+
 
 
 
 load_dotenv()
-# The InMemorySaver is used to store the conversation history in memory.
+# The BoundedInMemorySaver is used to store the conversation history in memory.
+# Unlike InMemorySaver, it only keeps the last few checkpoints per thread and evicts
+# the least recently used threads, so memory stays flat in a long-running process.
 # This is for experimentation purposes only.
 # For production, you should use a persistent storage solution
 # Use PostgresSaver -> from langgraph.checkpoint.postgres import PostgresSaver
+# HistoryCompactionMiddleware keeps the prompt under max_tokens: older turns are folded
+# into a rolling summary instead of being re-sent on every turn.
+# LongTermMemoryMiddleware remembers the user across threads: facts the model saves with
+# its remember tool and a summary of every turn; each turn recalls the 3 most relevant.
+long_term_memory = LongTermMemoryMiddleware(LongTermMemory(), k=3, summary_model="gpt-4o-mini")
 agent = create_agent(
     model="gpt-4o-mini",
     system_prompt="You are an AI chatbot that will response to user query.",
-    checkpointer=InMemorySaver(),
+    checkpointer=BoundedInMemorySaver(),
+    middleware=[
+        HistoryCompactionMiddleware(model="gpt-4o-mini", max_tokens=4000),
+        long_term_memory,
+    ],
     debug=False
 )
 
 
 async def stream_agent(user_input: str):
     input = {"messages": [{"role": "user", "content": user_input}]}
-    identifier = {"configurable": {"thread_id": "1"}}
+    identifier = {"configurable": {"thread_id": "1", "user_id": "1"}}
     async for results in agent.astream(input, identifier, stream_mode="messages"):
         print(f"{results[0].content}", end="", flush=True)
 
     print()  # Add a newline at the end
+    # The turn summary is written in the background; asyncio.run would cancel it on return.
+    await long_term_memory.adrain()
 
 
 while True:
@@ -1,10 +1,17 @@
 from dotenv import load_dotenv
 
 from langchain.agents import create_agent
-from langgraph.checkpoint.redis import AsyncRedisSaver
+from pathlib import Path
 import asyncio
 import logging
 import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent_Memory.checkpoint_sweeper import CheckpointSweeper
+from Agent_Memory.history_compaction import HistoryCompactionMiddleware
+from Agent_Memory.long_term_memory import LongTermMemory, LongTermMemoryMiddleware, RedisMemoryBackend
+from Agent_Memory.write_behind_saver import WriteBehindSaver
 
 load_dotenv()
 logging.getLogger("langgraph.checkpoint.redis").setLevel(logging.WARNING)
@@ -16,39 +23,60 @@ DB_URI = os.getenv("REDIS_URL")
 async def main():
 
     # Set the Redis checkpointer.
+    # WriteBehindSaver wraps AsyncRedisSaver: checkpoint writes are queued and flushed
+    # to Redis in the background over one shared connection pool, so they no longer
+    # add Redis round trips to every streamed turn.
+    #
+    # Set TTL strategy is not available unless you are using langgraph.json file.
+    #await checkpointer_redis.ttl.set_ttl_strategy("delete", sweep_interval_minutes=10, default_ttl=43200)
+    # Instead, CheckpointSweeper runs in the background: it keeps the latest 5 checkpoints
+    # of each thread (plus any pending interrupt) and deletes threads idle for 30 days.
     async with (   
-        AsyncRedisSaver.from_conn_string(DB_URI) as checkpointer_redis,
+        WriteBehindSaver.from_conn_string(DB_URI) as checkpointer_redis,
+        CheckpointSweeper(
+            checkpointer_redis.saver,
+            keep_last=5,
+            idle_ttl_seconds=43200 * 60,
+            sweep_interval_seconds=10 * 60,
+        ),
     ):
-        await checkpointer_redis.setup()
-
-        # Set TTL strategy is not available unless you are using langgraph.json file.
-        #await checkpointer_redis.ttl.set_ttl_strategy("delete", sweep_interval_minutes=10, default_ttl=43200)
-
-
-        # Create the agent with the Redis checkpointer.
+        # Create the agent with the Redis checkpointer. Conversations here can go on for
+        # weeks, so HistoryCompactionMiddleware folds older turns into a rolling summary.
+        # Long-term memories of the user are kept in Redis too, and outlive the threads
+        # the sweeper deletes; the vector index is rebuilt from them at start.
+        long_term_memory = LongTermMemory(RedisMemoryBackend(DB_URI))
+        long_term_memory_middleware = LongTermMemoryMiddleware(long_term_memory, k=3, summary_model="gpt-4o-mini")
         agent = create_agent(
-        model="gpt-4o-mini",
-        system_prompt="You are an AI chatbot that will response to user query.",
-        checkpointer=checkpointer_redis,
-        debug=False
-    )
+            model="gpt-4o-mini",
+            system_prompt="You are an AI chatbot that will response to user query.",
+            checkpointer=checkpointer_redis,
+            middleware=[
+                HistoryCompactionMiddleware(model="gpt-4o-mini", max_tokens=4000),
+                long_term_memory_middleware,
+            ],
+            debug=False
+        )
 
 
-    async def stream_agent(user_input: str):
-        input = {"messages": [{"role": "user", "content": user_input}]}
-        identifier = {"configurable": {"thread_id": "1"}}
-        async for results in agent.astream(input, identifier, stream_mode="messages"):
-            print(f"{results[0].content}", end="", flush=True)
+        async def stream_agent(user_input: str):
+            input = {"messages": [{"role": "user", "content": user_input}]}
+            identifier = {"configurable": {"thread_id": "1", "user_id": "1"}}
+            async for results in agent.astream(input, identifier, stream_mode="messages"):
+                print(f"{results[0].content}", end="", flush=True)
 
-        print()  # Add a newline at the end
+            print()  # Add a newline at the end
+            # Durability barrier: the turn is stored in Redis once this returns.
+            await checkpointer_redis.aflush(identifier["configurable"]["thread_id"])
 
 
-    while True:
-        print (">>> ", flush=True, end="")
-        user_input = input()
-        if user_input.strip().lower() == "exit":
-            break
-        await stream_agent(user_input)
+        while True:
+            print (">>> ", flush=True, end="")
+            # Read in a thread, so turn summaries are written in the background meanwhile.
+            user_input = await asyncio.to_thread(input)
+            if user_input.strip().lower() == "exit":
+                break
+            await stream_agent(user_input)
+        await long_term_memory_middleware.adrain()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,91 @@
+from dotenv import load_dotenv
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from contextlib import asynccontextmanager
+from itertools import cycle
+from pathlib import Path
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent_Memory.write_behind_saver import WriteBehindSaver
+from Benchmarks.fake_redis_saver import FakeRedisSaver
+
+
+# Compares p50/p99 turn latency of the plain checkpointer against WriteBehindSaver.
+# With REDIS_URL set it runs against a real AsyncRedisSaver, otherwise against
+# FakeRedisSaver (Benchmarks/fake_redis_saver.py), which adds a simulated network round
+# trip to every Redis call.
+#
+#   uv run Agent_Memory/bench_write_behind.py
+
+load_dotenv()
+
+TURNS = 200
+
+
+@asynccontextmanager
+async def plain_saver():
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        yield FakeRedisSaver()
+        return
+    from langgraph.checkpoint.redis import AsyncRedisSaver
+
+    async with AsyncRedisSaver.from_conn_string(redis_url) as saver:
+        await saver.asetup()
+        yield saver
+
+
+@asynccontextmanager
+async def write_behind_saver():
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        async with WriteBehindSaver(FakeRedisSaver()) as saver:
+            yield saver
+        return
+    async with WriteBehindSaver.from_conn_string(redis_url) as saver:
+        yield saver
+
+
+def percentile(samples: list[float], q: float) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def run(name: str, saver_factory) -> None:
+    streamed, durable = [], []
+    async with saver_factory() as saver:
+        model = GenericFakeChatModel(messages=cycle([AIMessage(content="The capital of the USA is Washington, D.C.")]))
+        agent = create_agent(model=model, checkpointer=saver)
+        identifier = {"configurable": {"thread_id": f"bench-{name}-{time.time_ns()}"}}
+        for turn in range(TURNS):
+            input = {"messages": [{"role": "user", "content": f"Question {turn}"}]}
+            start = time.perf_counter()
+            async for _ in agent.astream(input, identifier, stream_mode="messages"):
+                pass
+            streamed.append(time.perf_counter() - start)
+            if isinstance(saver, WriteBehindSaver):
+                await saver.aflush(identifier["configurable"]["thread_id"])
+            durable.append(time.perf_counter() - start)
+        if isinstance(saver, WriteBehindSaver):
+            print(f"  {saver.stats()}")
+
+    for label, samples in (("streamed", streamed), ("durable", durable)):
+        print(
+            f"{name:>12} {label:>8}: p50={percentile(samples, 50) * 1000:7.2f} ms  "
+            f"p99={percentile(samples, 99) * 1000:7.2f} ms"
+        )
+
+
+async def main():
+    print(f"Backend: {'AsyncRedisSaver' if os.getenv('REDIS_URL') else 'FakeRedisSaver'}, {TURNS} turns\n")
+    await run("plain", plain_saver)
+    await run("write-behind", write_behind_saver)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
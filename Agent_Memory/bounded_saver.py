@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import random
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+
+# A drop-in replacement for InMemorySaver that keeps memory flat.
+# InMemorySaver keeps every checkpoint of every thread forever, so a long-running
+# process grows without limit. This saver keeps only the last N checkpoints per
+# thread and evicts the least recently used threads once either the thread count
+# or the total serialized size goes over its limit.
+#
+# Usage:
+#   checkpointer = BoundedInMemorySaver(max_threads=10_000, max_bytes=256 * 1024 * 1024)
+#   agent = create_agent(model="gpt-4o-mini", checkpointer=checkpointer)
+#   print(checkpointer.stats())
+
+
+@dataclass
+class CheckpointCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evicted_threads: int = 0
+    trimmed_checkpoints: int = 0
+    threads: int = 0
+    bytes: int = 0
+
+
+class _ThreadEntry:
+    """Everything stored for one thread, plus its serialized size."""
+
+    __slots__ = ("checkpoints", "writes", "blobs", "nbytes")
+
+    def __init__(self) -> None:
+        # checkpoint NS -> checkpoint ID -> (checkpoint, metadata, parent ID, channel versions)
+        self.checkpoints: dict[str, dict[str, tuple[tuple[str, bytes], tuple[str, bytes], str | None, ChannelVersions]]] = {}
+        # (checkpoint NS, checkpoint ID) -> (task ID, write idx) -> (task ID, channel, value, task path)
+        self.writes: dict[tuple[str, str], dict[tuple[str, int], tuple[str, str, tuple[str, bytes], str]]] = {}
+        # (checkpoint NS, channel, version) -> value
+        self.blobs: dict[tuple[str, str, str | int | float], tuple[str, bytes]] = {}
+        self.nbytes = 0
+
+
+def _typed_size(typed: tuple[str, bytes]) -> int:
+    return len(typed[0]) + len(typed[1])
+
+
+class BoundedInMemorySaver(BaseCheckpointSaver[str]):
+    """In-memory checkpointer with per-thread history limits and LRU thread eviction.
+
+    Args:
+        max_threads: Maximum number of threads kept in memory.
+        max_bytes: Maximum total serialized size of all threads.
+        max_checkpoints_per_thread: Number of most recent checkpoints kept per thread and namespace.
+        serde: The serializer to use for checkpoints. Defaults to the LangGraph serializer.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_checkpoints_per_thread: int = 2,
+        serde: SerializerProtocol | None = None,
+    ) -> None:
+        if max_threads < 1 or max_bytes < 1 or max_checkpoints_per_thread < 1:
+            raise ValueError("max_threads, max_bytes and max_checkpoints_per_thread must be positive")
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        # thread ID -> entry, least recently used first
+        self.threads: OrderedDict[str, _ThreadEntry] = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted_threads = 0
+        self.trimmed_checkpoints = 0
+        self.lock = threading.RLock()
+
+    def stats(self) -> CheckpointCacheStats:
+        """Return a snapshot of the hit/miss/eviction counters."""
+        with self.lock:
+            return CheckpointCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evicted_threads=self.evicted_threads,
+                trimmed_checkpoints=self.trimmed_checkpoints,
+                threads=len(self.threads),
+                bytes=self.total_bytes,
+            )
+
+    # ---------------------------------------------------------------- internals
+
+    def _touch(self, thread_id: str, create: bool = False) -> _ThreadEntry | None:
+        entry = self.threads.get(thread_id)
+        if entry is None:
+            if not create:
+                return None
+            entry = self.threads[thread_id] = _ThreadEntry()
+        else:
+            self.threads.move_to_end(thread_id)
+        return entry
+
+    def _grow(self, entry: _ThreadEntry, nbytes: int) -> None:
+        entry.nbytes += nbytes
+        self.total_bytes += nbytes
+
+    def _drop_thread(self, thread_id: str) -> None:
+        entry = self.threads.pop(thread_id, None)
+        if entry is not None:
+            self.total_bytes -= entry.nbytes
+
+    def _enforce_limits(self, keep: str) -> None:
+        # Never evict the thread that is being written, so its latest state stays available.
+        while len(self.threads) > self.max_threads or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.threads))
+            if oldest == keep:
+                if len(self.threads) == 1:
+                    break
+                self.threads.move_to_end(keep)
+                continue
+            self._drop_thread(oldest)
+            self.evicted_threads += 1
+
+    def _trim_history(self, entry: _ThreadEntry, checkpoint_ns: str) -> None:
+        checkpoints = entry.checkpoints[checkpoint_ns]
+        excess = len(checkpoints) - self.max_checkpoints_per_thread
+        if excess <= 0:
+            return
+        freed = 0
+        for checkpoint_id in sorted(checkpoints)[:excess]:
+            checkpoint, metadata, _, _ = checkpoints.pop(checkpoint_id)
+            freed += _typed_size(checkpoint) + _typed_size(metadata)
+            for _, _, value, _ in entry.writes.pop((checkpoint_ns, checkpoint_id), {}).values():
+                freed += _typed_size(value)
+        self.trimmed_checkpoints += excess
+
+        # Drop channel values that no remaining checkpoint in this namespace refers to.
+        live = {
+            (checkpoint_ns, channel, version)
+            for _, _, _, versions in checkpoints.values()
+            for channel, version in versions.items()
+        }
+        for key in [k for k in entry.blobs if k[0] == checkpoint_ns and k not in live]:
+            freed += _typed_size(entry.blobs.pop(key))
+        self._grow(entry, -freed)
+
+    def _load_blobs(self, entry: _ThreadEntry, checkpoint_ns: str, versions: ChannelVersions) -> dict[str, Any]:
+        channel_values: dict[str, Any] = {}
+        for k, v in versions.items():
+            vv = entry.blobs.get((checkpoint_ns, k, v))
+            if vv is not None and vv[0] != "empty":
+                channel_values[k] = self.serde.loads_typed(vv)
+        return channel_values
+
+    def _make_tuple(
+        self,
+        entry: _ThreadEntry,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        metadata: CheckpointMetadata | None = None,
+    ) -> CheckpointTuple:
+        checkpoint, metadata_b, parent_checkpoint_id, _ = entry.checkpoints[checkpoint_ns][checkpoint_id]
+        writes = entry.writes.get((checkpoint_ns, checkpoint_id), {}).values()
+        checkpoint_: Checkpoint = self.serde.loads_typed(checkpoint)
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint_,
+                "channel_values": self._load_blobs(entry, checkpoint_ns, checkpoint_["channel_versions"]),
+            },
+            metadata=metadata if metadata is not None else self.serde.loads_typed(metadata_b),
+            pending_writes=[(id, c, self.serde.loads_typed(v)) for id, c, v, _ in writes],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    # ---------------------------------------------------------------- saver API
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        with self.lock:
+            entry = self._touch(thread_id)
+            checkpoints = entry.checkpoints.get(checkpoint_ns) if entry else None
+            if checkpoints:
+                checkpoint_id = get_checkpoint_id(config) or max(checkpoints)
+                if checkpoint_id in checkpoints:
+                    self.hits += 1
+                    return self._make_tuple(entry, thread_id, checkpoint_ns, checkpoint_id)
+            self.misses += 1
+            return None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        config_checkpoint_ns = config["configurable"].get("checkpoint_ns") if config else None
+        config_checkpoint_id = get_checkpoint_id(config) if config else None
+        before_checkpoint_id = get_checkpoint_id(before) if before else None
+        with self.lock:
+            thread_ids = [config["configurable"]["thread_id"]] if config else list(self.threads)
+            results = []
+            for thread_id in thread_ids:
+                entry = self.threads.get(thread_id)
+                if entry is None:
+                    continue
+                for checkpoint_ns, checkpoints in entry.checkpoints.items():
+                    if config_checkpoint_ns is not None and checkpoint_ns != config_checkpoint_ns:
+                        continue
+                    for checkpoint_id in sorted(checkpoints, reverse=True):
+                        if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                            continue
+                        if before_checkpoint_id and checkpoint_id >= before_checkpoint_id:
+                            continue
+                        metadata = self.serde.loads_typed(checkpoints[checkpoint_id][1])
+                        if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                            continue
+                        if limit is not None and len(results) >= limit:
+                            break
+                        results.append(self._make_tuple(entry, thread_id, checkpoint_ns, checkpoint_id, metadata))
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        c = checkpoint.copy()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values: dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+        blobs = {
+            (checkpoint_ns, k, v): self.serde.dumps_typed(values[k]) if k in values else ("empty", b"")
+            for k, v in new_versions.items()
+        }
+        saved = (
+            self.serde.dumps_typed(c),
+            self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            config["configurable"].get("checkpoint_id"),  # parent
+            dict(checkpoint["channel_versions"]),
+        )
+        with self.lock:
+            entry = self._touch(thread_id, create=True)
+            nbytes = _typed_size(saved[0]) + _typed_size(saved[1])
+            for key, value in blobs.items():
+                if (old := entry.blobs.get(key)) is not None:
+                    nbytes -= _typed_size(old)
+                entry.blobs[key] = value
+                nbytes += _typed_size(value)
+            checkpoints = entry.checkpoints.setdefault(checkpoint_ns, {})
+            if (old_saved := checkpoints.get(checkpoint["id"])) is not None:
+                nbytes -= _typed_size(old_saved[0]) + _typed_size(old_saved[1])
+            checkpoints[checkpoint["id"]] = saved
+            self._grow(entry, nbytes)
+            self._trim_history(entry, checkpoint_ns)
+            self._enforce_limits(keep=thread_id)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self.lock:
+            entry = self._touch(thread_id)
+            # Writes for a checkpoint that was already trimmed would never be reclaimed.
+            if entry is None or checkpoint_id not in entry.checkpoints.get(checkpoint_ns, ()):
+                return
+            outer_writes = entry.writes.setdefault((checkpoint_ns, checkpoint_id), {})
+            nbytes = 0
+            for idx, (c, v) in enumerate(writes):
+                inner_key = (task_id, WRITES_IDX_MAP.get(c, idx))
+                if inner_key[1] >= 0 and inner_key in outer_writes:
+                    continue
+                if (old := outer_writes.get(inner_key)) is not None:
+                    nbytes -= _typed_size(old[2])
+                value = self.serde.dumps_typed(v)
+                outer_writes[inner_key] = (task_id, c, value, task_path)
+                nbytes += _typed_size(value)
+            self._grow(entry, nbytes)
+            self._enforce_limits(keep=thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            self._drop_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
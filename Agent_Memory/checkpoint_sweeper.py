@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from langgraph.checkpoint.base import WRITES_IDX_MAP
+from langgraph.checkpoint.redis import AsyncRedisSaver
+from langgraph.checkpoint.redis.base import BaseRedisSaver
+from langgraph.checkpoint.redis.key_registry import CheckpointKeyRegistry
+from langgraph.checkpoint.redis.util import (
+    from_storage_safe_id,
+    from_storage_safe_str,
+    to_storage_safe_id,
+)
+from langgraph.constants import INTERRUPT, RESUME
+from redisvl.query import FilterQuery
+from redisvl.query.filter import Tag
+
+
+# Background TTL sweeper and history compaction for AsyncRedisSaver.
+# checkpointer.ttl.set_ttl_strategy(...) only works under langgraph.json, so without it
+# Redis keeps every intermediate checkpoint forever. This sweeper runs on the same
+# event loop as the agent and, for every thread:
+#   - keeps the latest `keep_last` checkpoints of each namespace, plus any checkpoint
+#     with a pending interrupt, and deletes the rest with their writes;
+#   - deletes the whole thread once it has been idle for longer than `idle_ttl_seconds`.
+# Threads are discovered with SCAN over the "checkpoint_latest:*" pointers, and both the
+# SCAN pages and the deletes are rate limited so the sweep never stalls the serving path.
+#
+# Usage:
+#   async with CheckpointSweeper(checkpointer_redis, keep_last=5, idle_ttl_seconds=12 * 3600):
+#       ...  # serve the agent
+#   print(sweeper.stats())
+
+logger = logging.getLogger(__name__)
+
+LATEST_POINTER_PREFIX = "checkpoint_latest:"
+MAX_RESULTS = 10000  # Same per-thread search limit AsyncRedisSaver.adelete_thread uses
+
+
+@dataclass
+class SweeperStats:
+    sweeps: int = 0
+    threads_scanned: int = 0
+    threads_expired: int = 0
+    checkpoints_compacted: int = 0
+    keys_reclaimed: int = 0
+    bytes_freed: int = 0
+
+
+class CheckpointSweeper:
+    """Compacts checkpoint history and expires idle threads stored by AsyncRedisSaver.
+
+    Args:
+        saver: The AsyncRedisSaver whose keys are swept.
+        keep_last: Number of most recent checkpoints kept per thread and namespace.
+        idle_ttl_seconds: Threads without a new checkpoint for this long are deleted. None disables expiry.
+        sweep_interval_seconds: Pause between two full sweeps.
+        scan_count: COUNT hint of each SCAN page.
+        scan_pause_seconds: Pause between two SCAN pages.
+        max_deletes_per_second: Upper bound on the number of keys unlinked per second.
+        measure_bytes: Use MEMORY USAGE to report the bytes freed (one extra round trip per delete batch).
+    """
+
+    def __init__(
+        self,
+        saver: AsyncRedisSaver,
+        *,
+        keep_last: int = 5,
+        idle_ttl_seconds: float | None = 12 * 3600,
+        sweep_interval_seconds: float = 600,
+        scan_count: int = 100,
+        scan_pause_seconds: float = 0.01,
+        max_deletes_per_second: float = 2000,
+        measure_bytes: bool = True,
+    ) -> None:
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        if max_deletes_per_second <= 0:
+            raise ValueError("max_deletes_per_second must be positive")
+        self.saver = saver
+        # AsyncRedisSaver does not expose its client publicly.
+        self.redis = saver._redis
+        self.keep_last = keep_last
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.scan_count = scan_count
+        self.scan_pause_seconds = scan_pause_seconds
+        self.max_deletes_per_second = max_deletes_per_second
+        self.delete_batch_size = max(1, min(500, int(max_deletes_per_second)))
+        self.measure_bytes = measure_bytes
+        self.task: asyncio.Task | None = None
+        self._stats = SweeperStats()
+
+    def stats(self) -> SweeperStats:
+        """Return a snapshot of the sweep counters."""
+        return SweeperStats(**vars(self._stats))
+
+    async def __aenter__(self) -> CheckpointSweeper:
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    def start(self) -> asyncio.Task:
+        """Run sweeps in the background until stop() is called."""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run_forever())
+        return self.task
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.sweep_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Checkpoint sweep failed")
+            await asyncio.sleep(self.sweep_interval_seconds)
+
+    async def sweep_once(self) -> SweeperStats:
+        """Run one full pass over every thread and return the updated counters."""
+        seen: set[str] = set()
+        cursor = 0
+        while True:
+            cursor, pointers = await self.redis.scan(
+                cursor=cursor, match=f"{LATEST_POINTER_PREFIX}*", count=self.scan_count
+            )
+            for pointer in pointers:
+                # checkpoint_latest:<thread ID>:<checkpoint NS>; namespaces may contain ":" themselves.
+                pointer = pointer.decode() if isinstance(pointer, bytes) else pointer
+                thread_id = pointer[len(LATEST_POINTER_PREFIX):].split(":", 1)[0]
+                if thread_id not in seen:
+                    seen.add(thread_id)
+                    await self.sweep_thread(from_storage_safe_id(thread_id))
+            if cursor == 0:
+                break
+            await asyncio.sleep(self.scan_pause_seconds)
+        self._stats.sweeps += 1
+        return self.stats()
+
+    async def sweep_thread(self, thread_id: str) -> None:
+        """Compact or expire one thread."""
+        storage_safe_thread_id = to_storage_safe_id(thread_id)
+        checkpoints = await self.saver.checkpoints_index.search(
+            FilterQuery(
+                filter_expression=Tag("thread_id") == storage_safe_thread_id,
+                return_fields=["checkpoint_ns", "checkpoint_id", "checkpoint_ts"],
+                num_results=MAX_RESULTS,
+            )
+        )
+        self._stats.threads_scanned += 1
+        if not checkpoints.docs:
+            return
+
+        # checkpoint NS -> checkpoint IDs, as stored
+        by_ns: dict[str, list[str]] = {}
+        last_ts = 0.0
+        for doc in checkpoints.docs:
+            by_ns.setdefault(getattr(doc, "checkpoint_ns", ""), []).append(getattr(doc, "checkpoint_id", ""))
+            last_ts = max(last_ts, float(getattr(doc, "checkpoint_ts", 0) or 0))
+
+        expired = self.idle_ttl_seconds is not None and time.time() - last_ts / 1000 > self.idle_ttl_seconds
+        if expired:
+            doomed = {ns: set(ids) for ns, ids in by_ns.items()}
+        else:
+            doomed = {
+                ns: set(sorted(ids, reverse=True)[self.keep_last:])
+                for ns, ids in by_ns.items()
+                if len(ids) > self.keep_last
+            }
+            if not doomed:
+                return
+
+        writes = await self.saver.checkpoint_writes_index.search(
+            FilterQuery(
+                filter_expression=Tag("thread_id") == storage_safe_thread_id,
+                return_fields=["checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                num_results=MAX_RESULTS,
+            )
+        )
+        # (checkpoint NS, checkpoint ID) -> [(task ID, write idx)]
+        writes_by_checkpoint: dict[tuple[str, str], list[tuple[str, int]]] = {}
+        for doc in writes.docs:
+            key = (getattr(doc, "checkpoint_ns", ""), getattr(doc, "checkpoint_id", ""))
+            writes_by_checkpoint.setdefault(key, []).append((getattr(doc, "task_id", ""), int(getattr(doc, "idx", 0))))
+
+        keys: list[str] = []
+        compacted = 0
+        for ns, ids in doomed.items():
+            for checkpoint_id in ids:
+                checkpoint_writes = writes_by_checkpoint.get((ns, checkpoint_id), [])
+                idxs = {idx for _, idx in checkpoint_writes}
+                # An interrupt without a resume is still waiting for a human.
+                if not expired and WRITES_IDX_MAP[INTERRUPT] in idxs and WRITES_IDX_MAP[RESUME] not in idxs:
+                    continue
+                raw_ns = from_storage_safe_str(ns)
+                raw_checkpoint_id = from_storage_safe_id(checkpoint_id)
+                keys.append(BaseRedisSaver._make_redis_checkpoint_key(thread_id, raw_ns, raw_checkpoint_id))
+                keys.append(CheckpointKeyRegistry.make_write_keys_zset_key(thread_id, raw_ns, raw_checkpoint_id))
+                keys.extend(
+                    BaseRedisSaver._make_redis_checkpoint_writes_key(thread_id, raw_ns, raw_checkpoint_id, task_id, idx)
+                    for task_id, idx in checkpoint_writes
+                )
+                compacted += 1
+
+        if expired:
+            keys.extend(f"{LATEST_POINTER_PREFIX}{storage_safe_thread_id}:{ns}" for ns in by_ns)
+            blobs = await self.saver.checkpoint_blobs_index.search(
+                FilterQuery(
+                    filter_expression=Tag("thread_id") == storage_safe_thread_id,
+                    return_fields=["checkpoint_ns", "channel", "version"],
+                    num_results=MAX_RESULTS,
+                )
+            )
+            keys.extend(
+                BaseRedisSaver._make_redis_checkpoint_blob_key(
+                    storage_safe_thread_id,
+                    getattr(doc, "checkpoint_ns", ""),
+                    getattr(doc, "channel", ""),
+                    getattr(doc, "version", ""),
+                )
+                for doc in blobs.docs
+            )
+            self._stats.threads_expired += 1
+        else:
+            self._stats.checkpoints_compacted += compacted
+
+        await self._unlink(keys)
+
+    async def _unlink(self, keys: list[str]) -> None:
+        for start in range(0, len(keys), self.delete_batch_size):
+            batch = keys[start:start + self.delete_batch_size]
+            if self.measure_bytes:
+                pipeline = self.redis.pipeline(transaction=False)
+                for key in batch:
+                    pipeline.memory_usage(key)
+                self._stats.bytes_freed += sum(size or 0 for size in await pipeline.execute())
+            self._stats.keys_reclaimed += await self.redis.unlink(*batch)
+            # Spread the deletes out so the sweep never hogs Redis or the event loop.
+            await asyncio.sleep(len(batch) / self.max_deletes_per_second)
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import ormsgpack
+from langchain_core.messages import BaseMessage, HumanMessage
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+
+# Checkpoint serializer that stores message lists as deltas.
+# Savers write the whole `messages` channel at every superstep, so with the default
+# serializer a conversation of n messages costs O(n) bytes and time per checkpoint and
+# O(n^2) over its life. DeltaSerializer stores instead:
+#   - every message once, as a content-addressed blob (blake2b of its msgpack encoding,
+#     zstd-compressed when compression_level is set), shared by all checkpoints and threads;
+#   - every message list as a node (hash of the list, parent node, hashes appended since the
+#     parent), so a checkpoint adds one node with the messages new since the last one.
+# The saver itself only stores the 16-byte key of the list. Other channels and values go
+# to the wrapped serializer unchanged. Savers that store channel values inline in the
+# checkpoint (AsyncRedisSaver) get the checkpoint with each message list replaced by a
+# reference to its key; they revive it through _reviver. With a serializer that writes text
+# (JsonPlusRedisSerializer), keys are base64 text, so they fit the saver's JSON documents.
+# Writes skip re-encoding messages it already encoded or read: they are remembered by
+# object identity. Messages of the current turn (from the last HumanMessage on) are always
+# re-encoded, because middleware may edit them in place (HumanInTheLoopMiddleware does).
+# Reads rebuild the full list by walking the nodes. The last cache_size lists and the
+# messages seen recently are kept in memory, so the next turn of a recently read thread
+# needs no store round trip and no decoding. Messages are cached and returned as copies,
+# so edits by the graph never reach the cache.
+# Blobs live in a BlobStore (memory, or Redis with an optional TTL) that must live as long
+# as the checkpoints pointing at them. Serializers are called synchronously, also inside
+# AsyncRedisSaver.aput/aget_tuple, so RedisBlobStore is for sync savers (RedisSaver) only:
+# under an async saver its round trips would block the event loop and every conversation on it. With a TTL, every list written refreshes the expiry
+# of the blobs it refers to (at most every ttl_seconds / 2), so an active thread keeps them.
+#
+# Usage:
+#   checkpointer = InMemorySaver(serde=DeltaSerializer(compression_level=3))
+#   checkpointer = RedisSaver(REDIS_URL); checkpointer.serde = DeltaSerializer(checkpointer.serde, store=RedisBlobStore(REDIS_URL))
+#   print(checkpointer.serde.stats())
+
+MESSAGES_TYPE = "delta-messages"
+# Constructor-shaped, so AsyncRedisSaver hands it to the serializer's _reviver on read.
+REFERENCE_ID = ["delta_serializer", "DeltaMessages"]
+RAW, ZSTD = b"m", b"z"
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+@dataclass
+class DeltaStats:
+    lists_written: int = 0
+    messages_encoded: int = 0
+    messages_reused: int = 0
+    blobs_written: int = 0
+    bytes_written: int = 0
+    lists_read: int = 0
+    list_cache_hits: int = 0
+    blobs_read: int = 0
+
+
+class MemoryBlobStore:
+    """Blobs of this process, kept until the store is dropped."""
+
+    def __init__(self) -> None:
+        self.blobs: dict[bytes, bytes] = {}
+        self.nbytes = 0
+
+    def mget(self, keys: Sequence[bytes]) -> list[bytes | None]:
+        return [self.blobs.get(key) for key in keys]
+
+    def mset(self, items: dict[bytes, bytes]) -> None:
+        for key, value in items.items():
+            if key not in self.blobs:
+                self.blobs[key] = value
+                self.nbytes += len(key) + len(value)
+
+    def touch(self, keys: Sequence[bytes]) -> None:
+        pass
+
+
+class RedisBlobStore:
+    """Blobs in Redis, one key each, over a sync client, as serializers are called synchronously.
+
+    Every checkpoint write and cold read makes blocking round trips, so use it with sync
+    savers (RedisSaver) only, not with AsyncRedisSaver, which serializes on the event loop.
+
+    Args:
+        redis_url: Redis connection URL, usually REDIS_URL.
+        prefix: Key prefix.
+        ttl_seconds: Expiry of blobs, refreshed while lists refer to them. Must be longer than
+            the checkpoints that use them live.
+    """
+
+    def __init__(self, redis_url: str, *, prefix: str = "msgblob:", ttl_seconds: int | None = None) -> None:
+        from redis import Redis
+
+        self.client = Redis.from_url(redis_url)
+        self.prefix = prefix.encode()
+        self.ttl_seconds = ttl_seconds
+
+    def mget(self, keys: Sequence[bytes]) -> list[bytes | None]:
+        return self.client.mget([self.prefix + key for key in keys]) if keys else []
+
+    def mset(self, items: dict[bytes, bytes]) -> None:
+        # Blobs are content-addressed, so overwriting one only resets its expiry.
+        with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self.prefix + key, value, ex=self.ttl_seconds)
+            pipe.execute()
+
+    def touch(self, keys: Sequence[bytes]) -> None:
+        if self.ttl_seconds is None or not keys:
+            return
+        with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.expire(self.prefix + key, self.ttl_seconds)
+            pipe.execute()
+
+
+class DeltaSerializer(SerializerProtocol):
+    """Serializer that stores message lists as content-addressed deltas.
+
+    Args:
+        serde: Serializer for messages and every other value. Defaults to JsonPlusSerializer.
+        store: Where message blobs and list nodes are kept. Defaults to memory.
+        compression_level: zstd level for message blobs of min_compress_bytes or more. None is off.
+        min_compress_bytes: Smaller blobs are stored as they are.
+        cache_size: Message lists kept in memory after a read or write.
+        max_known: Blob keys and message identities remembered, to skip rewrites and re-encoding.
+    """
+
+    def __init__(
+        self,
+        serde: SerializerProtocol | None = None,
+        *,
+        store: MemoryBlobStore | RedisBlobStore | None = None,
+        compression_level: int | None = None,
+        min_compress_bytes: int = 256,
+        cache_size: int = 256,
+        max_known: int = 100_000,
+    ) -> None:
+        self.serde = serde or JsonPlusSerializer()
+        self.store = store or MemoryBlobStore()
+        self.min_compress_bytes = min_compress_bytes
+        self.cache_size = cache_size
+        self.max_known = max_known
+        self.compressor = self.decompressor = None
+        if compression_level is not None:
+            import zstandard
+
+            self.compressor = zstandard.ZstdCompressor(level=compression_level)
+            self.decompressor = zstandard.ZstdDecompressor()
+        # list key -> message hashes, most recently used last
+        self.lists: OrderedDict[bytes, tuple[bytes, ...]] = OrderedDict()
+        # message hash -> a private copy of the message
+        self.messages: OrderedDict[bytes, BaseMessage] = OrderedDict()
+        # id(message) -> (message, hash); the message is kept so its id is not reused
+        self.identities: OrderedDict[int, tuple[BaseMessage, bytes]] = OrderedDict()
+        # keys known to be in the store -> when their expiry was last set (0 if unknown)
+        self.known: OrderedDict[bytes, float] = OrderedDict()
+        ttl_seconds = getattr(self.store, "ttl_seconds", None)
+        self.refresh_seconds = None if ttl_seconds is None else ttl_seconds / 2
+        # Keys go to the saver as text when the wrapped serializer writes text.
+        self.text_keys = isinstance(self.serde.dumps_typed(None)[1], str)
+        self.lock = threading.RLock()
+        self._stats = DeltaStats()
+
+    def stats(self) -> DeltaStats:
+        """Return a snapshot of the serializer counters."""
+        with self.lock:
+            return DeltaStats(**vars(self._stats))
+
+    # ---------------------------------------------------------------- protocol
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        if _is_messages(obj):
+            with self.lock:
+                return MESSAGES_TYPE, self._key_out(self._dump_messages(obj))
+        if isinstance(obj, dict) and isinstance(values := obj.get("channel_values"), dict) and any(map(_is_messages, values.values())):
+            # A checkpoint with its channel values inline.
+            with self.lock:
+                values = {
+                    name: self._reference(self._dump_messages(value)) if _is_messages(value) else value
+                    for name, value in values.items()
+                }
+            return self.serde.dumps_typed({**obj, "channel_values": values})
+        return self.serde.dumps_typed(obj)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        if data[0] == MESSAGES_TYPE:
+            with self.lock:
+                return self._load_messages(self._key_in(data[1]))
+        obj = self.serde.loads_typed(data)
+        if isinstance(obj, dict) and isinstance(values := obj.get("channel_values"), dict):
+            obj["channel_values"] = {name: self._reviver(value) if _is_reference(value) else value for name, value in values.items()}
+        return obj
+
+    def _reviver(self, value: dict) -> Any:
+        """Revive a message list reference; other constructor dicts go to the wrapped serializer."""
+        if _is_reference(value):
+            with self.lock:
+                return self._load_messages(self._key_in(value["kwargs"]["key"]))
+        return self.serde._reviver(value)
+
+    # ---------------------------------------------------------------- internals
+
+    def _key_out(self, key: bytes) -> bytes | str:
+        return base64.b64encode(key).decode() if self.text_keys else key
+
+    def _key_in(self, data: bytes | str) -> bytes:
+        # Raw from byte savers; base64 text, or its UTF-8 bytes, from text savers.
+        return data if isinstance(data, bytes) and len(data) == 16 else base64.b64decode(data)
+
+    def _reference(self, key: bytes) -> dict:
+        return {"lc": 2, "type": "constructor", "id": REFERENCE_ID, "kwargs": {"key": base64.b64encode(key).decode()}}
+
+    def _remember(self, mapping: OrderedDict, key: Any, value: Any, limit: int) -> None:
+        mapping[key] = value
+        mapping.move_to_end(key)
+        while len(mapping) > limit:
+            mapping.popitem(last=False)
+
+    def _encode(self, message: BaseMessage) -> tuple[bytes, bytes]:
+        raw = ormsgpack.packb(list(self.serde.dumps_typed(message)))
+        if self.compressor and len(raw) >= self.min_compress_bytes:
+            return _digest(raw), ZSTD + self.compressor.compress(raw)
+        return _digest(raw), RAW + raw
+
+    def _decode(self, blob: bytes) -> BaseMessage:
+        raw = self.decompressor.decompress(blob[1:]) if blob[:1] == ZSTD else blob[1:]
+        type_, data = ormsgpack.unpackb(raw)
+        return self.serde.loads_typed((type_, data))
+
+    def _dump_messages(self, messages: list[BaseMessage]) -> bytes:
+        turn_start = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), 0)
+        hashes, new = [], {}
+        for index, message in enumerate(messages):
+            entry = self.identities.get(id(message)) if index < turn_start else None
+            if entry is not None and entry[0] is message:
+                hashes.append(entry[1])
+                self._stats.messages_reused += 1
+                continue
+            key, blob = self._encode(message)
+            self._stats.messages_encoded += 1
+            if key not in self.known:
+                new[key] = blob
+            self._remember(self.identities, id(message), (message, key), self.max_known)
+            self._remember(self.messages, key, message.model_copy(), self.max_known)
+            hashes.append(key)
+
+        # chain[i] is the key of messages[: i + 1]
+        chain, key = [], b""
+        for message_key in hashes:
+            key = _digest(key + message_key)
+            chain.append(key)
+        if key not in self.known:
+            parent = next((i for i in range(len(chain) - 2, -1, -1) if chain[i] in self.known), None)
+            prefix = None if parent is None else chain[parent]
+            new[key] = ormsgpack.packb([prefix, b"".join(hashes[0 if parent is None else parent + 1 :])])
+        now = time.monotonic()
+        if new:
+            self.store.mset(new)
+            self._stats.blobs_written += len(new)
+            self._stats.bytes_written += sum(len(k) + len(v) for k, v in new.items())
+            for known in new:
+                self._remember(self.known, known, now, self.max_known)
+        if self.refresh_seconds is not None:
+            # Blobs and nodes this list needs, whose expiry has not been set for a while.
+            stale = [k for k in {*hashes, *chain} if k in self.known and now - self.known[k] > self.refresh_seconds]
+            if stale:
+                self.store.touch(stale)
+                for known in stale:
+                    self.known[known] = now
+        self._stats.lists_written += 1
+        self._remember(self.lists, key, tuple(hashes), self.cache_size)
+        return key
+
+    def _load_messages(self, key: bytes) -> list[BaseMessage]:
+        self._stats.lists_read += 1
+        if key in self.lists:
+            self._stats.list_cache_hits += 1
+            self.lists.move_to_end(key)
+            hashes = self.lists[key]
+        else:
+            # Walk the nodes back to a cached list or the first one.
+            segments, cursor = [], key
+            while cursor is not None and cursor not in self.lists:
+                (node,) = self.store.mget([cursor])
+                if node is None:
+                    raise KeyError(f"Message list {cursor.hex()} is missing from the blob store")
+                prefix, tail = ormsgpack.unpackb(node)
+                segments.append([tail[i : i + 16] for i in range(0, len(tail), 16)])
+                self._remember(self.known, cursor, self.known.get(cursor, 0.0), self.max_known)
+                cursor = prefix
+            base = self.lists[cursor] if cursor is not None else ()
+            hashes = base + tuple(message_key for segment in reversed(segments) for message_key in segment)
+            self._remember(self.lists, key, hashes, self.cache_size)
+
+        missing = [message_key for message_key in hashes if message_key not in self.messages]
+        if missing:
+            blobs = self.store.mget(missing)
+            self._stats.blobs_read += len(blobs)
+            for message_key, blob in zip(missing, blobs):
+                if blob is None:
+                    raise KeyError(f"Message {message_key.hex()} is missing from the blob store")
+                self._remember(self.messages, message_key, self._decode(blob), self.max_known)
+                self._remember(self.known, message_key, self.known.get(message_key, 0.0), self.max_known)
+
+        copies = []
+        for message_key in hashes:
+            message = self.messages[message_key].model_copy()
+            self._remember(self.identities, id(message), (message, message_key), self.max_known)
+            copies.append(message)
+        return copies
+
+
+def _is_messages(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, BaseMessage) for item in value)
+
+
+def _is_reference(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("id") == REFERENCE_ID and value.get("type") == "constructor"
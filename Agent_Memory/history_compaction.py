@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Annotated, Any
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import PrivateStateAttr
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AnyMessage, BaseMessage, HumanMessage, RemoveMessage, get_buffer_string
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.runtime import Runtime
+from typing_extensions import NotRequired
+
+
+# Middleware that bounds the prompt of a long conversation. With a checkpointer, every turn
+# re-sends the whole thread history, so prompt tokens and latency grow with every turn and
+# the total cost of a conversation grows quadratically. This middleware keeps a sliding
+# window of recent messages in the thread and folds older turns into a rolling summary:
+#   - before a model call, when the window is over max_tokens, the oldest whole turns are
+#     evicted until it is under target_tokens (so compaction runs every few turns, not on
+#     every turn), and removed from the checkpointed state too;
+#   - the summary is updated incrementally: the model only sees the current summary and
+#     the newly evicted messages, never the full history;
+#   - the summary is stored in the thread state and added to the system prompt.
+# Token counts are cached per message ID, so each message is counted once.
+# Evictions happen only at the start of a user turn, so a tool call is never separated
+# from its result.
+#
+# Usage:
+#   compaction = HistoryCompactionMiddleware(model="gpt-4o-mini", max_tokens=4000)
+#   agent = create_agent(model="gpt-4o-mini", checkpointer=checkpointer, middleware=[compaction])
+#   print(compaction.stats())
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Update the running summary of a conversation with the messages that are leaving the \
+context window. Keep names, facts, preferences, decisions and open questions; drop small talk. Answer \
+with the updated summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+Messages leaving the context window:
+{messages}"""
+
+SUMMARY_HEADING = "Summary of the earlier conversation:"
+
+
+class CompactionState(AgentState):
+    history_summary: NotRequired[Annotated[str, PrivateStateAttr]]
+
+
+@dataclass
+class CompactionStats:
+    compactions: int = 0
+    evicted_messages: int = 0
+    summary_seconds: float = 0.0
+    summary_failures: int = 0
+    token_count_hits: int = 0
+    token_count_misses: int = 0
+
+
+class HistoryCompactionMiddleware(AgentMiddleware[CompactionState]):
+    """Keeps a token-bounded window of recent messages and a rolling summary of the rest.
+
+    Args:
+        model: Model that writes the summary, a spec for init_chat_model or a chat model.
+        max_tokens: Token budget of the message window; going over it triggers compaction.
+        target_tokens: Size of the window after compaction. Defaults to half of max_tokens.
+        summary_max_words: Length limit given to the summary model.
+        token_counter: Counts the tokens of a list of messages.
+        max_cached_counts: Number of per-message token counts kept.
+    """
+
+    state_schema = CompactionState
+
+    def __init__(
+        self,
+        model: str | BaseChatModel,
+        *,
+        max_tokens: int = 4000,
+        target_tokens: int | None = None,
+        summary_max_words: int = 200,
+        token_counter: Callable[[list[BaseMessage]], int] = count_tokens_approximately,
+        max_cached_counts: int = 100_000,
+    ) -> None:
+        super().__init__()
+        self.model = init_chat_model(model) if isinstance(model, str) else model
+        self.max_tokens = max_tokens
+        self.target_tokens = max_tokens // 2 if target_tokens is None else target_tokens
+        self.summary_max_words = summary_max_words
+        self.token_counter = token_counter
+        self.max_cached_counts = max_cached_counts
+        # message ID -> token count, least recently used first
+        self.token_counts: OrderedDict[str, int] = OrderedDict()
+        self.lock = threading.Lock()
+        self._stats = CompactionStats()
+
+    def stats(self) -> CompactionStats:
+        """Return a snapshot of the compaction counters."""
+        with self.lock:
+            return CompactionStats(**vars(self._stats))
+
+    def _tokens(self, message: AnyMessage) -> int:
+        with self.lock:
+            if message.id is not None and (count := self.token_counts.get(message.id)) is not None:
+                self.token_counts.move_to_end(message.id)
+                self._stats.token_count_hits += 1
+                return count
+            self._stats.token_count_misses += 1
+        count = self.token_counter([message])
+        if message.id is not None:
+            with self.lock:
+                self.token_counts[message.id] = count
+                while len(self.token_counts) > self.max_cached_counts:
+                    self.token_counts.popitem(last=False)
+        return count
+
+    def _evicted(self, messages: list[AnyMessage]) -> list[AnyMessage]:
+        """Oldest messages to evict, ending at the start of a user turn, or [] if under budget."""
+        counts = [self._tokens(message) for message in messages]
+        remaining = sum(counts)
+        if remaining <= self.max_tokens:
+            return []
+        last_turn = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+        cut = 0
+        # The current turn is never evicted, even if it alone is over budget.
+        for i in range(1, last_turn + 1):
+            remaining -= counts[i - 1]
+            if isinstance(messages[i], HumanMessage):
+                cut = i
+                if remaining <= self.target_tokens:
+                    break
+        return messages[:cut]
+
+    def _prompt(self, summary: str, evicted: list[AnyMessage]) -> str:
+        return SUMMARY_PROMPT.format(
+            max_words=self.summary_max_words, summary=summary or "(none)", messages=get_buffer_string(evicted)
+        )
+
+    def _update(self, evicted: list[AnyMessage], summary: str, seconds: float) -> dict[str, Any]:
+        with self.lock:
+            for message in evicted:
+                self.token_counts.pop(message.id, None)
+            self._stats.compactions += 1
+            self._stats.evicted_messages += len(evicted)
+            self._stats.summary_seconds += seconds
+        return {"messages": [RemoveMessage(id=message.id) for message in evicted], "history_summary": summary}
+
+    def _failed(self, e: Exception) -> None:
+        # The history is kept as it is and compaction is retried before the next model call.
+        logger.warning("History summary failed, not compacting: %s", e)
+        with self.lock:
+            self._stats.summary_failures += 1
+
+    def before_model(self, state: CompactionState, runtime: Runtime) -> dict[str, Any] | None:
+        if not (evicted := self._evicted(state["messages"])):
+            return None
+        start = time.perf_counter()
+        try:
+            # Tagged nostream, so the summary tokens do not show up in stream_mode="messages".
+            response = self.model.invoke(self._prompt(state.get("history_summary", ""), evicted), {"tags": [TAG_NOSTREAM]})
+        except Exception as e:
+            self._failed(e)
+            return None
+        return self._update(evicted, response.text.strip(), time.perf_counter() - start)
+
+    async def abefore_model(self, state: CompactionState, runtime: Runtime) -> dict[str, Any] | None:
+        if not (evicted := self._evicted(state["messages"])):
+            return None
+        start = time.perf_counter()
+        try:
+            response = await self.model.ainvoke(
+                self._prompt(state.get("history_summary", ""), evicted), {"tags": [TAG_NOSTREAM]}
+            )
+        except Exception as e:
+            self._failed(e)
+            return None
+        return self._update(evicted, response.text.strip(), time.perf_counter() - start)
+
+    # ---------------------------------------------------------------- prompt
+
+    def _with_summary(self, request: ModelRequest) -> ModelRequest:
+        if not (summary := request.state.get("history_summary")):
+            return request
+        section = f"{SUMMARY_HEADING}\n{summary}"
+        system_prompt = f"{request.system_prompt}\n\n{section}" if request.system_prompt else section
+        return request.override(system_prompt=system_prompt)
+
+    def wrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        return handler(self._with_summary(request))
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        return await handler(self._with_summary(request))
@@ -0,0 +1,576 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated, Any
+
+import numpy as np
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse
+from langchain.agents.middleware.types import PrivateStateAttr
+from langchain.chat_models import init_chat_model
+from langchain.tools import ToolRuntime
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AnyMessage, HumanMessage, get_buffer_string
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
+from langgraph.config import get_config
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.runtime import Runtime
+from typing_extensions import NotRequired
+
+from Agent.response_cache import FUNCTION_WORDS, HashingVectorizer, normalize_text
+
+
+# Long-term memory shared by every thread of a user. Checkpointers only remember within a
+# thread, and only by re-sending it. LongTermMemory keeps short texts instead, user facts
+# and one-line summaries of past turns, embedded into a vector index:
+#   - VectorIndex is a float32 matrix of unit vectors, in RAM or memory-mapped from a file
+#     (index_path), that grows by doubling, so inserts are incremental. A search is one
+#     matrix product per block of rows and a top-k per query, for a batch of queries at a
+#     time; each block of vectors is read once for the whole batch.
+#   - Memories are namespaced by user; a namespace is a row label, filtered in the search.
+#   - Identical memories (same namespace, kind and normalized text) are stored once.
+#   - RedisMemoryBackend persists memories and their vectors under REDIS_URL; the index is
+#     rebuilt from it at start without re-embedding anything.
+# LongTermMemoryMiddleware recalls the k memories most relevant to the user's message once
+# per turn and adds them to the system prompt, gives the model remember / recall tools, and
+# can store a summary of each turn. Under astream the summary is written in the background,
+# so its model call does not hold up the end of the stream; adrain() waits for the ones in
+# progress. The namespace is config["configurable"]["user_id"].
+#
+# Usage:
+#   memory = LongTermMemory(RedisMemoryBackend(REDIS_URL))     # or LongTermMemory() in process
+#   agent = create_agent(model="gpt-4o-mini", middleware=[LongTermMemoryMiddleware(memory, summary_model="gpt-4o-mini")])
+#   agent.invoke(input, {"configurable": {"thread_id": "7", "user_id": "alice"}})
+#   memory.remember("Alice is vegetarian", namespace="alice")
+#   memory.recall("what should I cook?", namespace="alice", k=3)   # [(score, Memory), ...]
+#   print(memory.stats())
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "default"
+MEMORY_HEADING = "Relevant memories from earlier conversations with this user:"
+TURN_SUMMARY_PROMPT = """Summarize this exchange in one sentence, for a long-term memory of the user. \
+Keep facts about the user, their requests and decisions; drop small talk. Answer with the sentence only.
+
+{messages}"""
+
+
+@dataclass(frozen=True)
+class Memory:
+    id: str
+    namespace: str
+    kind: str
+    text: str
+    created_at: float
+
+
+@dataclass
+class LongTermMemoryStats:
+    memories: int = 0
+    inserts: int = 0
+    duplicates: int = 0
+    deletes: int = 0
+    searches: int = 0
+    queries: int = 0
+    search_seconds: float = 0.0
+
+
+def memory_id(namespace: str, kind: str, text: str) -> str:
+    return hashlib.blake2b(f"{namespace}\0{kind}\0{normalize_text(text)}".encode(), digest_size=16).hexdigest()
+
+
+class VectorIndex:
+    """Growable matrix of unit vectors with a group label per row, searched by dot product.
+
+    Args:
+        dim: Vector size.
+        capacity: Initial number of rows; doubled whenever the matrix is full.
+        path: File to memory-map the matrix from. None keeps it in RAM. The file is
+            scratch space, overwritten at start.
+        block_rows: Rows multiplied at a time, which bounds the scores held in memory.
+    """
+
+    def __init__(self, dim: int, *, capacity: int = 1024, path: str | Path | None = None, block_rows: int = 65_536) -> None:
+        self.dim = dim
+        self.path = None if path is None else Path(path)
+        self.block_rows = block_rows
+        self.capacity = 0
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        # row -> group, -1 for deleted rows
+        self.groups = np.zeros(0, dtype=np.int32)
+        # group -> its rows, in chunks concatenated on the next search of the group
+        self.group_rows: dict[int, list[np.ndarray]] = {}
+        self.size = 0
+        self.deleted = 0
+        self.lock = threading.Lock()
+        self._grow(max(capacity, 1))
+
+    def _grow(self, capacity: int) -> None:
+        if self.path is None:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[: self.size] = self.vectors[: self.size]
+        else:
+            if self.capacity == 0:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.unlink(missing_ok=True)
+            else:
+                self.vectors.flush()
+            # Extending the file keeps the rows written so far; searches still running on
+            # the old mapping see the same rows.
+            with open(self.path, "ab") as f:
+                os.truncate(f.fileno(), capacity * self.dim * 4)
+            vectors = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        groups = np.full(capacity, -1, dtype=np.int32)
+        groups[: self.size] = self.groups[: self.size]
+        self.vectors, self.groups, self.capacity = vectors, groups, capacity
+
+    def add(self, vectors: np.ndarray, groups: np.ndarray) -> int:
+        """Append rows; return the index of the first one."""
+        with self.lock:
+            start, stop = self.size, self.size + len(vectors)
+            if stop > self.capacity:
+                self._grow(max(stop, 2 * self.capacity))
+            self.vectors[start:stop] = vectors
+            self.groups[start:stop] = groups
+            order = np.argsort(groups, kind="stable")
+            labels, firsts = np.unique(groups[order], return_index=True)
+            for label, rows in zip(labels.tolist(), np.split(order + start, firsts[1:])):
+                self.group_rows.setdefault(label, []).append(rows)
+            self.size = stop
+            return start
+
+    def remove(self, rows: Sequence[int]) -> None:
+        with self.lock:
+            rows = [row for row in rows if self.groups[row] >= 0]
+            self.groups[rows] = -1
+            self.deleted += len(rows)
+
+    def _rows(self, group: int) -> np.ndarray:
+        with self.lock:
+            parts = self.group_rows.get(group)
+            if not parts:
+                return np.zeros(0, dtype=np.int64)
+            if len(parts) > 1:
+                parts[:] = [np.concatenate(parts)]
+            return parts[0]
+
+    def search(self, queries: np.ndarray, k: int, group: int | None = None) -> list[list[tuple[float, int]]]:
+        """(score, row) of the k best rows per query, best first; only rows of `group` if given.
+
+        A group search reads only the rows of the group; otherwise every row is scanned.
+        """
+        with self.lock:
+            vectors, groups, size, deleted = self.vectors, self.groups, self.size, self.deleted
+        # Rows below `size` are never moved, so the snapshot can be searched without the lock.
+        rows = None
+        if group is not None:
+            rows = self._rows(group)
+            rows = rows[groups[rows] == group]
+            size = len(rows)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, size, self.block_rows):
+            stop = min(start + self.block_rows, size)
+            if rows is None:
+                scores = queries @ vectors[start:stop].T
+                if deleted:
+                    scores[:, groups[start:stop] < 0] = -np.inf
+                block = np.arange(start, stop)
+            else:
+                block = rows[start:stop]
+                scores = queries @ vectors[block].T
+            if stop - start > k:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, top, axis=1)
+                block = block[top]
+            else:
+                block = np.broadcast_to(block, scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, block], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(best_scores, -k, axis=1)[:, -k:]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind="stable")
+            results.append([(float(scores[i]), int(rows[i])) for i in order if scores[i] > -np.inf])
+        return results
+
+
+class RedisMemoryBackend:
+    """Memories stored in Redis, one hash per memory with its text and float32 vector.
+
+    Args:
+        redis_url: Redis connection URL, usually REDIS_URL.
+        prefix: Key prefix of the memories.
+        batch_size: Keys per SCAN page and per pipeline when loading.
+    """
+
+    def __init__(self, redis_url: str, *, prefix: str = "long_term_memory:", batch_size: int = 1000) -> None:
+        import redis
+
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.client = redis.Redis.from_url(redis_url)
+
+    def load(self) -> Iterator[tuple[Memory, np.ndarray]]:
+        keys = []
+        for key in self.client.scan_iter(match=self.prefix + "*", count=self.batch_size):
+            keys.append(key)
+            if len(keys) == self.batch_size:
+                yield from self._load(keys)
+                keys = []
+        yield from self._load(keys)
+
+    def _load(self, keys: list[bytes]) -> Iterator[tuple[Memory, np.ndarray]]:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        for key, fields in zip(keys, pipe.execute()):
+            if not fields:
+                continue
+            memory = Memory(
+                id=key.decode()[len(self.prefix):],
+                namespace=fields[b"namespace"].decode(),
+                kind=fields[b"kind"].decode(),
+                text=fields[b"text"].decode(),
+                created_at=float(fields[b"created_at"]),
+            )
+            yield memory, np.frombuffer(fields[b"vector"], dtype=np.float32)
+
+    def save(self, items: Sequence[tuple[Memory, np.ndarray]]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for memory, vector in items:
+            pipe.hset(self.prefix + memory.id, mapping={
+                "namespace": memory.namespace,
+                "kind": memory.kind,
+                "text": memory.text,
+                "created_at": memory.created_at,
+                "vector": vector.astype(np.float32).tobytes(),
+            })
+        pipe.execute()
+
+    def delete(self, ids: Sequence[str]) -> None:
+        if ids:
+            self.client.unlink(*(self.prefix + id for id in ids))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class LongTermMemory:
+    """User facts and turn summaries shared across threads, recalled by vector similarity.
+
+    Args:
+        backend: RedisMemoryBackend to persist memories in, loaded at start. None keeps
+            them in this process only.
+        embed: Turns a text into a vector. Defaults to HashingVectorizer(dim, FUNCTION_WORDS); any embedding
+            model works, e.g. lambda text: np.array(OpenAIEmbeddings().embed_query(text)).
+        dim: Vector size, the output size of embed.
+        index_path: Memory-map the vector matrix from this file instead of holding it in RAM.
+        capacity: Initial rows of the index.
+    """
+
+    def __init__(
+        self,
+        backend: RedisMemoryBackend | None = None,
+        *,
+        embed: Callable[[str], np.ndarray] | None = None,
+        dim: int = 256,
+        index_path: str | Path | None = None,
+        capacity: int = 1024,
+    ) -> None:
+        self.backend = backend
+        self.embed = embed or HashingVectorizer(dim, FUNCTION_WORDS)
+        self.index = VectorIndex(dim, capacity=capacity, path=index_path)
+        self.memories: dict[str, Memory] = {}
+        self.rows: dict[str, int] = {}
+        # row -> memory ID, None for deleted rows
+        self.row_ids: list[str | None] = []
+        self.namespaces: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self._stats = LongTermMemoryStats()
+        if backend is not None:
+            batch = []
+            for item in backend.load():
+                batch.append(item)
+                if len(batch) == 10_000:
+                    with self.lock:
+                        self._insert(batch)
+                    batch = []
+            with self.lock:
+                self._insert(batch)
+
+    def stats(self) -> LongTermMemoryStats:
+        """Return a snapshot of the memory counters."""
+        with self.lock:
+            return LongTermMemoryStats(**{**vars(self._stats), "memories": len(self.memories)})
+
+    def __len__(self) -> int:
+        return len(self.memories)
+
+    def get(self, id: str) -> Memory | None:
+        return self.memories.get(id)
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _insert(self, items: Sequence[tuple[Memory, np.ndarray]]) -> None:
+        # Callers hold self.lock.
+        if not items:
+            return
+        groups = np.array([self.namespaces.setdefault(m.namespace, len(self.namespaces)) for m, _ in items], dtype=np.int32)
+        first = self.index.add(np.stack([vector for _, vector in items]), groups)
+        for row, (memory, _) in enumerate(items, first):
+            self.memories[memory.id] = memory
+            self.rows[memory.id] = row
+            self.row_ids.append(memory.id)
+
+    def remember(
+        self,
+        texts: str | Sequence[str],
+        *,
+        namespace: str = DEFAULT_NAMESPACE,
+        kind: str = "fact",
+        vectors: np.ndarray | None = None,
+    ) -> list[str]:
+        """Store texts as memories; return their IDs. Texts already stored are not added again.
+
+        vectors are the embeddings of texts when they are already computed, e.g. by one
+        batch call to an embedding model; they must be unit vectors.
+        """
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        ids = [memory_id(namespace, kind, text) for text in texts]
+        now = time.time()
+        # Texts already stored are not embedded; the check that counts is the one under the
+        # lock below, since another thread may store the same text meanwhile.
+        candidates, batch = [], set()
+        for i, (id, text) in enumerate(zip(ids, texts)):
+            if id not in self.memories and id not in batch:
+                batch.add(id)
+                vector = self._vector(text) if vectors is None else vectors[i]
+                candidates.append((Memory(id, namespace, kind, text.strip(), now), vector))
+        with self.lock:
+            items = [(memory, vector) for memory, vector in candidates if memory.id not in self.memories]
+            self._insert(items)
+            self._stats.inserts += len(items)
+            self._stats.duplicates += len(texts) - len(items)
+        if items and self.backend is not None:
+            self.backend.save(items)
+        return ids
+
+    def forget(self, ids: Sequence[str]) -> None:
+        with self.lock:
+            rows = [self.rows.pop(id) for id in ids if id in self.rows]
+            for id in ids:
+                self.memories.pop(id, None)
+            for row in rows:
+                self.row_ids[row] = None
+            self._stats.deletes += len(rows)
+        self.index.remove(rows)
+        if self.backend is not None:
+            self.backend.delete(list(ids))
+
+    def recall_batch(
+        self, queries: Sequence[str], *, namespace: str | None = DEFAULT_NAMESPACE, k: int = 3, min_score: float = 0.0
+    ) -> list[list[tuple[float, Memory]]]:
+        """(score, Memory) of the k memories most similar to each query, best first.
+
+        All queries are answered with one pass over the index. namespace=None searches all users.
+        """
+        if not queries:
+            return []
+        start = time.perf_counter()
+        group = None
+        if namespace is not None:
+            if (group := self.namespaces.get(namespace)) is None:
+                return [[] for _ in queries]
+        hits = self.index.search(np.stack([self._vector(query) for query in queries]), k, group)
+        results = []
+        for matches in hits:
+            # A row added while searching may not have its ID yet; it is skipped.
+            ids = [(score, self.row_ids[row] if row < len(self.row_ids) else None) for score, row in matches if score >= min_score]
+            results.append([(score, self.memories[id]) for score, id in ids if id in self.memories])
+        with self.lock:
+            self._stats.searches += 1
+            self._stats.queries += len(queries)
+            self._stats.search_seconds += time.perf_counter() - start
+        return results
+
+    def recall(
+        self, query: str, *, namespace: str | None = DEFAULT_NAMESPACE, k: int = 3, min_score: float = 0.0
+    ) -> list[tuple[float, Memory]]:
+        return self.recall_batch([query], namespace=namespace, k=k, min_score=min_score)[0]
+
+
+# ---------------------------------------------------------------- middleware
+
+
+class LongTermMemoryState(AgentState):
+    recalled_memories: NotRequired[Annotated[list[str], PrivateStateAttr]]
+
+
+@dataclass
+class LongTermMemoryMiddlewareStats:
+    turns: int = 0
+    recalled: int = 0
+    summaries: int = 0
+    summary_failures: int = 0
+
+
+def _current_turn(messages: Sequence[AnyMessage]) -> list[AnyMessage]:
+    start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+    return list(messages[start:])
+
+
+class LongTermMemoryMiddleware(AgentMiddleware[LongTermMemoryState]):
+    """Recalls relevant long-term memories into the prompt and lets the model store new ones.
+
+    Args:
+        memory: The LongTermMemory to read and write.
+        k: Memories added to the system prompt per turn.
+        min_score: Minimum similarity of a recalled memory.
+        summary_model: Model that writes a one-sentence summary of every turn, stored as a
+            "summary" memory. A spec for init_chat_model or a chat model; None stores none.
+            Async runs write it in the background; call adrain() before the event loop closes.
+        namespace_key: Key of config["configurable"] holding the user the memories belong to.
+    """
+
+    state_schema = LongTermMemoryState
+
+    def __init__(
+        self,
+        memory: LongTermMemory,
+        *,
+        k: int = 3,
+        min_score: float = 0.2,
+        summary_model: str | BaseChatModel | None = None,
+        namespace_key: str = "user_id",
+    ) -> None:
+        super().__init__()
+        self.memory = memory
+        self.k = k
+        self.min_score = min_score
+        self.summary_model = init_chat_model(summary_model) if isinstance(summary_model, str) else summary_model
+        self.namespace_key = namespace_key
+        self.lock = threading.Lock()
+        self._stats = LongTermMemoryMiddlewareStats()
+        # Turn summaries being written in the background; a reference keeps each task alive.
+        self.summary_tasks: set[asyncio.Task] = set()
+
+        @tool
+        def remember(fact: str, runtime: ToolRuntime) -> str:
+            """Save a lasting fact about the user (name, preferences, plans, decisions) for future conversations."""
+            memory.remember(fact, namespace=self._namespace(runtime.config))
+            return "Saved to long-term memory."
+
+        @tool
+        def recall(query: str, runtime: ToolRuntime) -> str:
+            """Search long-term memory for what the user said in earlier conversations."""
+            found = memory.recall(query, namespace=self._namespace(runtime.config), k=5, min_score=self.min_score)
+            return "\n".join(f"- {m.text}" for _, m in found) or "Nothing relevant in long-term memory."
+
+        self.tools = [remember, recall]
+
+    def stats(self) -> LongTermMemoryMiddlewareStats:
+        """Return a snapshot of the middleware counters."""
+        with self.lock:
+            return LongTermMemoryMiddlewareStats(**vars(self._stats))
+
+    def _namespace(self, config: RunnableConfig | None = None) -> str:
+        config = get_config() if config is None else config
+        return str(config.get("configurable", {}).get(self.namespace_key, DEFAULT_NAMESPACE))
+
+    def _recalled(self, state: LongTermMemoryState) -> dict[str, Any]:
+        turn = _current_turn(state["messages"])
+        query = turn[0].text if turn and isinstance(turn[0], HumanMessage) else ""
+        found = self.memory.recall(query, namespace=self._namespace(), k=self.k, min_score=self.min_score) if query else []
+        with self.lock:
+            self._stats.turns += 1
+            self._stats.recalled += len(found)
+        return {"recalled_memories": [memory.text for _, memory in found]}
+
+    def before_agent(self, state: LongTermMemoryState, runtime: Runtime) -> dict[str, Any] | None:
+        return self._recalled(state)
+
+    async def abefore_agent(self, state: LongTermMemoryState, runtime: Runtime) -> dict[str, Any] | None:
+        # A search over a large index takes milliseconds of CPU; keep it off the event loop.
+        return await asyncio.to_thread(self._recalled, state)
+
+    def _store_summary(self, summary: str, namespace: str) -> None:
+        if summary:
+            self.memory.remember(summary, namespace=namespace, kind="summary")
+            with self.lock:
+                self._stats.summaries += 1
+
+    def _failed(self, e: Exception) -> None:
+        logger.warning("Turn summary failed, not stored: %s", e)
+        with self.lock:
+            self._stats.summary_failures += 1
+
+    def after_agent(self, state: LongTermMemoryState, runtime: Runtime) -> dict[str, Any] | None:
+        if self.summary_model is None:
+            return None
+        prompt = TURN_SUMMARY_PROMPT.format(messages=get_buffer_string(_current_turn(state["messages"])))
+        try:
+            # Tagged nostream, so the summary tokens do not show up in stream_mode="messages".
+            response = self.summary_model.invoke(prompt, {"tags": [TAG_NOSTREAM]})
+        except Exception as e:
+            self._failed(e)
+            return None
+        self._store_summary(response.text.strip(), self._namespace())
+        return None
+
+    async def _summarize(self, prompt: str, namespace: str) -> None:
+        try:
+            response = await self.summary_model.ainvoke(prompt, {"tags": [TAG_NOSTREAM]})
+            await asyncio.to_thread(self._store_summary, response.text.strip(), namespace)
+        except Exception as e:
+            self._failed(e)
+
+    async def aafter_agent(self, state: LongTermMemoryState, runtime: Runtime) -> dict[str, Any] | None:
+        if self.summary_model is None:
+            return None
+        prompt = TURN_SUMMARY_PROMPT.format(messages=get_buffer_string(_current_turn(state["messages"])))
+        # An empty context, so the summary call is not traced as part of a run that has ended.
+        task = asyncio.create_task(self._summarize(prompt, self._namespace()), context=contextvars.Context())
+        self.summary_tasks.add(task)
+        task.add_done_callback(self.summary_tasks.discard)
+        return None
+
+    async def adrain(self) -> None:
+        """Wait for the turn summaries this event loop is still writing."""
+        loop = asyncio.get_running_loop()
+        while tasks := [task for task in self.summary_tasks if task.get_loop() is loop]:
+            await asyncio.gather(*tasks)
+
+    # ---------------------------------------------------------------- prompt
+
+    def _with_memories(self, request: ModelRequest) -> ModelRequest:
+        if not (memories := request.state.get("recalled_memories")):
+            return request
+        section = MEMORY_HEADING + "\n" + "\n".join(f"- {text}" for text in memories)
+        system_prompt = f"{request.system_prompt}\n\n{section}" if request.system_prompt else section
+        return request.override(system_prompt=system_prompt)
+
+    def wrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        return handler(self._with_memories(request))
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        return await handler(self._with_memories(request))
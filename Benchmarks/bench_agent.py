@@ -0,0 +1,237 @@
+from dotenv import load_dotenv
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Benchmarks.fake_chat_model import ScriptedChatModel, split_tokens, tool_call
+from Benchmarks.fake_redis_saver import FakeRedisSaver
+
+
+# Offline benchmark of create_agent graphs, driven by ScriptedChatModel (no API key).
+# For every scenario x checkpointer x stream mode it runs a number of turns and measures:
+#   ttft                time from the call to the first token of the answer
+#   tokens_per_second   answer tokens delivered per second of turn time
+#   superstep overhead  turn time not spent waiting on the model, per superstep
+#   checkpoint cost     turn time above the same cell without a checkpointer
+# Checkpointers: none, InMemorySaver, and Redis (AsyncRedisSaver on REDIS_URL, otherwise
+# FakeRedisSaver, a local stub with a simulated round trip). Stream modes: "values",
+# "updates", "messages" and astream_events v2. Results are written to JSON so runs can be
+# compared across langchain/langgraph upgrades with --baseline.
+#
+#   uv run Benchmarks/bench_agent.py
+#   uv run Benchmarks/bench_agent.py --tokens-per-second 50 --first-token-ms 200
+#   uv run Benchmarks/bench_agent.py --baseline Benchmarks/results/<previous run>.json
+
+load_dotenv()
+
+ANSWER = "The capital of the USA is Washington, D.C. It has been the capital since 1800."
+PACKAGES = ["langchain", "langchain-core", "langgraph", "langgraph-checkpoint", "langgraph-checkpoint-redis"]
+CHECKPOINTERS = ["none", "memory", "redis"]
+STREAM_MODES = ["values", "updates", "messages", "events"]
+
+
+@tool
+def lookup(query: str) -> str:
+    """Look up a fact."""
+    return f"Washington, D.C. is the answer to {query!r}."
+
+
+# scenario -> (script of one turn, supersteps of one turn)
+SCENARIOS = {
+    "chat": ([AIMessage(content=ANSWER)], 1),
+    "tool": ([tool_call("lookup", query="capital of the USA"), AIMessage(content=ANSWER)], 3),
+}
+
+
+@asynccontextmanager
+async def checkpointer(name: str):
+    if name == "none":
+        yield None
+    elif name == "memory":
+        yield InMemorySaver()
+    elif not os.getenv("REDIS_URL"):
+        yield FakeRedisSaver()
+    else:
+        from langgraph.checkpoint.redis import AsyncRedisSaver
+
+        async with AsyncRedisSaver.from_conn_string(os.environ["REDIS_URL"]) as saver:
+            await saver.asetup()
+            yield saver
+
+
+def is_answer(message) -> bool:
+    return isinstance(message, AIMessage) and bool(message.content)
+
+
+async def run_turn(agent, mode: str, input: dict, config: dict) -> float | None:
+    """Stream one turn and return the time to the first answer token."""
+    start = time.perf_counter()
+    first_token = None
+    if mode == "events":
+        async for event in agent.astream_events(input, config, version="v2"):
+            if first_token is None and event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
+                first_token = time.perf_counter() - start
+        return first_token
+
+    async for chunk in agent.astream(input, config, stream_mode=mode):
+        if first_token is not None:
+            continue
+        if mode == "messages":
+            found = isinstance(chunk[0], AIMessageChunk) and bool(chunk[0].content)
+        elif mode == "values":
+            found = is_answer(chunk["messages"][-1])
+        else:
+            found = any(is_answer(m) for update in chunk.values() if update for m in update.get("messages", []))
+        if found:
+            first_token = time.perf_counter() - start
+    return first_token
+
+
+def percentile(samples: list[float], q: int) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def bench(scenario: str, saver_name: str, mode: str, args) -> dict:
+    script, supersteps = SCENARIOS[scenario]
+    model = ScriptedChatModel(
+        script=script,
+        tokens_per_second=args.tokens_per_second,
+        first_token_seconds=args.first_token_ms / 1000,
+    )
+    model_seconds = sum(model.seconds_per_call(message) for message in script)
+    answer_tokens = len(split_tokens(ANSWER))
+
+    turns, ttfts = [], []
+    # Start every cell from a clean heap so one cell's garbage is not collected in the next.
+    gc.collect()
+    async with checkpointer(saver_name) as saver:
+        agent = create_agent(model=model, tools=[lookup], checkpointer=saver)
+        for turn in range(args.warmup + args.turns):
+            # A fresh thread per turn, so checkpoint cost does not depend on history length.
+            config = {"configurable": {"thread_id": f"bench-{scenario}-{saver_name}-{mode}-{turn}"}}
+            input = {"messages": [{"role": "user", "content": "What is the capital of the USA?"}]}
+            start = time.perf_counter()
+            ttft = await run_turn(agent, mode, input, config)
+            elapsed = time.perf_counter() - start
+            if turn >= args.warmup:
+                turns.append(elapsed)
+                ttfts.append(ttft)
+
+    turn_p50 = percentile(turns, 50)
+    return {
+        "scenario": scenario,
+        "checkpointer": saver_name,
+        "stream_mode": mode,
+        "turns": args.turns,
+        "turn_ms_p50": turn_p50 * 1000,
+        "turn_ms_p99": percentile(turns, 99) * 1000,
+        "ttft_ms_p50": percentile(ttfts, 50) * 1000,
+        "ttft_ms_p99": percentile(ttfts, 99) * 1000,
+        "tokens_per_second": answer_tokens / turn_p50,
+        "superstep_overhead_ms": (turn_p50 - model_seconds) / supersteps * 1000,
+    }
+
+
+def add_checkpoint_cost(results: list[dict]) -> None:
+    """Turn time of each cell above the same scenario and stream mode without a checkpointer."""
+    baseline = {(r["scenario"], r["stream_mode"]): r["turn_ms_p50"] for r in results if r["checkpointer"] == "none"}
+    for result in results:
+        none_ms = baseline.get((result["scenario"], result["stream_mode"]))
+        result["checkpoint_ms"] = None if none_ms is None else result["turn_ms_p50"] - none_ms
+
+
+def environment() -> dict:
+    packages = {}
+    for package in PACKAGES:
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": packages,
+        "redis": "AsyncRedisSaver" if os.getenv("REDIS_URL") else "FakeRedisSaver",
+    }
+
+
+def compare(results: list[dict], baseline_path: Path, max_regression: float) -> int:
+    """Print the change of every cell against a previous run and return the number of regressions."""
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nAgainst {baseline_path} ({baseline['environment']['packages']}):")
+    before = {(r["scenario"], r["checkpointer"], r["stream_mode"]): r for r in baseline["results"]}
+    regressions = 0
+    for result in results:
+        old = before.get((result["scenario"], result["checkpointer"], result["stream_mode"]))
+        if old is None:
+            continue
+        change = result["turn_ms_p50"] / old["turn_ms_p50"] - 1
+        regressed = change > max_regression
+        regressions += regressed
+        print(f"  {result['scenario']:>5} {result['checkpointer']:>7} {result['stream_mode']:>9}: "
+              f"{old['turn_ms_p50']:7.2f} -> {result['turn_ms_p50']:7.2f} ms ({change:+.1%})"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline create_agent benchmark")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="0 streams without delay")
+    parser.add_argument("--first-token-ms", type=float, default=0)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--checkpointers", nargs="+", choices=CHECKPOINTERS, default=CHECKPOINTERS)
+    parser.add_argument("--modes", nargs="+", choices=STREAM_MODES, default=STREAM_MODES)
+    parser.add_argument("--output", type=Path, help="Defaults to Benchmarks/results/<timestamp>.json")
+    parser.add_argument("--baseline", type=Path, help="Previous results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Allowed slowdown of turn p50")
+    args = parser.parse_args()
+
+    results = []
+    for scenario in args.scenarios:
+        for saver_name in args.checkpointers:
+            for mode in args.modes:
+                result = await bench(scenario, saver_name, mode, args)
+                results.append(result)
+                print(f"{scenario:>5} {saver_name:>7} {mode:>9}: "
+                      f"turn p50={result['turn_ms_p50']:7.2f} ms p99={result['turn_ms_p99']:7.2f} ms  "
+                      f"ttft p50={result['ttft_ms_p50']:7.2f} ms  "
+                      f"{result['tokens_per_second']:8.0f} tokens/s  "
+                      f"superstep overhead={result['superstep_overhead_ms']:5.2f} ms")
+    add_checkpoint_cost(results)
+    print("\nCheckpoint cost per turn:")
+    for result in results:
+        if result["checkpointer"] != "none" and result["checkpoint_ms"] is not None:
+            print(f"{result['scenario']:>5} {result['checkpointer']:>7} {result['stream_mode']:>9}: "
+                  f"{result['checkpoint_ms']:7.2f} ms")
+
+    env = environment()
+    settings = {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}
+    output = args.output or Path(__file__).parent / "results" / f"{env['timestamp'].replace(':', '-')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"environment": env, "settings": settings, "results": results}, indent=2))
+    print(f"\nWrote {output}")
+
+    if args.baseline and compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
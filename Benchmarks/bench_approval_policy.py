@@ -0,0 +1,135 @@
+from langchain.agents import create_agent
+from langchain.agents.middleware import HumanInTheLoopMiddleware
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from pathlib import Path
+import asyncio
+import gc
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Benchmarks.bench_agent import ANSWER, lookup
+from Benchmarks.fake_chat_model import ScriptedChatModel, tool_call
+from HumanInTheLoop.approval_policy import ApprovalPolicy, ApprovalRule, PolicyHumanInTheLoopMiddleware
+from HumanInTheLoop.approval_queue import ApprovalQueue
+
+
+# What an approval policy saves in a HITL flow where every lookup needs approval.
+# Each turn calls lookup once. Queries are a mix of routine ones (matched by a rule),
+# repeats of earlier queries with different case and punctuation (matched by fingerprint
+# once a human approved them) and new ones. A simulated reviewer approves everything
+# pending after REVIEW_SECONDS. Variants, run turn by turn:
+#   interrupt_on    HumanInTheLoopMiddleware, every call waits for the reviewer
+#   policy          PolicyHumanInTheLoopMiddleware with the rules below
+# Then the cost of one policy evaluation, with RULES rules and a warm fingerprint cache.
+#
+#   uv run Benchmarks/bench_approval_policy.py
+
+TURNS = 100
+REVIEW_SECONDS = 0.05
+EVALUATIONS = 100_000
+RULES = 50
+SEED = 5
+CITIES = ["Paris", "Tokyo", "Lisbon", "Kyoto", "Lima", "Oslo", "Cairo", "Hanoi"]
+
+
+def queries(rng: random.Random) -> list[str]:
+    result = []
+    for _ in range(TURNS):
+        kind = rng.random()
+        if kind < 0.4:
+            result.append(f"weather in {rng.choice(CITIES)} in {rng.choice(['May', 'June', 'July'])}")
+        elif kind < 0.7 and result:
+            result.append(rng.choice(result).upper() + "?")
+        else:
+            result.append(f"best neighborhood to stay in {rng.choice(CITIES)} for {rng.randint(2, 9)} nights")
+    return result
+
+
+QUERIES = queries(random.Random(SEED))
+
+
+def rules() -> list[ApprovalRule]:
+    return [
+        ApprovalRule("lookup", {"query": r"(?i)\b(weather|visa|currency|time ?zone)\b"}),
+        ApprovalRule("lookup", {"query": r"(?i)\b(passport|payment|card)\b"}, decision="review"),
+    ]
+
+
+def build(middleware):
+    return create_agent(
+        model=ScriptedChatModel(script=[message for q in QUERIES for message in (tool_call("lookup", query=q), AIMessage(content=ANSWER))]),
+        tools=[lookup],
+        checkpointer=InMemorySaver(),
+        middleware=[middleware],
+    )
+
+
+async def turn(approvals: ApprovalQueue, thread_id: str, content: str) -> int:
+    """One turn with a reviewer who approves after REVIEW_SECONDS. Returns the interrupts."""
+    interrupts = 0
+    async for _ in approvals.stream(thread_id, {"messages": [{"role": "user", "content": content}]}):
+        pass
+    while pending := await approvals.pending():
+        interrupts += 1
+        await asyncio.sleep(REVIEW_SECONDS)
+        async for _ in approvals.decide(thread_id, [{"type": "approve"}] * len(pending[0].action_requests)):
+            pass
+    return interrupts
+
+
+def microbenchmark(rng: random.Random) -> None:
+    many = [ApprovalRule(f"tool_{n}", {"path": rf"^/srv/{n}/", "mode": ["r", "rw"]}) for n in range(RULES - 2)] + rules()
+    policy = ApprovalPolicy(many)
+    for query in QUERIES:
+        policy.record_approval("lookup", {"query": query})
+    calls = [{"query": rng.choice(QUERIES) if rng.random() < 0.5 else f"flights to {rng.choice(CITIES)}"} for _ in range(EVALUATIONS)]
+    gc.collect()
+    start = time.perf_counter()
+    for args in calls:
+        policy.evaluate("lookup", args)
+    elapsed = time.perf_counter() - start
+    stats = policy.stats()
+    print(
+        f"evaluate: {elapsed / EVALUATIONS * 1e6:.2f} µs/call over {EVALUATIONS} calls, {RULES} rules"
+        f"  (rule {stats.approved_by_rule}, fingerprint {stats.approved_by_fingerprint}, review {stats.reviewed})"
+    )
+
+
+async def main():
+    policy = ApprovalPolicy(rules(), assumed_wait_seconds=REVIEW_SECONDS)
+    variants = {
+        "interrupt_on": ApprovalQueue(build(HumanInTheLoopMiddleware(interrupt_on={"lookup": True}))),
+        "policy": ApprovalQueue(build(PolicyHumanInTheLoopMiddleware(interrupt_on={"lookup": True}, policy=policy))),
+    }
+    samples = {name: [] for name in variants}
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for index, query in enumerate(QUERIES):
+        for name, approvals in variants.items():
+            start = time.perf_counter()
+            interrupts = await turn(approvals, name, f"Question {index}: {query}")
+            samples[name].append((time.perf_counter() - start, interrupts))
+
+    for name, results in samples.items():
+        print(
+            f"{name:12}: interrupts={sum(r[1] for r in results):3}/{TURNS}"
+            f"  turn p50={statistics.median(r[0] for r in results) * 1000:6.2f} ms"
+            f"  mean={statistics.mean(r[0] for r in results) * 1000:6.2f} ms"
+            f"  total={sum(r[0] for r in results):5.2f} s"
+        )
+    stats = policy.stats()
+    print(
+        f"policy stats: auto-approved {stats.auto_approval_rate:.0%} (rule {stats.approved_by_rule},"
+        f" fingerprint {stats.approved_by_fingerprint}), reviewed {stats.reviewed},"
+        f" measured wait {stats.human_wait_seconds / max(stats.human_approvals, 1) * 1000:.0f} ms,"
+        f" saved {stats.seconds_saved:.2f} s, evaluation {stats.evaluation_seconds / max(stats.evaluations, 1) * 1e6:.1f} µs/call"
+    )
+    microbenchmark(random.Random(SEED))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+from deepagents import create_deep_agent
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from pathlib import Path
+import argparse
+import gc
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_metrics import AgentMetrics
+from Agent_Memory.delta_serializer import DeltaSerializer
+from Benchmarks.fake_chat_model import ScriptedChatModel
+from Tools.artifact_store import ArtifactBackend, ArtifactStore, DiskBlobs, referenced_artifacts
+from Tools.bench_result_budget import page
+from Tools.internet_search import CachedSearch, make_internet_search
+from Tools.result_budget import ResultBudget
+
+
+# State size and per-step cost of a long research run of create_deep_agent, with the
+# default StateBackend and with ArtifactBackend on DiskBlobs. Both savers use DeltaSerializer,
+# so the growing message list costs the same on both sides. Every turn of the one thread:
+#   internet_search (raw content, ResultBudget of 2000 tokens) -> write_file a 6 KB note ->
+#   edit_file the report to append a 3 KB section -> read_file the note -> answer
+# Per window of turns:
+#   bytes/ckpt   bytes stored per checkpoint: the saver's blobs, checkpoints and writes,
+#                plus the blobs of DeltaSerializer and of the artifact store
+#   state        size of the thread's latest `files` channel, serialized
+#   put mean     mean time of one saver.put, serialization included (AgentMetrics histogram)
+#   step p50     turn time divided by its supersteps
+# At the end, the thread is deleted and collect() sweeps the blobs nothing refers to.
+#
+#   uv run Benchmarks/bench_artifact_store.py
+#   uv run Benchmarks/bench_artifact_store.py --turns 100
+
+TURNS = 60
+BUCKET = 20
+CONFIG = {"configurable": {"thread_id": "1"}}
+NOTE = "Finding {turn}.{line}: LangGraph persists the state of a thread in checkpoints after every superstep."
+SECTION = "## Topic {turn}\n" + "LangGraph agents resume from the latest checkpoint of their thread. " * 45
+
+
+class StubTavilyClient:
+    def search(self, query, max_results, topic, include_raw_content):
+        rng = random.Random(query)
+        results = [{
+            "url": f"https://www.site{site}.example/{query.replace(' ', '-')}",
+            "title": f"{query} #{site}",
+            "content": "LangGraph checkpointers persist graph state per thread.",
+            "raw_content": page(rng, [site]),
+        } for site in range(max_results)]
+        return {"query": query, "results": results}
+
+
+class ResearchModel(ScriptedChatModel):
+    """Fake model that plays one research turn: search, note, report section, read back, answer."""
+
+    def _next_message(self, messages):
+        human = [index for index, message in enumerate(messages) if message.type == "human"]
+        turn, step = len(human) - 1, sum(message.type == "ai" for message in messages[human[-1]:])
+        note = f"/notes/topic_{turn}.md"
+        if step == 2 and turn == 0:
+            call = ("write_file", {"file_path": "/report.md", "content": "# Report\n<!-- next -->"})
+        elif step == 2:
+            call = ("edit_file", {"file_path": "/report.md", "old_string": "<!-- next -->", "new_string": SECTION.format(turn=turn) + "\n<!-- next -->"})
+        else:
+            call = [
+                ("internet_search", {"query": f"langgraph topic {turn}", "include_raw_content": True}),
+                ("write_file", {"file_path": note, "content": "\n".join(NOTE.format(turn=turn, line=line) for line in range(60))}),
+                None,
+                ("read_file", {"file_path": note, "limit": 20}),
+                None,
+            ][step]
+        if call is None:
+            return AIMessage(content=f"Topic {turn} is covered in /report.md.")
+        return AIMessage(content="", tool_calls=[{"name": call[0], "args": call[1], "id": f"call_{turn}_{step}"}])
+
+
+class Variant:
+    def __init__(self, name: str, artifacts: ArtifactStore | None = None):
+        self.name = name
+        self.artifacts = artifacts
+        self.serde = DeltaSerializer()
+        self.saver = InMemorySaver(serde=self.serde)
+        self.metrics = AgentMetrics()
+        # Flagged as sampled for the checkpoint write timer only, without the callback handler.
+        self.config = {**CONFIG, "configurable": {**CONFIG["configurable"], self.metrics.sampled_key: True}}
+        search = make_internet_search(CachedSearch(StubTavilyClient()), budget=ResultBudget(max_tokens=2000), artifacts=artifacts)
+        self.agent = create_deep_agent(
+            model=ResearchModel(script=[AIMessage(content="")]),
+            tools=[search],
+            checkpointer=self.metrics.instrument(self.saver),
+            backend=(lambda runtime: ArtifactBackend(runtime, artifacts)) if artifacts else None,
+        )
+
+    def stored_bytes(self) -> int:
+        saver = self.saver
+        total = sum(len(typed[1]) for typed in saver.blobs.values())
+        total += sum(len(c[1]) + len(m[1]) for checkpoints in saver.storage.values() for ns in checkpoints.values() for c, m, _ in ns.values())
+        total += sum(len(w[2][1]) for writes in saver.writes.values() for w in writes.values())
+        return total + self.serde.store.nbytes + (self.artifacts.stats().bytes_written if self.artifacts else 0)
+
+    def checkpoints(self) -> int:
+        return sum(len(ns) for checkpoints in self.saver.storage.values() for ns in checkpoints.values())
+
+    def state_bytes(self) -> int:
+        files = self.agent.get_state(CONFIG).values.get("files", {})
+        return len(self.saver.serde.dumps_typed(files)[1])
+
+    def turn(self, index: int) -> tuple[float, int]:
+        start = time.perf_counter()
+        steps = sum(1 for _ in self.agent.stream({"messages": [{"role": "user", "content": f"Research topic {index}."}]}, self.config, stream_mode="updates"))
+        return time.perf_counter() - start, steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="State size and step cost of a deep agent with ArtifactBackend")
+    parser.add_argument("--turns", type=int, default=TURNS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        artifacts = ArtifactStore(DiskBlobs(root))
+        variants = [Variant("StateBackend"), Variant("ArtifactBackend", artifacts)]
+        marks = {variant.name: (0, 0) for variant in variants}
+        steps = {variant.name: [] for variant in variants}
+        gc.collect()
+        for index in range(args.turns):
+            # Variants take turns, so drift in machine speed hits all of them alike.
+            for variant in variants:
+                seconds, supersteps = variant.turn(index)
+                steps[variant.name].append(seconds / supersteps)
+            if (index + 1) % BUCKET:
+                continue
+            print(f"turns {index + 2 - BUCKET:3}-{index + 1:3}")
+            for variant in variants:
+                stored, checkpoints = variant.stored_bytes(), variant.checkpoints()
+                per_checkpoint = (stored - marks[variant.name][0]) / max(checkpoints - marks[variant.name][1], 1)
+                marks[variant.name] = (stored, checkpoints)
+                put = variant.metrics.stats().get('agent_checkpoint_write_seconds{op="put"}')
+                variant.metrics.histograms.clear()
+                step = statistics.median(steps[variant.name][-BUCKET:])
+                print(
+                    f"  {variant.name:15} bytes/ckpt={per_checkpoint:9,.0f}  total={stored / 1e6:6.2f} MB  state={variant.state_bytes() / 1e3:7.1f} KB"
+                    f"  put mean={put.total / put.count * 1000:5.2f} ms  step p50={step * 1000:6.2f} ms"
+                )
+
+        saver = variants[1].saver
+        live = referenced_artifacts(saver)
+        saver.delete_thread("1")
+        collected = artifacts.collect(referenced_artifacts(saver), grace_seconds=0)
+        stats = artifacts.stats()
+        print(
+            f"artifacts: blobs written={stats.blobs_written} ({stats.bytes_written / 1e6:.2f} MB)  referenced={len(live)}"
+            f"  reads={stats.reads} (cache hits {stats.cache_hits})  collected after delete_thread={collected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from pathlib import Path
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_metrics import AgentMetrics
+from Agent_Memory.delta_serializer import DeltaSerializer, MemoryBlobStore, RedisBlobStore
+from Benchmarks.bench_agent import ANSWER
+from Benchmarks.fake_chat_model import ScriptedChatModel
+
+
+# Checkpoint size and speed over one long conversation on InMemorySaver, with the default
+# serializer and with DeltaSerializer (plain and zstd). Per window of turns:
+#   bytes/ckpt   bytes stored per checkpoint: the saver's blobs, checkpoints and writes,
+#                plus the blob store for DeltaSerializer
+#   put p50      time of one saver.put, serialization included (AgentMetrics histogram)
+#   read warm    get_tuple of the thread with the serializer's caches as they are
+#   read cold    get_tuple with a new serializer on the same blob store (a restarted process)
+# With REDIS_URL set, it then checks a round trip through RedisSaver: REDIS_TURNS turns,
+# and the thread read back by a new saver and serializer must hold the same messages.
+#
+#   uv run Benchmarks/bench_delta_serializer.py
+#   uv run Benchmarks/bench_delta_serializer.py --turns 1000
+
+TURNS = 500
+REDIS_TURNS = 20
+BUCKET = 100
+READS = 20
+CONFIG = {"configurable": {"thread_id": "1"}}
+
+
+class Variant:
+    def __init__(self, name: str, compression_level: int | None = None, delta: bool = True):
+        self.name = name
+        self.store = MemoryBlobStore() if delta else None
+        self.compression_level = compression_level
+        self.saver = InMemorySaver(serde=self.serde()) if delta else InMemorySaver()
+        self.metrics = AgentMetrics()
+        # Flagged as sampled for the checkpoint write timer only, without the callback handler.
+        self.config = {**CONFIG, "configurable": {**CONFIG["configurable"], self.metrics.sampled_key: True}}
+        model = ScriptedChatModel(script=[AIMessage(content=ANSWER)])
+        self.agent = create_agent(
+            model=model,
+            system_prompt="You are an AI chatbot that will response to user query.",
+            checkpointer=self.metrics.instrument(self.saver),
+        )
+
+    def serde(self) -> DeltaSerializer:
+        return DeltaSerializer(store=self.store, compression_level=self.compression_level)
+
+    def stored_bytes(self) -> int:
+        saver = self.saver
+        total = sum(len(typed[1]) for typed in saver.blobs.values())
+        total += sum(len(c[1]) + len(m[1]) for checkpoints in saver.storage.values() for ns in checkpoints.values() for c, m, _ in ns.values())
+        total += sum(len(w[2][1]) for writes in saver.writes.values() for w in writes.values())
+        return total + (self.store.nbytes if self.store else 0)
+
+    def checkpoints(self) -> int:
+        return sum(len(ns) for checkpoints in self.saver.storage.values() for ns in checkpoints.values())
+
+    def read(self, cold: bool) -> float:
+        if cold and self.store is not None:
+            self.saver.serde = self.serde()
+        start = time.perf_counter()
+        self.saver.get_tuple(CONFIG)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint size and speed of DeltaSerializer")
+    parser.add_argument("--turns", type=int, default=TURNS)
+    args = parser.parse_args()
+
+    variants = [Variant("default", delta=False), Variant("delta"), Variant("delta + zstd", compression_level=3)]
+    marks = {variant.name: (0, 0) for variant in variants}
+    gc.collect()
+    for index in range(args.turns):
+        # Variants take turns, so drift in machine speed hits all of them alike.
+        for variant in variants:
+            variant.agent.invoke({"messages": [{"role": "user", "content": f"Turn {index}: tell me more."}]}, variant.config)
+        if (index + 1) % BUCKET:
+            continue
+        print(f"turns {index + 2 - BUCKET:4}-{index + 1:4} ({2 * (index + 1) + 1} messages)")
+        for variant in variants:
+            stored, checkpoints = variant.stored_bytes(), variant.checkpoints()
+            per_checkpoint = (stored - marks[variant.name][0]) / max(checkpoints - marks[variant.name][1], 1)
+            marks[variant.name] = (stored, checkpoints)
+            put = variant.metrics.stats().get('agent_checkpoint_write_seconds{op="put"}')
+            variant.metrics.histograms.clear()
+            warm = statistics.median(variant.read(cold=False) for _ in range(READS))
+            cold = statistics.median(variant.read(cold=True) for _ in range(READS))
+            print(
+                f"  {variant.name:13} bytes/ckpt={per_checkpoint:9,.0f}  total={stored / 1e6:7.2f} MB"
+                f"  put p50={put.p50 * 1000:6.2f} ms  read warm={warm * 1000:6.2f} ms  cold={cold * 1000:6.2f} ms"
+            )
+
+
+def redis_round_trip(redis_url: str) -> None:
+    # RedisBlobStore blocks, so it goes with the sync saver.
+    from langgraph.checkpoint.redis import RedisSaver
+
+    config = {"configurable": {"thread_id": f"bench-delta-{time.time_ns()}"}}
+    with RedisSaver.from_conn_string(redis_url) as saver:
+        saver.setup()
+        saver.serde = serde = DeltaSerializer(saver.serde, store=RedisBlobStore(redis_url, ttl_seconds=3600))
+        agent = create_agent(model=ScriptedChatModel(script=[AIMessage(content=ANSWER)]), checkpointer=saver)
+        for index in range(REDIS_TURNS):
+            result = agent.invoke({"messages": [{"role": "user", "content": f"Turn {index}: tell me more."}]}, config)
+        written = serde.stats()
+    with RedisSaver.from_conn_string(redis_url) as saver:
+        saver.serde = DeltaSerializer(saver.serde, store=RedisBlobStore(redis_url, ttl_seconds=3600))
+        restored = saver.get_tuple(config).checkpoint["channel_values"]["messages"]
+        saver.delete_thread(config["configurable"]["thread_id"])
+    same = [(m.type, m.text) for m in restored] == [(m.type, m.text) for m in result["messages"]]
+    print(
+        f"RedisSaver: {REDIS_TURNS} turns, lists written={written.lists_written}  blobs written={written.blobs_written}"
+        f"  read back by a new saver: {len(restored)} messages, {'same' if same else 'DIFFERENT'}"
+    )
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
+    if redis_url := os.getenv("REDIS_URL"):
+        redis_round_trip(redis_url)
@@ -0,0 +1,116 @@
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, AIMessageChunk
+from pathlib import Path
+import argparse
+import asyncio
+import gc
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.hedged_model import HedgedModelMiddleware
+from Benchmarks.bench_agent import ANSWER, lookup
+from Benchmarks.fake_chat_model import ScriptedChatModel, tool_call
+
+
+# Turn latency of a streaming tool-calling agent whose model has a slow tail: most calls
+# answer after FAST_SECONDS, TAIL_RATE of them stall for TAIL_SECONDS, and in the middle
+# third of the run the provider degrades (DEGRADED_RATE of calls stall). Each turn makes two
+# model calls (tool call, then answer). Variants, run turn by turn:
+#   create_agent        the model as it is
+#   hedged              HedgedModelMiddleware: duplicate a call still silent after its p95
+#   hedged + fallback   the same, and route to a fallback model while the p95 breaches SLO_SECONDS
+# WARMUP_TURNS steady turns run first and are not measured, so the latency windows are full
+# and early stalls are hedged after the p95 rather than after initial_hedge_delay.
+# Percentiles are reported per phase (steady: first and last thirds, degraded: middle third).
+# "model calls" counts the requests sent to the models, i.e. the extra load of hedging.
+#
+#   uv run Benchmarks/bench_hedged_model.py
+#   uv run Benchmarks/bench_hedged_model.py --turns 600
+
+TURNS = 240
+WARMUP_TURNS = 20
+FAST_SECONDS = 0.03
+TAIL_SECONDS = 0.6
+TAIL_RATE = 0.03
+DEGRADED_RATE = 0.4
+SLO_SECONDS = 0.3
+
+
+class TailLatencyModel(ScriptedChatModel):
+    """ScriptedChatModel whose time to first token is FAST_SECONDS, or TAIL_SECONDS for a `tail_rate` of calls."""
+
+    tail_rate: float = TAIL_RATE
+    calls: int = 0
+
+    def _first_token_delay(self, message: AIMessage) -> float:
+        self.calls += 1
+        return TAIL_SECONDS if random.random() < self.tail_rate else self.first_token_seconds
+
+
+def build(middleware=()):
+    model = TailLatencyModel(script=[tool_call("lookup", query="capital of the USA"), AIMessage(content=ANSWER)], first_token_seconds=FAST_SECONDS, tokens_per_second=2000, by_turn=True)
+    return model, create_agent(model=model, tools=[lookup], middleware=list(middleware))
+
+
+async def turn(agent, content: str) -> tuple[float, str]:
+    start = time.perf_counter()
+    text = ""
+    async for message, _ in agent.astream({"messages": [{"role": "user", "content": content}]}, stream_mode="messages"):
+        if isinstance(message, AIMessageChunk):
+            text += message.text
+    return time.perf_counter() - start, text
+
+
+def quantile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tail latency with and without hedged model requests")
+    parser.add_argument("--turns", type=int, default=TURNS)
+    args = parser.parse_args()
+    random.seed(7)
+
+    fallback = TailLatencyModel(script=[tool_call("lookup", query="capital of the USA"), AIMessage(content=ANSWER)], first_token_seconds=FAST_SECONDS * 2, tokens_per_second=2000, by_turn=True)
+    hedged = HedgedModelMiddleware(initial_hedge_delay=0.2)
+    routed = HedgedModelMiddleware(fallback=fallback, initial_hedge_delay=0.2, slo_seconds=SLO_SECONDS, cooldown_seconds=30)
+    variants = {"create_agent": build(), "hedged": build([hedged]), "hedged + fallback": build([routed])}
+    samples = {name: {"steady": [], "degraded": []} for name in variants}
+    for index in range(WARMUP_TURNS):
+        for model, agent in variants.values():
+            await turn(agent, f"Warm-up {index}")
+    warmup_calls = {name: model.calls for name, (model, _) in variants.items()}
+    warmup_calls["hedged + fallback"] += fallback.calls
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for index in range(args.turns):
+        degraded = args.turns // 3 <= index < 2 * args.turns // 3
+        for name, (model, agent) in variants.items():
+            model.tail_rate = DEGRADED_RATE if degraded else TAIL_RATE
+            seconds, text = await turn(agent, f"Question {index}")
+            assert text.endswith(ANSWER), text
+            samples[name]["degraded" if degraded else "steady"].append(seconds)
+
+    for name, (model, _) in variants.items():
+        calls = model.calls + (fallback.calls if name == "hedged + fallback" else 0) - warmup_calls[name]
+        print(f"{name}: total={sum(map(sum, samples[name].values())):5.1f} s  model calls={calls}")
+        for phase, results in samples[name].items():
+            print(
+                f"  {phase:8}: turn p50={statistics.median(results) * 1000:6.1f} ms  p95={quantile(results, 0.95) * 1000:7.1f} ms"
+                f"  p99={quantile(results, 0.99) * 1000:7.1f} ms  max={max(results) * 1000:7.1f} ms"
+            )
+    for name, middleware in (("hedged", hedged), ("hedged + fallback", routed)):
+        stats = middleware.router.stats()
+        print(
+            f"{name:17}: hedged={stats.hedged} ({stats.hedge_rate:.1%}) hedge_wins={stats.hedge_wins}"
+            f" routed_to_fallback={stats.routed_to_fallback} switches={stats.route_switches}"
+            f"  estimated saved={stats.estimated_seconds_saved:5.1f} s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from pathlib import Path
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent_Memory.history_compaction import HistoryCompactionMiddleware
+from Benchmarks.bench_agent import ANSWER
+from Benchmarks.fake_chat_model import ScriptedChatModel
+
+
+# Per-turn latency and prompt size over one long conversation, with and without
+# HistoryCompactionMiddleware. Both run on InMemorySaver with ScriptedChatModel, whose time
+# to first token grows with the prompt (a prefill time per input token), like a real model.
+# The summary model is a ScriptedChatModel too, with its own latency, so the cost of the
+# compactions shows up in the turns that run them.
+#
+#   uv run Benchmarks/bench_history_compaction.py
+#   uv run Benchmarks/bench_history_compaction.py --turns 1000 --max-tokens 4000
+
+TURNS = 500
+BUCKET = 100
+SUMMARY = " ".join(["The user asked about topics 1 to 16 and got answers about Washington, D.C."] * 6)
+
+
+def build(compaction: HistoryCompactionMiddleware | None):
+    model = ScriptedChatModel(script=[AIMessage(content=ANSWER)], first_token_seconds=0.02, seconds_per_input_token=20e-6)
+    return create_agent(
+        model=model,
+        system_prompt="You are an AI chatbot that will response to user query.",
+        checkpointer=InMemorySaver(),
+        middleware=[] if compaction is None else [compaction],
+    )
+
+
+async def turn(agent, index: int) -> tuple[float, int]:
+    input = {"messages": [{"role": "user", "content": f"Turn {index}: tell me more about topic {index % 17}."}]}
+    config = {"configurable": {"thread_id": "1"}}
+    input_tokens = 0
+    start = time.perf_counter()
+    async for message, _ in agent.astream(input, config, stream_mode="messages"):
+        if getattr(message, "usage_metadata", None):
+            input_tokens = message.usage_metadata["input_tokens"]
+    return time.perf_counter() - start, input_tokens
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Long-conversation benchmark of HistoryCompactionMiddleware")
+    parser.add_argument("--turns", type=int, default=TURNS)
+    parser.add_argument("--max-tokens", type=int, default=2000, help="Window budget of the middleware")
+    args = parser.parse_args()
+
+    summary_model = ScriptedChatModel(script=[AIMessage(content=SUMMARY)], first_token_seconds=0.2)
+    compaction = HistoryCompactionMiddleware(model=summary_model, max_tokens=args.max_tokens)
+    variants = [("full history", build(None)), ("compaction", build(compaction))]
+    samples: list[list[tuple[float, int]]] = [[] for _ in variants]
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for index in range(args.turns):
+        for (_, agent), results in zip(variants, samples):
+            results.append(await turn(agent, index))
+
+    for (name, _), results in zip(variants, samples):
+        print(f"{name}: total={sum(elapsed for elapsed, _ in results):6.1f} s")
+        for start in range(0, len(results), BUCKET):
+            bucket = results[start : start + BUCKET]
+            p50 = statistics.median(elapsed for elapsed, _ in bucket)
+            tokens = statistics.median(tokens for _, tokens in bucket)
+            worst = max(elapsed for elapsed, _ in bucket)
+            print(f"  turns {start + 1:4}-{start + len(bucket):4}: p50={p50 * 1000:7.1f} ms  max={worst * 1000:7.1f} ms  input tokens p50={tokens:7.0f}")
+    print(f"  {compaction.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+from langchain.agents import create_agent
+from langchain.agents.middleware import HumanInTheLoopMiddleware
+from langchain_core.messages import AIMessage, BaseMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Command
+from pathlib import Path
+import asyncio
+import gc
+import pickle
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Benchmarks.bench_agent import ANSWER, lookup
+from Benchmarks.fake_chat_model import ScriptedChatModel, tool_call
+from HumanInTheLoop.approval_queue import ApprovalQueue
+
+
+# What the HITL flow streams per turn as a conversation grows. Every turn calls a tool that
+# needs approval, is approved, and then answers. Variants:
+#   values              the former loop: stream_mode="values" for the turn and the resume,
+#                       printing step["messages"][-1]; every superstep ships the full state
+#   updates + messages  ApprovalQueue.stream: per-node deltas plus model tokens
+# Bytes are the pickled size of everything the stream yields; objects are the messages
+# and message chunks in it.
+#
+#   uv run Benchmarks/bench_hitl_stream.py
+
+TURNS = 100
+APPROVE = {"decisions": [{"type": "approve"}]}
+
+
+def build():
+    model = ScriptedChatModel(script=[tool_call("lookup", query="capital of the USA"), AIMessage(content=ANSWER)])
+    return create_agent(
+        model=model,
+        tools=[lookup],
+        checkpointer=InMemorySaver(),
+        middleware=[HumanInTheLoopMiddleware(interrupt_on={"lookup": True})],
+    )
+
+
+def count_messages(value) -> int:
+    if isinstance(value, BaseMessage):
+        return 1
+    if isinstance(value, dict):
+        return sum(count_messages(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(count_messages(item) for item in value)
+    return 0
+
+
+class Meter:
+    def __init__(self):
+        self.bytes = 0
+        self.objects = 0
+
+    def add(self, item) -> None:
+        self.bytes += len(pickle.dumps(item))
+        self.objects += count_messages(item)
+
+
+class MeteredAgent:
+    """Passes astream through, metering everything it yields."""
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.meter = Meter()
+
+    async def astream(self, *args, **kwargs):
+        async for item in self.agent.astream(*args, **kwargs):
+            self.meter.add(item)
+            yield item
+
+
+async def values_turn(agent: MeteredAgent, content: str) -> list[str]:
+    identifier = {"configurable": {"thread_id": "1"}}
+    input, printed = {"messages": [{"role": "user", "content": content}]}, []
+    while input is not None:
+        resume = None
+        async for step in agent.astream(input, identifier, stream_mode="values"):
+            if "__interrupt__" in step:
+                resume = Command(resume=APPROVE)
+            elif step["messages"][-1].type == "ai":
+                printed.append(step["messages"][-1].content)
+        input = resume
+    return printed
+
+
+async def delta_turn(approvals: ApprovalQueue, content: str) -> list[str]:
+    printed = [chunk.text async for chunk in approvals.stream("1", {"messages": [{"role": "user", "content": content}]})]
+    while await approvals.pending():
+        printed += [chunk.text async for chunk in approvals.decide("1", APPROVE["decisions"])]
+    return printed
+
+
+async def main():
+    values_agent = MeteredAgent(build())
+    delta_agent = MeteredAgent(build())
+    approvals = ApprovalQueue(delta_agent)
+    samples = {"values": [], "updates + messages": []}
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for index in range(TURNS):
+        content = f"Question {index}: what is the capital of the USA?"
+        for name, agent in (("values", values_agent), ("updates + messages", delta_agent)):
+            agent.meter = Meter()
+            start = time.perf_counter()
+            if name == "values":
+                await values_turn(agent, content)
+            else:
+                await delta_turn(approvals, content)
+            samples[name].append((time.perf_counter() - start, agent.meter.bytes, agent.meter.objects))
+
+    for name, results in samples.items():
+        print(f"{name}: total={sum(r[1] for r in results) / 1e6:7.2f} MB  {sum(r[2] for r in results):7} objects")
+        for first, last in ((0, 10), (TURNS // 2 - 5, TURNS // 2 + 5), (TURNS - 10, TURNS)):
+            window = results[first:last]
+            print(
+                f"  turns {first + 1:3}-{last:3}: bytes/turn={statistics.median(r[1] for r in window):9,.0f}"
+                f"  objects/turn={statistics.median(r[2] for r in window):5.0f}"
+                f"  turn p50={statistics.median(r[0] for r in window) * 1000:6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+from pathlib import Path
+import argparse
+import gc
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.response_cache import FUNCTION_WORDS, HashingVectorizer
+from Agent_Memory.long_term_memory import LongTermMemory
+
+
+# Recall latency of LongTermMemory as it grows to 1M memories, with the vector matrix in RAM
+# and memory-mapped from a file. USERS users get one memory per topic ("The user's usual
+# airline is ..."); memories are added incrementally, a user at a time. At every size:
+#   insert       memories added per second since the previous size, through remember()
+#                with vectors embedded beforehand (the embedding cost is reported once)
+#   user recall  recall(k=3) in one user's namespace, what LongTermMemoryMiddleware runs
+#                once per turn; hit@1 is the share of "what is my <topic>?" queries whose
+#                first memory is that topic's
+#   scan         recall(namespace=None) over every memory, one query at a time and per
+#                query in batches of BATCH
+#
+#   uv run Benchmarks/bench_long_term_memory.py
+#   uv run Benchmarks/bench_long_term_memory.py --entries 200000
+
+ENTRIES = 1_000_000
+SIZES = (10_000, 100_000, 1_000_000)
+DIM = 256
+BATCH = 32
+USER_QUERIES = 300
+SCAN_QUERIES = 10
+ADJECTIVES = ["favorite", "usual", "preferred", "current", "next"]
+NOUNS = ["cuisine", "airline", "hotel", "city", "editor", "language", "sport", "team", "book", "band",
+         "car", "drink", "dessert", "pet", "hobby", "gym", "bank", "phone", "laptop", "seat"]
+TOPICS = [f"{adjective} {noun}" for adjective in ADJECTIVES for noun in NOUNS]
+
+
+def memories(user: int, rng: random.Random) -> list[str]:
+    return [f"The user's {topic} is {rng.choice('bcdfgklmnprstvz')}{rng.randrange(10**6)}" for topic in TOPICS]
+
+
+def percentiles(samples: list[float]) -> str:
+    quantiles = statistics.quantiles(samples, n=100)
+    return f"p50={quantiles[49] * 1000:7.2f} ms  p99={quantiles[98] * 1000:7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall latency of LongTermMemory up to 1M memories")
+    parser.add_argument("--entries", type=int, default=ENTRIES)
+    args = parser.parse_args()
+    sizes = [size for size in SIZES if size < args.entries] + [args.entries]
+    users = args.entries // len(TOPICS)
+
+    embed = HashingVectorizer(DIM, FUNCTION_WORDS)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as root:
+        variants = {
+            "RAM": LongTermMemory(embed=embed, dim=DIM),
+            "mmap": LongTermMemory(embed=embed, dim=DIM, index_path=Path(root) / "index.f32"),
+        }
+        insert_seconds = {name: 0.0 for name in variants}
+        embed_seconds, user = 0.0, 0
+        gc.collect()
+        for size in sizes:
+            start_user = user
+            while user * len(TOPICS) < size and user < users:
+                texts = memories(user, rng)
+                start = time.perf_counter()
+                vectors = np.stack([embed(text) for text in texts])
+                embed_seconds += time.perf_counter() - start
+                # Variants take turns, so drift in machine speed hits all of them alike.
+                for name, memory in variants.items():
+                    start = time.perf_counter()
+                    memory.remember(texts, namespace=f"user{user}", vectors=vectors)
+                    insert_seconds[name] += time.perf_counter() - start
+                user += 1
+
+            print(f"{len(variants['RAM']):,} memories ({user:,} users, {len(variants['RAM']) * DIM * 4 / 1e6:,.0f} MB of vectors)")
+            for name, memory in variants.items():
+                inserted = (user - start_user) * len(TOPICS)
+                user_samples, hits = [], 0
+                for _ in range(USER_QUERIES):
+                    topic = rng.choice(TOPICS)
+                    start = time.perf_counter()
+                    found = memory.recall(f"what is my {topic}?", namespace=f"user{rng.randrange(user)}", k=3)
+                    user_samples.append(time.perf_counter() - start)
+                    hits += bool(found) and f" {topic} is " in found[0][1].text
+                scan_samples = []
+                for _ in range(SCAN_QUERIES):
+                    start = time.perf_counter()
+                    memory.recall(f"what is my {rng.choice(TOPICS)}?", namespace=None, k=3)
+                    scan_samples.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                for _ in range(3):
+                    memory.recall_batch([f"what is my {rng.choice(TOPICS)}?" for _ in range(BATCH)], namespace=None, k=3)
+                batched = (time.perf_counter() - start) / (3 * BATCH)
+                print(
+                    f"  {name:5} insert={inserted / insert_seconds[name]:9,.0f}/s  user recall {percentiles(user_samples)}  hit@1={hits / USER_QUERIES:.2f}"
+                    f"  scan p50={statistics.median(scan_samples) * 1000:7.2f} ms  batched={batched * 1000:6.2f} ms/query"
+                )
+                insert_seconds[name] = 0.0
+        print(f"embedding: {len(variants['RAM']) / embed_seconds:,.0f} texts/s (HashingVectorizer, dim={DIM})")
+
+
+if __name__ == "__main__":
+    main()
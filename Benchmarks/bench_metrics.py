@@ -0,0 +1,80 @@
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from pathlib import Path
+import asyncio
+import gc
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_metrics import AgentMetrics
+from Benchmarks.bench_agent import ANSWER, lookup
+from Benchmarks.fake_chat_model import ScriptedChatModel, tool_call
+
+
+# What it costs to see where a turn's time goes. Runs the same tool-calling turn
+# with astream(stream_mode="messages") and:
+#   plain           no instrumentation
+#   sampling off    AgentMetrics(sample_rate=0) and its TimedSaver
+#   sampling on     AgentMetrics(sample_rate=1), every turn recorded
+#   events v2       astream_events(version="v2") instead, every event consumed
+#
+#   uv run Benchmarks/bench_metrics.py
+
+TURNS = 300
+WARMUP = 20
+
+
+def build(metrics: AgentMetrics | None):
+    model = ScriptedChatModel(script=[tool_call("lookup", query="capital of the USA"), AIMessage(content=ANSWER)])
+    saver = InMemorySaver() if metrics is None else metrics.instrument(InMemorySaver())
+    return create_agent(model=model, tools=[lookup], checkpointer=saver)
+
+
+async def turn(agent, name: str, index: int, metrics: AgentMetrics | None, events: bool) -> float:
+    input = {"messages": [{"role": "user", "content": "What is the capital of the USA?"}]}
+    config = {"configurable": {"thread_id": f"{name}-{index}"}}
+    if metrics is not None:
+        config = metrics.config(config)
+    start = time.perf_counter()
+    if events:
+        async for _ in agent.astream_events(input, config, version="v2"):
+            pass
+    else:
+        async for _ in agent.astream(input, config, stream_mode="messages"):
+            pass
+    return time.perf_counter() - start
+
+
+async def main():
+    variants = [
+        ("plain", None, False),
+        ("sampling off", AgentMetrics(sample_rate=0), False),
+        ("sampling on", AgentMetrics(sample_rate=1), False),
+        ("events v2", None, True),
+    ]
+    agents = [build(metrics) for _, metrics, _ in variants]
+    samples: list[list[float]] = [[] for _ in variants]
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for index in range(WARMUP + TURNS):
+        for (name, metrics, events), agent, times in zip(variants, agents, samples):
+            elapsed = await turn(agent, name, index, metrics, events)
+            if index >= WARMUP:
+                times.append(elapsed)
+
+    plain = statistics.median(samples[0])
+    print(f"{'plain':>13}: p50={plain * 1000:6.2f} ms")
+    for (name, metrics, _), times in zip(variants[1:], samples[1:]):
+        p50 = statistics.median(times)
+        print(f"{name:>13}: p50={p50 * 1000:6.2f} ms  overhead={(p50 - plain) * 1000:+6.2f} ms ({p50 / plain - 1:+.1%})")
+        if metrics is not None and metrics.sampled_turns:
+            for series, stats in metrics.stats().items():
+                value = f"{stats.p50:.0f}" if "tokens" in series else f"{stats.p50 * 1000:.3f} ms"
+                print(f"{'':>15}{series}: p50={value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
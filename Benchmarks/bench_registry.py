@@ -0,0 +1,76 @@
+from aiohttp import web
+from langchain.agents import create_agent
+from pathlib import Path
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_registry import AgentRegistry
+from Benchmarks.bench_agent import lookup
+
+
+# What a new agent variant or conversation costs with and without AgentRegistry,
+# against a local stub of the OpenAI API (no API key, no network):
+#   create_agent        a new chat model client and a graph compile every time
+#   registry miss       first use of a configuration
+#   registry hit        every later use of it
+# and how many keep-alive connections awarm() leaves in the shared pool.
+#
+#   uv run Benchmarks/bench_registry.py
+
+CALLS = 200
+SYSTEM_PROMPT = "You are an AI chatbot that will response to user query."
+
+
+async def start_stub_server() -> tuple[web.AppRunner, str]:
+    async def models(request: web.Request) -> web.Response:
+        return web.json_response({"error": "unauthorized"}, status=401)
+
+    app = web.Application()
+    app.router.add_get("/v1/models", models)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1"
+
+
+def timed(function, calls: int) -> float:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def main():
+    runner, base_url = await start_stub_server()
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-not-used")
+
+    fresh = timed(lambda: create_agent(model="gpt-4o-mini", tools=[lookup], system_prompt=SYSTEM_PROMPT), 20)
+    print(f"    create_agent: {fresh * 1e6:10.1f} us per agent")
+
+    registry = AgentRegistry()
+    start = time.perf_counter()
+    registry.agent(model="gpt-4o-mini", tools=[lookup], system_prompt=SYSTEM_PROMPT)
+    print(f"  registry miss: {(time.perf_counter() - start) * 1e6:10.1f} us (first use of the configuration)")
+    hit = timed(lambda: registry.agent(model="gpt-4o-mini", tools=[lookup], system_prompt=SYSTEM_PROMPT), CALLS)
+    print(f"   registry hit: {hit * 1e6:10.1f} us per agent ({fresh / hit:,.0f}x faster than create_agent)")
+
+    warmed = await registry.awarm(connections=4)
+    pool = registry.clients["openai"][1]._transport._pool
+    print(f"         awarm: {warmed} requests, {len(pool.connections)} keep-alive connections in the shared pool")
+    print(f"  {registry.stats()}")
+
+    await registry.aclose()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
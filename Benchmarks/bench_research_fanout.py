@@ -0,0 +1,117 @@
+from langchain_core.messages import AIMessage
+from pathlib import Path
+import asyncio
+import gc
+import re
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Benchmarks.fake_chat_model import ScriptedChatModel, tool_call
+from DeepAgent.research_fanout import ResearchBudget, ResearchFanout, ResearchReport
+from Tools.internet_search import CachedSearch, make_internet_search
+
+
+# Wall-clock time of one research question through ResearchFanout, with a fake model and a
+# stub search. The plan has SUBTOPICS subtopics; each researcher makes one search and two
+# model calls, then the writer makes one. Every model call takes MODEL_SECONDS and every
+# search SEARCH_SECONDS. Variants, run round by round:
+#   sequential      plan, research the subtopics one after another, write; like the single
+#                   agent.invoke of deep_agent.py, where every step waits for the previous one
+#   N/N             ResearchFanout with N model calls and N searches in flight
+# The report must be the same for every variant (findings are merged in plan order).
+#
+#   uv run Benchmarks/bench_research_fanout.py
+
+ROUNDS = 3
+SUBTOPICS = 6
+MODEL_SECONDS = 0.3
+SEARCH_SECONDS = 0.4
+BUDGETS = {"sequential": None, "1/1": (1, 1), "2/2": (2, 2), "4/4": (4, 4), "8/8": (8, 8)}
+
+
+class StubTavilyClient:
+    def search(self, query, max_results, topic, include_raw_content):
+        time.sleep(SEARCH_SECONDS)
+        return {"query": query, "results": [{"url": f"https://example.com/{i}", "title": query, "content": f"{query} #{i}"} for i in range(max_results)]}
+
+
+class FanoutModel(ScriptedChatModel):
+    """Fake model that plays the planner, the researchers and the writer, told apart by their system prompt."""
+
+    def _next_message(self, messages):
+        system, prompt = messages[0].text, messages[-1].text
+        if system.startswith("Split"):
+            return AIMessage(content="\n".join(f"{i + 1}. Subtopic {i}" for i in range(SUBTOPICS)))
+        if system.startswith("You are an expert researcher. Write"):
+            return AIMessage(content="Report on " + ", ".join(re.findall(r"^## (.+)$", prompt, re.MULTILINE)))
+        subtopic = messages[1].text.rsplit(": ", 1)[-1]
+        if not any(message.type == "ai" for message in messages):
+            call = tool_call("internet_search", query=subtopic)
+            return call.model_copy(update={"tool_calls": [{**call.tool_calls[0], "id": f"call_{next(self._call_ids)}"}]})
+        return AIMessage(content=f"Findings on {subtopic}: see https://example.com/0")
+
+
+def build(max_model_calls: int, max_searches: int) -> ResearchFanout:
+    search = make_internet_search(CachedSearch(StubTavilyClient(), max_concurrency=16))
+    return ResearchFanout(
+        FanoutModel(script=[AIMessage(content="")], first_token_seconds=MODEL_SECONDS),
+        [search],
+        budget=ResearchBudget(max_model_calls=max_model_calls, max_searches=max_searches),
+        max_subtopics=SUBTOPICS,
+    )
+
+
+async def run_sequential():
+    fanout = build(1, 1)
+    question = "What is langgraph?"
+    start = time.perf_counter()
+    subtopics = await fanout.plan(question)
+    findings = []
+    for index, subtopic in enumerate(subtopics):
+        findings.append(await fanout.research(index, subtopic, question))
+        if index == 0:
+            first_finding = time.perf_counter() - start
+    report = await fanout.write(question, findings)
+    return ResearchReport(question, subtopics, findings, report, time.perf_counter() - start, fanout.budget.stats()), first_finding
+
+
+async def run(budget: tuple[int, int] | None):
+    if budget is None:
+        return await run_sequential()
+    fanout = build(*budget)
+    first_finding = None
+    start = time.perf_counter()
+    async for kind, value in fanout.astream("What is langgraph?"):
+        if kind == "finding" and first_finding is None:
+            first_finding = time.perf_counter() - start
+        if kind == "report":
+            return value, first_finding
+
+
+async def main():
+    samples = {name: [] for name in BUDGETS}
+    reports = {}
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for _ in range(ROUNDS):
+        for name, budget in BUDGETS.items():
+            report, first_finding = await run(budget)
+            samples[name].append((report.seconds, first_finding, report))
+            reports.setdefault(report.report, []).append(name)
+
+    sequential = statistics.median(seconds for seconds, _, _ in samples["sequential"])
+    for name, results in samples.items():
+        seconds = statistics.median(s for s, _, _ in results)
+        first = statistics.median(f for _, f, _ in results)
+        budget = results[-1][2].budget
+        print(
+            f"{name:10}: wall={seconds:5.2f} s  first finding={first:5.2f} s  speedup={sequential / seconds:4.1f}x"
+            f"  model calls={budget.model_calls} (peak {budget.peak_model_calls})  searches={budget.searches} (peak {budget.peak_searches})"
+        )
+    print(f"distinct reports: {len(reports)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
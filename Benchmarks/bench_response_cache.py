@@ -0,0 +1,127 @@
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+from pathlib import Path
+import asyncio
+import gc
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.response_cache import CachedChatModel, HashingVectorizer, ResponseCache, normalize_text
+from Benchmarks.bench_agent import ANSWER
+from Benchmarks.fake_chat_model import ScriptedChatModel
+
+
+# Hit rate and latency of the response cache on a repetitive FAQ workload: a few dozen
+# questions, asked with Zipf-like popularity and in different phrasings. Every turn is a
+# new conversation streamed with stream_mode="messages", against ScriptedChatModel with a
+# realistic time to first token. Variants:
+#   no cache        every turn calls the model
+#   exact           ResponseCache() (same question after normalization)
+#   exact + similar ResponseCache(similarity_threshold=0.9)
+# It also prints the highest similarity between two different questions of the workload
+# with the same content words, which has to stay below the threshold.
+#
+#   uv run Benchmarks/bench_response_cache.py
+
+TURNS = 300
+SEED = 7
+THRESHOLD = 0.9
+
+# question -> phrasings
+QUESTIONS = {
+    "capital": ["What is the capital of the USA?", "what's the capital of the USA", "Capital of the USA?"],
+    "capital-france": ["What is the capital of France?", "what's the capital of France"],
+    "capital-spain": ["What is the capital of Spain?", "Capital of Spain?"],
+    "password": ["How do I reset my password?", "how can I reset my password", "Reset my password, please."],
+    "refund": ["How do I get a refund?", "How can I get a refund?", "refund"],
+    "refund-not": ["Why did I not get a refund?", "why did i not get a refund"],
+    "hours": ["What are your opening hours?", "When are you open?", "opening hours"],
+    "weather-sf": ["What is the weather in San Francisco today?", "weather in San Francisco today"],
+    "weather-sd": ["What is the weather in San Diego today?", "weather in San Diego today?"],
+    "langgraph": ["What is LangGraph?", "What's LangGraph?", "Tell me what LangGraph is."],
+    "checkpointer": ["How do checkpointers work in LangGraph?", "how do LangGraph checkpointers work"],
+    "middleware": ["What does agent middleware do?", "What is agent middleware for?"],
+    "president-is": ["Who is the president of France?", "who is the president of France, please"],
+    "president-was": ["Who was the president of France?"],
+    "sum": ["What is 2+2?", "what is 2 + 2"],
+    "product": ["What is 2*2?"],
+    "sell-should": ["Should I sell my stock?"],
+    "sell-can": ["Can I sell my stock?"],
+}
+QUESTIONS.update({f"rare-{i}": [f"Question number {i} about order {1000 + i}?"] for i in range(24)})
+
+
+def workload(turns: int) -> list[str]:
+    rng = random.Random(SEED)
+    names = list(QUESTIONS)
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    return [rng.choice(QUESTIONS[name]) for name in rng.choices(names, weights, k=turns)]
+
+
+def build(cache: ResponseCache | None):
+    model = ScriptedChatModel(script=[AIMessage(content=ANSWER)], tokens_per_second=100, first_token_seconds=0.2)
+    if cache is not None:
+        model = CachedChatModel(model=model, response_cache=cache)
+    return create_agent(model=model, tools=[])
+
+
+async def turn(agent, question: str) -> float:
+    start = time.perf_counter()
+    async for _ in agent.astream({"messages": [{"role": "user", "content": question}]}, stream_mode="messages"):
+        pass
+    return time.perf_counter() - start
+
+
+def closest_distinct_questions() -> tuple[float, str, str]:
+    vectorize = HashingVectorizer()
+    phrasings = [
+        (name, text, frozenset(vectorize.content_words(normalize_text(text))), vectorize(normalize_text(text)))
+        for name, texts in QUESTIONS.items()
+        for text in texts
+    ]
+    return max(
+        (
+            (float(a @ b), text_a, text_b)
+            for i, (name_a, text_a, words_a, a) in enumerate(phrasings)
+            for name_b, text_b, words_b, b in phrasings[i + 1 :]
+            if name_a != name_b and words_a == words_b
+        ),
+        default=(0.0, "", ""),
+    )
+
+
+async def main():
+    variants = [
+        ("no cache", None),
+        ("exact", ResponseCache()),
+        ("exact + similar", ResponseCache(similarity_threshold=THRESHOLD)),
+    ]
+    agents = [build(cache) for _, cache in variants]
+    samples: list[list[float]] = [[] for _ in variants]
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for question in workload(TURNS):
+        for agent, times in zip(agents, samples):
+            times.append(await turn(agent, question))
+
+    for (name, cache), times in zip(variants, samples):
+        times = sorted(times)
+        line = f"{name:>15}: p50={times[len(times) // 2] * 1000:7.1f} ms  p95={times[int(len(times) * 0.95)] * 1000:7.1f} ms"
+        line += f"  total={sum(times):6.1f} s"
+        if cache is not None:
+            stats = cache.stats()
+            line += f"  hit rate={stats.hit_rate:5.1%} (exact={stats.exact_hits}, similar={stats.similar_hits})"
+            line += f"  model time saved={stats.seconds_saved:5.1f} s"
+        print(line)
+    score, a, b = closest_distinct_questions()
+    if a:
+        print(f"closest different questions: {score:.3f} (threshold {THRESHOLD}) {a!r} / {b!r}")
+    else:
+        print("closest different questions: none have the same content words")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+from pathlib import Path
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Cold start of Agent/simple_agent.py up to the first model call, before and after making
+# graph rendering lazy and cached. Every sample is a fresh Python process.
+#   before          imports IPython and renders the graph through mermaid.ink on every run
+#   after           builds the agent only (the default, no --graph)
+#   after --graph   renders through render_graph with a warm .graph_cache
+#
+#   uv run Benchmarks/bench_startup.py
+
+RUNS = 10
+ROOT = Path(__file__).resolve().parent.parent
+
+BUILD_AGENT = """
+from dotenv import load_dotenv
+from langchain.agents import create_agent
+load_dotenv()
+agent = create_agent(model="gpt-4o-mini", tools=[], debug=False)
+"""
+
+BEFORE = BUILD_AGENT + """
+from IPython.display import Image, display
+mermaid = agent.get_graph(xray=True).draw_mermaid_png()
+"""
+
+AFTER_GRAPH = BUILD_AGENT + """
+import sys
+sys.path.append({root!r})
+from Agent.graph_render import display_graph, render_graph
+display_graph(render_graph(agent, {output!r}, cache_dir={cache!r}))
+"""
+
+
+def cold_start(code: str) -> tuple[float, str | None]:
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-not-used")}
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=ROOT)
+    elapsed = time.perf_counter() - start
+    lines = result.stderr.strip().splitlines()
+    error = next((line for line in reversed(lines) if "Error" in line), lines[-1]) if result.returncode else None
+    return elapsed, error
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        after_graph = AFTER_GRAPH.format(root=str(ROOT), output=f"{tmp}/agent_graph.png", cache=f"{tmp}/cache")
+        cold_start(after_graph)  # warm the cache
+        variants = {"before": BEFORE, "after": BUILD_AGENT, "after --graph": after_graph}
+        samples: dict[str, list[float]] = {name: [] for name in variants}
+        errors: dict[str, str | None] = {}
+        # Variants take turns, so drift in machine speed hits all of them alike.
+        for _ in range(RUNS):
+            for name, code in variants.items():
+                elapsed, errors[name] = cold_start(code)
+                samples[name].append(elapsed)
+
+    for name, times in samples.items():
+        status = f"FAILED: {errors[name][:80]}" if errors[name] else "ok"
+        print(f"{name:>14}: median={statistics.median(times):6.2f}s  min={min(times):6.2f}s  {status}")
+
+
+if __name__ == "__main__":
+    main()
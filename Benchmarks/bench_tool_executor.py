@@ -0,0 +1,101 @@
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from pathlib import Path
+import asyncio
+import gc
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.tool_executor import ToolExecutor, ToolLimits
+from Benchmarks.bench_agent import ANSWER
+from Benchmarks.fake_chat_model import ScriptedChatModel
+
+
+# Turn time of an agent whose model asks for three sync tools in one AI message:
+#   lookup      200 ms, pure (same arguments, same answer)
+#   forecast    a backend that hangs for HANG_SECONDS
+#   clock       instant
+# Variants, run turn by turn:
+#   create_agent    tools as they are; under astream they run on asyncio's default pool
+#   ToolExecutor    bounded pool, lookup memoized for 60 s, forecast timed out after TIMEOUT_SECONDS
+#
+#   uv run Benchmarks/bench_tool_executor.py
+
+TURNS = 20
+HANG_SECONDS = 1.5
+TIMEOUT_SECONDS = 0.3
+
+
+@tool
+def lookup(query: str) -> str:
+    """Look up a fact."""
+    time.sleep(0.2)
+    return f"Washington, D.C. is the answer to {query!r}."
+
+
+@tool
+def forecast(city: str) -> str:
+    """Get the weather forecast of a city."""
+    time.sleep(HANG_SECONDS)
+    return f"Sunny in {city}."
+
+
+@tool
+def clock() -> str:
+    """Get the current time."""
+    return time.strftime("%H:%M:%S")
+
+
+CALLS = AIMessage(content="", tool_calls=[
+    {"name": "lookup", "args": {"query": "capital of the USA"}, "id": None},
+    {"name": "forecast", "args": {"city": "Washington"}, "id": None},
+    {"name": "clock", "args": {}, "id": None},
+])
+
+
+def build(tools, middleware=()):
+    model = ScriptedChatModel(script=[CALLS, AIMessage(content=ANSWER)])
+    return create_agent(model=model, tools=tools, middleware=list(middleware))
+
+
+async def turn(agent, content: str) -> float:
+    start = time.perf_counter()
+    async for _ in agent.astream({"messages": [{"role": "user", "content": content}]}, stream_mode="updates"):
+        pass
+    return time.perf_counter() - start
+
+
+async def main():
+    executor = ToolExecutor(limits={
+        "lookup": ToolLimits(cache_ttl_seconds=60),
+        "forecast": ToolLimits(timeout_seconds=TIMEOUT_SECONDS, max_concurrency=2),
+    })
+    variants = {
+        "create_agent": build([lookup, forecast, clock]),
+        "ToolExecutor": build(executor.wrap([lookup, forecast, clock]), [executor]),
+    }
+    samples = {name: [] for name in variants}
+    gc.collect()
+    # Variants take turns, so drift in machine speed hits all of them alike.
+    for index in range(TURNS):
+        for name, agent in variants.items():
+            samples[name].append(await turn(agent, f"Question {index}"))
+
+    for name, results in samples.items():
+        print(
+            f"{name:12}: first turn={results[0] * 1000:7.1f} ms  turn p50={statistics.median(results) * 1000:7.1f} ms"
+            f"  total={sum(results):5.2f} s"
+        )
+    for name, stats in executor.stats().items():
+        print(
+            f"  {name:8}: calls={stats.calls:3} cache_hits={stats.cache_hits:3} timeouts={stats.timeouts:3}"
+            f"  p50={stats.latency.p50 * 1000:7.2f} ms  p99={stats.latency.p99 * 1000:7.2f} ms"
+        )
+    executor.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
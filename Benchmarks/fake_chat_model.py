@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import re
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+# Deterministic streaming chat model for benchmarks and load tests (no API key, no network).
+# Each call returns the next AIMessage of a script, cycling forever. The reply is streamed
+# word by word at a configurable token rate after a configurable time to first token, plus
+# an optional prefill time per input token so that long prompts are slower. Scripted tool
+# calls are streamed as tool_call_chunks, so the model works with create_agent's tool loop
+# under invoke, astream and astream_events.
+#
+# Usage:
+#   model = ScriptedChatModel(
+#       script=[tool_call("internet_search", query="langgraph"), AIMessage(content="LangGraph is ...")],
+#       tokens_per_second=50,
+#       first_token_seconds=0.2,
+#   )
+#   agent = create_agent(model=model, tools=[internet_search])
+
+
+def tool_call(name: str, **args: Any) -> AIMessage:
+    """Script step that calls one tool. Its tool_call_id is assigned when it is replayed."""
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": None}])
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Fake chat model that replays a script at a fixed token rate.
+
+    Args:
+        script: Messages returned by successive calls, cycled.
+        tokens_per_second: Streaming rate of the reply. 0 streams without delay.
+        first_token_seconds: Delay before the first token, for every call.
+        seconds_per_input_token: Extra delay before the first token per input token.
+        by_turn: Pick the step from the AI messages since the last human message instead of
+            cycling, so concurrent calls for one conversation (e.g. hedged duplicates) agree.
+    """
+
+    script: list[AIMessage]
+    tokens_per_second: float = 0
+    first_token_seconds: float = 0
+    seconds_per_input_token: float = 0
+    by_turn: bool = False
+
+    _steps: Iterator[AIMessage] = PrivateAttr()
+    _call_ids: Iterator[int] = PrivateAttr(default_factory=itertools.count)
+
+    def model_post_init(self, context: Any) -> None:
+        self._steps = itertools.cycle(self.script)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> ScriptedChatModel:
+        # Tool calls come from the script, so the bound tools are not needed.
+        return self
+
+    def seconds_per_call(self, message: AIMessage) -> float:
+        """Time one call spends waiting, as opposed to framework overhead."""
+        tokens = len(split_tokens(message.content)) if isinstance(message.content, str) else 0
+        return self._first_token_delay(message) + (max(tokens - 1, 0) / self.tokens_per_second if self.tokens_per_second else 0)
+
+    def _next_message(self, messages: list[BaseMessage]) -> AIMessage:
+        if self.by_turn:
+            turn_start = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].type == "human"), 0)
+            step = sum(1 for m in messages[turn_start:] if m.type == "ai")
+            message = self.script[step % len(self.script)]
+        else:
+            message = next(self._steps)
+        if not message.tool_calls:
+            return message
+        return message.model_copy(update={
+            "tool_calls": [{**call, "id": call["id"] or f"call_{next(self._call_ids)}"} for call in message.tool_calls]
+        })
+
+    def _with_usage(self, messages: list[BaseMessage], message: AIMessage) -> AIMessage:
+        # One token per word or whitespace, counted the same way the reply is streamed.
+        input_tokens = sum(len(split_tokens(m.content)) for m in messages if isinstance(m.content, str))
+        output_tokens = len(split_tokens(message.content)) if isinstance(message.content, str) else 0
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return message.model_copy(update={"usage_metadata": usage})
+
+    def _chunks(self, message: AIMessage) -> Iterator[tuple[str, AIMessageChunk]]:
+        for token in split_tokens(message.content):
+            yield token, AIMessageChunk(content=token)
+        # The usage of the call rides on the last chunk, like OpenAI's stream_usage.
+        yield "", AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        )
+
+    def _first_token_delay(self, message: AIMessage) -> float:
+        input_tokens = message.usage_metadata["input_tokens"] if message.usage_metadata else 0
+        return self.first_token_seconds + input_tokens * self.seconds_per_input_token
+
+    def _token_delay(self, message: AIMessage, index: int, token: str) -> float:
+        if index == 0:
+            return self._first_token_delay(message)
+        if not token:
+            return 0
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0
+
+    # ---------------------------------------------------------------- sync
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._with_usage(messages, self._next_message(messages))
+        time.sleep(self.seconds_per_call(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._with_usage(messages, self._next_message(messages))
+        for index, (token, chunk) in enumerate(self._chunks(message)):
+            if delay := self._token_delay(message, index, token):
+                time.sleep(delay)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=generation)
+            yield generation
+
+    # ---------------------------------------------------------------- async
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._with_usage(messages, self._next_message(messages))
+        await asyncio.sleep(self.seconds_per_call(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # Native async stream: the inherited one runs _stream on a thread pool, one hop per token.
+        message = self._with_usage(messages, self._next_message(messages))
+        for index, (token, chunk) in enumerate(self._chunks(message)):
+            if delay := self._token_delay(message, index, token):
+                await asyncio.sleep(delay)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=generation)
+            yield generation
+
+
+def split_tokens(content: Any) -> list[str]:
+    """Split text into words and the whitespace between them, like GenericFakeChatModel."""
+    if not content:
+        return []
+    return [token for token in re.split(r"(\s)", content) if token]
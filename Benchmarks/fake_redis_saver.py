@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+# Stand-in for AsyncRedisSaver in benchmarks when REDIS_URL is not set (no server needed).
+# It stores checkpoints in memory and sleeps for the round trips AsyncRedisSaver makes per
+# call: aget_tuple reads the latest pointer, then the checkpoint; aput loads the checkpoint,
+# sets the latest pointer and refreshes its TTL; aput_writes sends one pipeline.
+#
+# Usage:
+#   agent = create_agent(model=..., checkpointer=FakeRedisSaver())
+#   agent = create_agent(model=..., checkpointer=WriteBehindSaver(FakeRedisSaver(round_trip_seconds=0.005)))
+
+ROUND_TRIP_SECONDS = 0.002
+
+
+class FakeRedisSaver(InMemorySaver):
+    """InMemorySaver that pays the round trips AsyncRedisSaver makes for each call.
+
+    Args:
+        round_trip_seconds: Simulated network round trip to Redis.
+        **kwargs: As for InMemorySaver.
+    """
+
+    def __init__(self, *, round_trip_seconds: float = ROUND_TRIP_SECONDS, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.round_trip_seconds = round_trip_seconds
+
+    async def aget_tuple(self, config):
+        await asyncio.sleep(2 * self.round_trip_seconds)
+        return await super().aget_tuple(config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        await asyncio.sleep(3 * self.round_trip_seconds)
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.sleep(self.round_trip_seconds)
+        return await super().aput_writes(config, writes, task_id, task_path)
@@ -2,7 +2,15 @@ import os
 from dotenv import load_dotenv
 from tavily import TavilyClient
 from deepagents import create_deep_agent
-from typing import Literal
+from pathlib import Path
+import asyncio
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from DeepAgent.research_fanout import ResearchBudget, ResearchFanout
+from Tools.artifact_store import ArtifactBackend, ArtifactStore, DiskBlobs
+from Tools.internet_search import CachedSearch, make_internet_search
+from Tools.result_budget import ResultBudget
 
 
 load_dotenv()
@@ -10,19 +18,14 @@ print("TAVILY_API_KEY: ", os.getenv("TAVILY_API_KEY"))
 
 tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
 
-def internet_search(
-    query: str,
-    max_results: int = 5,
-    topic: Literal["general", "news", "finance"] = "general",
-    include_raw_content: bool = False):
-    """Search the internet for information on a given topic"""
-    results = tavily_client.search(
-        query=query,
-        max_results=max_results,
-        topic=topic,
-        include_raw_content=include_raw_content
-    )
-    return results
+# Searches are cached in memory and in .search_cache/ (survives restarts),
+# and identical concurrent searches are sent to Tavily only once.
+# Results are trimmed to the passages most relevant to the query, about 2000 tokens per search.
+# Full pages, and the agent's notes and drafts, are kept in .artifacts/; the graph state
+# only holds their hashes, and read_file loads them when the agent needs them.
+search_cache = CachedSearch(tavily_client, db_path=Path(__file__).parent / ".search_cache" / "tavily.sqlite")
+artifacts = ArtifactStore(DiskBlobs(Path(__file__).parent / ".artifacts"))
+internet_search = make_internet_search(search_cache, budget=ResultBudget(max_tokens=2000), artifacts=artifacts)
 
 
 # System prompt to steer the agent to be an expert researcher
@@ -33,15 +36,42 @@ You have access to an internet search tool as your primary means of gathering in
 ## `internet_search`
 
 Use this to run an internet search for a given query. You can specify the max number of results to return, the topic, and whether raw content should be included.
+With raw content, each result has an `artifact` path to the full page. Open it with `read_file` only when the passages returned are not enough.
 """
 
 agent = create_deep_agent(
     tools=[internet_search],
     system_prompt=research_instructions,
-    model="openai:gpt-4o-mini"
+    model="openai:gpt-4o-mini",
+    backend=lambda runtime: ArtifactBackend(runtime, artifacts),
 )
 
-result = agent.invoke({"messages": [{"role": "user", "content": "What is langgraph?"}]})
 
-# Print the agent's response
-print(result["messages"][-1].content)
\ No newline at end of file
+async def research(question: str) -> None:
+    # Subtopics are researched by concurrent sub-agents; findings print as they come in.
+    fanout = ResearchFanout(
+        "openai:gpt-4o-mini",
+        [internet_search],
+        budget=ResearchBudget(max_model_calls=4, max_searches=6, max_tokens=200_000),
+    )
+    async for kind, value in fanout.astream(question):
+        if kind == "plan":
+            print("Subtopics:", ", ".join(value))
+        elif kind == "finding":
+            print(f"[{value.seconds:.1f} s] {value.subtopic}: {value.error or 'done'}")
+        else:
+            print(value.report)
+            print(value.budget)
+
+
+if "--fanout" in sys.argv[1:]:
+    asyncio.run(research("What is langgraph?"))
+else:
+    result = agent.invoke({"messages": [{"role": "user", "content": "What is langgraph?"}]})
+
+    # Print the agent's response
+    print(result["messages"][-1].content)
+
+# There is no checkpointer here, so no later run refers to this run's artifacts; blobs
+# older than a day are dropped.
+artifacts.collect((), grace_seconds=24 * 3600)
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import re
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.types import Command
+
+
+# Research mode that fans a question out to concurrent sub-agents.
+# deep_agent.py answers through one agent.invoke, so the subtasks of a question and their
+# searches run one after another and the turn takes the sum of every step. ResearchFanout:
+#   1. plan      one model call splits the question into up to max_subtopics independent
+#                subtopics;
+#   2. research  one researcher sub-agent (create_agent with the search tools) per
+#                subtopic, all started at once on the event loop; each finding is streamed
+#                as soon as its sub-agent is done;
+#   3. write     one model call writes the report from the findings, in plan order, so the
+#                merge does not depend on which sub-agent finished first.
+# Each astream run gets a fresh copy of the ResearchBudget, shared by every call of the run:
+# it caps the model calls and the searches in flight, and the tokens spent by researchers.
+# A researcher call reserves its prompt plus expected_output_tokens before it starts, so
+# concurrent calls cannot overshoot max_tokens; the reservation is replaced by the actual
+# usage when the call ends. Researchers that would go over the token budget stop with an
+# error finding; the planner and the writer always run, so a spent budget still ends with
+# a report of what was found.
+#
+# Usage:
+#   fanout = ResearchFanout("openai:gpt-4o-mini", [internet_search], budget=ResearchBudget(max_model_calls=4, max_searches=6))
+#   async for kind, value in fanout.astream("What is langgraph?"):
+#       print(kind, value)            # "plan" [subtopics], "finding" Finding, then "report" ResearchReport
+#   report = await fanout.ainvoke("What is langgraph?")
+
+PLANNER_PROMPT = """Split the user's research question into at most {max_subtopics} independent subtopics that can be researched separately.
+Answer with one subtopic per line and nothing else."""
+
+RESEARCHER_PROMPT = """You are an expert researcher working on one subtopic of a larger question.
+Use internet_search to gather information, then answer with the key findings on your subtopic only, citing the URLs of your sources. Be concise."""
+
+WRITER_PROMPT = """You are an expert researcher. Write a polished report that answers the question from the findings on its subtopics.
+Keep the order of the subtopics and cite the sources given in the findings."""
+
+LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class BudgetStats:
+    model_calls: int = 0
+    searches: int = 0
+    tokens: int = 0
+    refused: int = 0
+    peak_model_calls: int = 0
+    peak_searches: int = 0
+
+
+class ResearchBudget:
+    """Limits shared by every call of a research run.
+
+    Args:
+        max_model_calls: Model calls in flight at once.
+        max_searches: Search tool calls in flight at once.
+        max_tokens: Tokens (input and output) researchers may spend in total. None for no cap.
+        expected_output_tokens: Output tokens reserved for a researcher call until its usage is known.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_model_calls: int = 4,
+        max_searches: int = 8,
+        max_tokens: int | None = None,
+        expected_output_tokens: int = 1000,
+    ) -> None:
+        self.max_model_calls = max_model_calls
+        self.max_searches = max_searches
+        self.model_slots = asyncio.Semaphore(max_model_calls)
+        self.search_slots = asyncio.Semaphore(max_searches)
+        self.max_tokens = max_tokens
+        self.expected_output_tokens = expected_output_tokens
+        self.reserved_tokens = 0
+        self.model_calls_in_flight = 0
+        self.searches_in_flight = 0
+        self._stats = BudgetStats()
+
+    def fresh(self) -> ResearchBudget:
+        """A budget with the same limits and nothing spent, for a new run."""
+        return ResearchBudget(
+            max_model_calls=self.max_model_calls,
+            max_searches=self.max_searches,
+            max_tokens=self.max_tokens,
+            expected_output_tokens=self.expected_output_tokens,
+        )
+
+    def stats(self) -> BudgetStats:
+        """Return a snapshot of the budget counters."""
+        return BudgetStats(**vars(self._stats))
+
+    @asynccontextmanager
+    async def model_call(self, prompt_tokens: int = 0, enforce_tokens: bool = True) -> AsyncIterator[None]:
+        """Hold a model call slot, and with enforce_tokens reserve the call's expected tokens until it ends.
+
+        Call record() inside the block, so the actual usage is counted before the reservation is released.
+        """
+        async with self.model_slots:
+            reserve = 0
+            if enforce_tokens and self.max_tokens is not None:
+                reserve = prompt_tokens + self.expected_output_tokens
+                if self._stats.tokens + self.reserved_tokens + reserve > self.max_tokens:
+                    self._stats.refused += 1
+                    raise BudgetExceeded(f"Token budget of {self.max_tokens} is spent")
+                self.reserved_tokens += reserve
+            self._stats.model_calls += 1
+            self.model_calls_in_flight += 1
+            self._stats.peak_model_calls = max(self._stats.peak_model_calls, self.model_calls_in_flight)
+            try:
+                yield
+            finally:
+                self.model_calls_in_flight -= 1
+                self.reserved_tokens -= reserve
+
+    @asynccontextmanager
+    async def search(self) -> AsyncIterator[None]:
+        async with self.search_slots:
+            self._stats.searches += 1
+            self.searches_in_flight += 1
+            self._stats.peak_searches = max(self._stats.peak_searches, self.searches_in_flight)
+            try:
+                yield
+            finally:
+                self.searches_in_flight -= 1
+
+    def record(self, messages: Sequence[BaseMessage]) -> None:
+        """Add the token usage of model replies."""
+        for message in messages:
+            if isinstance(message, AIMessage) and message.usage_metadata:
+                self._stats.tokens += message.usage_metadata["total_tokens"]
+
+
+# Budget of the ResearchFanout run in progress; its researcher tasks start with it set.
+_run_budget: contextvars.ContextVar[ResearchBudget] = contextvars.ContextVar("research_run_budget")
+
+
+class BudgetMiddleware(AgentMiddleware):
+    """Puts the model calls and search tool calls of an agent under a ResearchBudget.
+
+    Args:
+        budget: The budget used outside a ResearchFanout run; a run uses its own.
+        search_tools: Names of the tools that count as searches.
+    """
+
+    def __init__(self, budget: ResearchBudget, search_tools: Sequence[str] = ("internet_search",)) -> None:
+        super().__init__()
+        self.budget = budget
+        self.search_tools = frozenset(search_tools)
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        budget = _run_budget.get(self.budget)
+        prompt = [SystemMessage(request.system_prompt), *request.messages] if request.system_prompt else request.messages
+        async with budget.model_call(count_tokens_approximately(prompt)):
+            response = await handler(request)
+            budget.record(response.result)
+        return response
+
+    async def awrap_tool_call(
+        self, request: ToolCallRequest, handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]]
+    ) -> ToolMessage | Command:
+        if request.tool_call["name"] not in self.search_tools:
+            return await handler(request)
+        async with _run_budget.get(self.budget).search():
+            return await handler(request)
+
+
+@dataclass
+class Finding:
+    index: int
+    subtopic: str
+    text: str
+    seconds: float
+    error: str | None = None
+
+
+@dataclass
+class ResearchReport:
+    question: str
+    subtopics: list[str]
+    findings: list[Finding]
+    report: str
+    seconds: float
+    budget: BudgetStats = field(default_factory=BudgetStats)
+
+
+def parse_subtopics(text: str, max_subtopics: int) -> list[str]:
+    """Subtopics of a planner reply, one per line, without list markers or duplicates."""
+    subtopics, seen = [], set()
+    for line in text.splitlines():
+        subtopic = LIST_MARKER.sub("", line).strip()
+        if subtopic and subtopic.casefold() not in seen:
+            seen.add(subtopic.casefold())
+            subtopics.append(subtopic)
+    return subtopics[:max_subtopics]
+
+
+class ResearchFanout:
+    """Plans a question into subtopics, researches them with concurrent sub-agents and writes one report.
+
+    Args:
+        model: Model name for init_chat_model, or a chat model. Used by every step.
+        tools: Tools of the researcher sub-agents.
+        budget: Concurrency and token limits. Defaults to ResearchBudget(). Each astream run
+            gets a fresh copy; plan, research and write called directly share this one.
+        max_subtopics: Upper bound on the subtopics of the plan, i.e. on the sub-agents.
+        search_tools: Names of the tools that count as searches.
+    """
+
+    def __init__(
+        self,
+        model: str | BaseChatModel,
+        tools: Sequence[BaseTool],
+        *,
+        budget: ResearchBudget | None = None,
+        max_subtopics: int = 5,
+        search_tools: Sequence[str] = ("internet_search",),
+    ) -> None:
+        self.model = init_chat_model(model) if isinstance(model, str) else model
+        self.budget = budget or ResearchBudget()
+        self.max_subtopics = max_subtopics
+        self.researcher = create_agent(
+            model=self.model,
+            tools=list(tools),
+            system_prompt=RESEARCHER_PROMPT,
+            middleware=[BudgetMiddleware(self.budget, search_tools)],
+        )
+
+    async def _call(self, system_prompt: str, prompt: str) -> str:
+        budget = _run_budget.get(self.budget)
+        async with budget.model_call(enforce_tokens=False):
+            message = await self.model.ainvoke([SystemMessage(system_prompt), HumanMessage(prompt)])
+            budget.record([message])
+        return message.text
+
+    async def plan(self, question: str) -> list[str]:
+        reply = await self._call(PLANNER_PROMPT.format(max_subtopics=self.max_subtopics), question)
+        return parse_subtopics(reply, self.max_subtopics) or [question]
+
+    async def research(self, index: int, subtopic: str, question: str) -> Finding:
+        start = time.perf_counter()
+        prompt = f"Question: {question}\nYour subtopic: {subtopic}"
+        try:
+            result = await self.researcher.ainvoke({"messages": [{"role": "user", "content": prompt}]})
+        except Exception as e:
+            return Finding(index, subtopic, "", time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+        answer = next((m for m in reversed(result["messages"]) if isinstance(m, AIMessage)), None)
+        return Finding(index, subtopic, answer.text if answer else "", time.perf_counter() - start)
+
+    async def write(self, question: str, findings: list[Finding]) -> str:
+        sections = [f"## {f.subtopic}\n{f.text}" for f in findings if f.error is None]
+        if not sections:
+            return "No findings: every subtopic failed."
+        return await self._call(WRITER_PROMPT, f"Question: {question}\n\nFindings:\n\n" + "\n\n".join(sections))
+
+    async def astream(self, question: str) -> AsyncIterator[tuple[str, Any]]:
+        """Yield ("plan", subtopics), then ("finding", Finding) as sub-agents finish, then ("report", ResearchReport)."""
+        start = time.perf_counter()
+        # The run's budget is set in a context of its own, since a generator must not set
+        # context variables of the caller; every step runs as a task in that context.
+        budget = self.budget.fresh()
+        context = contextvars.copy_context()
+        context.run(_run_budget.set, budget)
+        subtopics = await asyncio.create_task(self.plan(question), context=context)
+        yield "plan", subtopics
+        tasks = [
+            asyncio.create_task(self.research(index, subtopic, question), context=context)
+            for index, subtopic in enumerate(subtopics)
+        ]
+        findings = []
+        try:
+            for next_finding in asyncio.as_completed(tasks):
+                finding = await next_finding
+                findings.append(finding)
+                yield "finding", finding
+        finally:
+            for task in tasks:
+                task.cancel()
+        # Plan order, whatever the completion order, so the same findings give the same report.
+        findings.sort(key=lambda f: f.index)
+        report = await asyncio.create_task(self.write(question, findings), context=context)
+        yield "report", ResearchReport(question, subtopics, findings, report, time.perf_counter() - start, budget.stats())
+
+    async def ainvoke(self, question: str) -> ResearchReport:
+        async for kind, value in self.astream(question):
+            if kind == "report":
+                return value
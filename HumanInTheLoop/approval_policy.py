@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+from langchain.agents.middleware import HumanInTheLoopMiddleware, InterruptOnConfig, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.tools import BaseTool
+from langgraph.runtime import Runtime
+
+
+# Auto-approval in front of HumanInTheLoopMiddleware. With interrupt_on={"internet_search": True}
+# every search waits for a human, even one identical to a search approved a minute ago.
+# PolicyHumanInTheLoopMiddleware asks an ApprovalPolicy about each tool call first:
+#   1. rules, in order, the first match wins: a tool name ("*" for any) and argument
+#      conditions, each a regex (searched in the value) or an allowlist of values, with
+#      decision "approve" (run without review) or "review" (always interrupt);
+#   2. fingerprints of arguments a human approved before, valid for approved_ttl_seconds;
+#      strings are normalized (case, whitespace, trailing punctuation), so near-identical
+#      calls match;
+#   3. otherwise the call interrupts as usual.
+# Rules are compiled and indexed by tool name once, so an evaluation costs microseconds.
+# Calls are evaluated and fingerprinted with the tool's default arguments filled in (from
+# its args_schema), so a call that leaves max_results out matches like one that passes 5.
+# Approval wait times are measured from interrupt to resume, and every auto-approved call
+# is credited with the average wait as human latency saved.
+#
+# Usage:
+#   policy = ApprovalPolicy([
+#       ApprovalRule("internet_search", {"topic": {"general"}, "query": r"(?i)\bweather\b"}),
+#       ApprovalRule("delete_file", decision="review"),
+#   ], approved_ttl_seconds=12 * 3600)
+#   middleware = [PolicyHumanInTheLoopMiddleware(interrupt_on={"internet_search": True}, policy=policy)]
+#   print(policy.stats())
+
+Decision = Literal["approve", "review"]
+
+# Key of the AI message's response_metadata holding the IDs of the calls sent to review.
+POLICY_METADATA_KEY = "approval_policy"
+
+
+@dataclass
+class ApprovalRule:
+    """One rule of an ApprovalPolicy.
+
+    Args:
+        tool: Tool name the rule applies to, or "*" for every tool.
+        args: Argument name -> regex (searched in str(value)) or allowlist of values. Every
+            listed argument must match; arguments not listed are not checked.
+        decision: "approve" runs matching calls without review; "review" always interrupts.
+    """
+
+    tool: str
+    args: Mapping[str, str | Iterable[Any]] = field(default_factory=dict)
+    decision: Decision = "approve"
+
+
+@dataclass
+class PolicyStats:
+    evaluations: int = 0
+    approved_by_rule: int = 0
+    approved_by_fingerprint: int = 0
+    reviewed: int = 0
+    evaluation_seconds: float = 0.0
+    human_approvals: int = 0
+    human_wait_seconds: float = 0.0
+    seconds_saved: float = 0.0
+
+    @property
+    def auto_approval_rate(self) -> float:
+        approved = self.approved_by_rule + self.approved_by_fingerprint
+        return approved / self.evaluations if self.evaluations else 0.0
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.casefold().split()).rstrip("?.!")
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def fingerprint(name: str, args: dict[str, Any]) -> str:
+    """Hash of a tool call that ignores case, whitespace and trailing punctuation in strings."""
+    payload = json.dumps([name, _normalize(args)], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def tool_defaults(tool: BaseTool) -> dict[str, Any]:
+    """Default argument values of a tool, from its args_schema (a pydantic model or a JSON schema)."""
+    schema = tool.args_schema
+    if isinstance(schema, dict):
+        return {name: spec["default"] for name, spec in schema.get("properties", {}).items() if "default" in spec}
+    if schema is None or not hasattr(schema, "model_fields"):
+        return {}
+    return {
+        name: info.get_default(call_default_factory=True)
+        for name, info in schema.model_fields.items()
+        if not info.is_required()
+    }
+
+
+def _compile_condition(condition: str | Iterable[Any]) -> Callable[[Any], bool]:
+    if isinstance(condition, str):
+        search = re.compile(condition).search
+        return lambda value: search(value if isinstance(value, str) else str(value)) is not None
+    allowed = frozenset(condition)
+    return lambda value: value in allowed
+
+
+class ApprovalPolicy:
+    """Decides which tool calls can run without human review.
+
+    Args:
+        rules: Evaluated in order; the first matching rule decides.
+        approved_ttl_seconds: How long a human approval covers identical calls. 0 disables it.
+        max_fingerprints: Approved fingerprints kept; the oldest are dropped first.
+        assumed_wait_seconds: Human wait credited per auto-approval until waits are measured.
+    """
+
+    def __init__(
+        self,
+        rules: Iterable[ApprovalRule] = (),
+        *,
+        approved_ttl_seconds: float = 12 * 3600,
+        max_fingerprints: int = 100_000,
+        assumed_wait_seconds: float = 60,
+    ) -> None:
+        self.rules = list(rules)
+        compiled = [
+            (rule.tool, [(name, _compile_condition(condition)) for name, condition in rule.args.items()], rule.decision)
+            for rule in self.rules
+        ]
+        # Tool name -> its rules and the "*" rules, in rule order; other tools get only "*" rules.
+        self.wildcard = [(conditions, decision) for tool, conditions, decision in compiled if tool == "*"]
+        self.by_tool = {
+            name: [(conditions, decision) for tool, conditions, decision in compiled if tool in (name, "*")]
+            for name in {rule.tool for rule in self.rules} - {"*"}
+        }
+        self.approved_ttl_seconds = approved_ttl_seconds
+        self.max_fingerprints = max_fingerprints
+        self.assumed_wait_seconds = assumed_wait_seconds
+        # fingerprint -> expires at, oldest first
+        self.approved: OrderedDict[str, float] = OrderedDict()
+        self.lock = threading.Lock()
+        self._stats = PolicyStats()
+
+    def stats(self) -> PolicyStats:
+        """Return a snapshot of the policy counters."""
+        with self.lock:
+            return PolicyStats(**vars(self._stats))
+
+    def _average_wait(self) -> float:
+        if self._stats.human_approvals:
+            return self._stats.human_wait_seconds / self._stats.human_approvals
+        return self.assumed_wait_seconds
+
+    def evaluate(self, name: str, args: dict[str, Any]) -> Decision:
+        """Decide one tool call: "approve" to run it, "review" to interrupt."""
+        start = time.perf_counter()
+        decision, source = "review", None
+        for conditions, rule_decision in self.by_tool.get(name, self.wildcard):
+            if all(arg in args and matches(args[arg]) for arg, matches in conditions):
+                decision, source = rule_decision, "rule"
+                break
+        else:
+            if self.approved_ttl_seconds and (expires_at := self.approved.get(fingerprint(name, args))):
+                if expires_at > time.time():
+                    decision, source = "approve", "fingerprint"
+        with self.lock:
+            self._stats.evaluations += 1
+            self._stats.evaluation_seconds += time.perf_counter() - start
+            if decision == "review":
+                self._stats.reviewed += 1
+            else:
+                if source == "rule":
+                    self._stats.approved_by_rule += 1
+                else:
+                    self._stats.approved_by_fingerprint += 1
+                self._stats.seconds_saved += self._average_wait()
+        return decision
+
+    def record_approval(self, name: str, args: dict[str, Any], wait_seconds: float | None = None) -> None:
+        """Remember a call a human approved, and how long the approval took."""
+        with self.lock:
+            if wait_seconds is not None:
+                self._stats.human_approvals += 1
+                self._stats.human_wait_seconds += wait_seconds
+            if not self.approved_ttl_seconds:
+                return
+            key = fingerprint(name, args)
+            self.approved[key] = time.time() + self.approved_ttl_seconds
+            self.approved.move_to_end(key)
+            while len(self.approved) > self.max_fingerprints:
+                self.approved.popitem(last=False)
+
+
+class PolicyHumanInTheLoopMiddleware(HumanInTheLoopMiddleware):
+    """HumanInTheLoopMiddleware that interrupts only for the calls its policy does not approve.
+
+    Args:
+        interrupt_on: As for HumanInTheLoopMiddleware.
+        policy: The ApprovalPolicy consulted for every call of a tool in interrupt_on.
+        description_prefix: As for HumanInTheLoopMiddleware.
+    """
+
+    def __init__(
+        self,
+        interrupt_on: dict[str, bool | InterruptOnConfig],
+        *,
+        policy: ApprovalPolicy,
+        description_prefix: str = "Tool execution requires approval",
+    ) -> None:
+        super().__init__(interrupt_on, description_prefix=description_prefix)
+        self.policy = policy
+        # tool name -> default arguments, learned from the tools of the model requests
+        self.tool_defaults: dict[str, dict[str, Any]] = {}
+
+    def _learn_defaults(self, tools: list[BaseTool | dict]) -> None:
+        for tool in tools:
+            if isinstance(tool, BaseTool) and tool.name in self.interrupt_on and tool.name not in self.tool_defaults:
+                self.tool_defaults[tool.name] = tool_defaults(tool)
+
+    def _full_args(self, call: ToolCall) -> dict[str, Any]:
+        return {**self.tool_defaults.get(call["name"], {}), **call["args"]}
+
+    def _review(self, tool_calls: list[ToolCall]) -> dict[str, dict[str, Any]]:
+        """IDs of the calls to review -> their arguments with the tool's defaults filled in."""
+        review = {}
+        for call in tool_calls:
+            if call["name"] in self.interrupt_on:
+                args = self._full_args(call)
+                if self.policy.evaluate(call["name"], args) == "review":
+                    review[call["id"]] = args
+        return review
+
+    def _decide(self, message: AIMessage) -> AIMessage:
+        review = self._review(message.tool_calls)
+        decided = {"review": list(review), "args": review, "decided_at": time.time()}
+        return message.model_copy(update={"response_metadata": {**message.response_metadata, POLICY_METADATA_KEY: decided}})
+
+    def _annotate(self, response: ModelResponse | AIMessage) -> ModelResponse | AIMessage:
+        # after_model runs again when the thread resumes, maybe in another process, and the
+        # human's decisions must line up with the calls interrupted the first time. So each
+        # call is evaluated once, here in the model node, and the IDs to review are stored in
+        # the AI message, which the checkpointer saves with the thread. So are their arguments
+        # with defaults filled in, for the fingerprints of the calls the human approves.
+        messages = response.result if isinstance(response, ModelResponse) else [response]
+        annotated = [
+            self._decide(message) if isinstance(message, AIMessage) and message.tool_calls else message
+            for message in messages
+        ]
+        if isinstance(response, ModelResponse):
+            return ModelResponse(result=annotated, structured_response=response.structured_response)
+        return annotated[0]
+
+    def wrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse | AIMessage:
+        self._learn_defaults(request.tools)
+        return self._annotate(handler(request))
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse | AIMessage:
+        self._learn_defaults(request.tools)
+        return self._annotate(await handler(request))
+
+    def after_model(self, state: Any, runtime: Runtime) -> dict[str, Any] | None:
+        messages = state["messages"]
+        last_ai_msg = next((msg for msg in reversed(messages) if isinstance(msg, AIMessage)), None)
+        if not last_ai_msg or not last_ai_msg.tool_calls:
+            return None
+        # A message that did not come through wrap_model_call is evaluated here instead.
+        if (decided := last_ai_msg.response_metadata.get(POLICY_METADATA_KEY)) is None:
+            review_args = self._review(last_ai_msg.tool_calls)
+            decided = {"review": list(review_args), "args": review_args, "decided_at": None}
+        review_ids = set(decided["review"])
+        review = [call for call in last_ai_msg.tool_calls if call["id"] in review_ids]
+        if not review:
+            return None
+
+        # The parent interrupts for the calls left to review, on a copy of the message.
+        reviewed_msg = last_ai_msg.model_copy(update={"tool_calls": review})
+        messages = [reviewed_msg if message is last_ai_msg else message for message in messages]
+        result = super().after_model({**state, "messages": messages}, runtime)
+        revised_msg, *tool_messages = result["messages"]
+
+        rejected = {message.tool_call_id for message in tool_messages if isinstance(message, ToolMessage)}
+        kept = {call["id"]: call for call in revised_msg.tool_calls}
+        interrupted_at = decided["decided_at"]
+        wait = None if interrupted_at is None else time.time() - interrupted_at
+        for tool_call in review:
+            call = kept.get(tool_call["id"])
+            if call is not None and tool_call["id"] not in rejected and call["args"] == tool_call["args"]:
+                args = decided.get("args", {}).get(tool_call["id"]) or self._full_args(tool_call)
+                self.policy.record_approval(tool_call["name"], args, wait)
+        # The model's order of tool calls is kept, with the reviewed ones as the human left them.
+        revised_msg.tool_calls = [
+            kept[call["id"]] if call["id"] in review_ids else call
+            for call in last_ai_msg.tool_calls
+            if call["id"] not in review_ids or call["id"] in kept
+        ]
+        return {"messages": [revised_msg, *tool_messages]}
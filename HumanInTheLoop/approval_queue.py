@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from langchain_core.messages import AIMessageChunk
+from langgraph.types import Command
+
+
+# Non-blocking approvals for agents with HumanInTheLoopMiddleware.
+# Waiting for a human inside the turn (input() in the streaming coroutine) freezes the
+# event loop, so one pending approval stops every conversation. Here a turn that hits an
+# interrupt parks its pending action_requests in a store and ends, releasing the loop.
+# Reviewers list everything pending across threads, decide in bulk, and each thread is
+# resumed with one Command(resume={"decisions": [...]}) carrying the decisions for all of
+# its actions. Resumes of different threads run concurrently.
+# Turns and resumes go through one streaming pipeline on stream_mode=["updates", "messages"]:
+# model tokens are yielded as they arrive, and interrupts are detected from the updates,
+# so no full-state snapshot is built or copied per superstep.
+# Stores: MemoryApprovalStore (one process), RedisApprovalStore (shared by processes;
+# a pending approval is claimed atomically, so two reviewers never resume it twice).
+#
+# Usage:
+#   approvals = ApprovalQueue(agent)                          # or ApprovalQueue(agent, RedisApprovalStore(REDIS_URL))
+#   async for chunk in approvals.stream("alice", {"messages": [...]}):
+#       print(chunk.content, end="")                          # ends early if the turn needs approval
+#   for pending in await approvals.pending():
+#       print(pending.thread_id, pending.action_requests)
+#   await approvals.decide_many({"alice": [{"type": "approve"}], "bob": [{"type": "reject", "message": "no"}]})
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingApproval:
+    thread_id: str
+    interrupt_id: str
+    action_requests: list[dict[str, Any]]
+    review_configs: list[dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ApprovalStats:
+    parked: int = 0
+    resumed: int = 0
+    decisions: int = 0
+    failed_resumes: int = 0
+    wait_seconds: float = 0.0
+
+
+class MemoryApprovalStore:
+    """Pending approvals of this process, one per thread."""
+
+    def __init__(self) -> None:
+        self.items: dict[str, PendingApproval] = {}
+
+    async def aput(self, pending: PendingApproval) -> None:
+        self.items[pending.thread_id] = pending
+
+    async def alist(self, limit: int | None = None) -> list[PendingApproval]:
+        return sorted(self.items.values(), key=lambda pending: pending.created_at)[:limit]
+
+    async def aclaim(self, thread_id: str) -> PendingApproval | None:
+        return self.items.pop(thread_id, None)
+
+
+class RedisApprovalStore:
+    """Pending approvals in Redis: one JSON value per thread and a queue ordered by age.
+
+    Args:
+        redis_url: Redis connection URL, usually REDIS_URL.
+        prefix: Key prefix.
+    """
+
+    def __init__(self, redis_url: str, *, prefix: str = "approval:") -> None:
+        from redis.asyncio import Redis
+
+        self.client = Redis.from_url(redis_url)
+        self.prefix = prefix
+        self.queue_key = f"{prefix}queue"
+
+    async def aput(self, pending: PendingApproval) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + pending.thread_id, json.dumps(asdict(pending)))
+            pipe.zadd(self.queue_key, {pending.thread_id: pending.created_at})
+            await pipe.execute()
+
+    async def alist(self, limit: int | None = None) -> list[PendingApproval]:
+        thread_ids = await self.client.zrange(self.queue_key, 0, -1 if limit is None else limit - 1)
+        if not thread_ids:
+            return []
+        values = await self.client.mget([self.prefix + thread_id.decode() for thread_id in thread_ids])
+        return [PendingApproval(**json.loads(value)) for value in values if value is not None]
+
+    async def aclaim(self, thread_id: str) -> PendingApproval | None:
+        # GETDEL is atomic: of several reviewers deciding the same thread, one gets it.
+        value = await self.client.getdel(self.prefix + thread_id)
+        await self.client.zrem(self.queue_key, thread_id)
+        return None if value is None else PendingApproval(**json.loads(value))
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class ApprovalQueue:
+    """Runs agent turns that park on human approval instead of waiting for it.
+
+    Args:
+        agent: A compiled agent with HumanInTheLoopMiddleware and a checkpointer.
+        store: Where pending approvals are kept. Defaults to memory.
+    """
+
+    def __init__(self, agent: Any, store: MemoryApprovalStore | RedisApprovalStore | None = None) -> None:
+        self.agent = agent
+        self.store = store or MemoryApprovalStore()
+        self._stats = ApprovalStats()
+
+    def stats(self) -> ApprovalStats:
+        """Return a snapshot of the approval counters."""
+        return ApprovalStats(**vars(self._stats))
+
+    async def pending(self, limit: int | None = None) -> list[PendingApproval]:
+        """Pending approvals of all threads, oldest first."""
+        return await self.store.alist(limit)
+
+    async def stream(self, thread_id: str, input: Any) -> AsyncIterator[AIMessageChunk]:
+        """Run a turn (or a resume) and yield the model's tokens as AIMessageChunks.
+
+        If the turn hits an interrupt, its action requests are parked in the store and the
+        stream ends; the thread continues when its decisions come in.
+        """
+        identifier = {"configurable": {"thread_id": thread_id}}
+        async for mode, data in self.agent.astream(input, identifier, stream_mode=["updates", "messages"]):
+            if mode == "messages":
+                chunk, metadata = data
+                if isinstance(chunk, AIMessageChunk) and chunk.content and metadata.get("langgraph_node") == "model":
+                    yield chunk
+            elif "__interrupt__" in data:
+                interrupt = data["__interrupt__"][0]
+                await self.store.aput(PendingApproval(
+                    thread_id=thread_id,
+                    interrupt_id=interrupt.id,
+                    action_requests=interrupt.value["action_requests"],
+                    review_configs=interrupt.value.get("review_configs", []),
+                ))
+                self._stats.parked += 1
+                return
+
+    async def decide(self, thread_id: str, decisions: list[dict[str, Any]]) -> AsyncIterator[AIMessageChunk]:
+        """Resume a parked thread with one decision per action request, yielding its tokens."""
+        pending = await self.store.aclaim(thread_id)
+        if pending is None:
+            raise KeyError(f"No pending approval for thread {thread_id!r}")
+        if len(decisions) != len(pending.action_requests):
+            await self.store.aput(pending)
+            raise ValueError(
+                f"Thread {thread_id!r} has {len(pending.action_requests)} pending actions, got {len(decisions)} decisions"
+            )
+        self._stats.resumed += 1
+        self._stats.decisions += len(decisions)
+        self._stats.wait_seconds += time.time() - pending.created_at
+        try:
+            async for chunk in self.stream(thread_id, Command(resume={"decisions": decisions})):
+                yield chunk
+        except Exception:
+            # The thread is still interrupted in its checkpoint, so it can be decided again.
+            self._stats.failed_resumes += 1
+            await self.store.aput(pending)
+            raise
+
+    async def decide_many(self, decisions: dict[str, list[dict[str, Any]]]) -> dict[str, str | Exception]:
+        """Resume many threads concurrently. Returns each thread's reply text, or its error."""
+
+        async def resume(thread_id: str, thread_decisions: list[dict[str, Any]]) -> str:
+            return "".join([chunk.text async for chunk in self.decide(thread_id, thread_decisions)])
+
+        results = await asyncio.gather(
+            *(resume(thread_id, thread_decisions) for thread_id, thread_decisions in decisions.items()),
+            return_exceptions=True,
+        )
+        for thread_id, result in zip(decisions, results):
+            if isinstance(result, Exception):
+                logger.warning("Resuming thread %s failed: %s", thread_id, result)
+        return dict(zip(decisions, results))
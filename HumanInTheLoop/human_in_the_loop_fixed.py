@@ -1,19 +1,35 @@
 from langchain.agents import create_agent
-from langchain_core.tools import tool
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain.agents.middleware import HumanInTheLoopMiddleware
-from langgraph.types import Command
 
 from tavily import TavilyClient
-from typing import Literal
+from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 import asyncio
 import logging
-
-
-# This Human in the loop is working for accepted and rejected decisions.
-# It is not working for edited decisions.
+from dataclasses import dataclass, field
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent_Memory.bounded_saver import BoundedInMemorySaver
+from HumanInTheLoop.approval_policy import ApprovalPolicy, ApprovalRule, PolicyHumanInTheLoopMiddleware
+from HumanInTheLoop.approval_queue import ApprovalQueue
+from Tools.internet_search import CachedSearch, PooledAsyncTavilyClient, make_internet_search
+from Tools.result_budget import ResultBudget
+
+# Human in the loop with a non-blocking approval queue. A turn that needs approval parks
+# its tool calls in the queue and ends, so you can keep chatting on other threads while
+# approvals are pending, then review and decide them in bulk:
+#   <text>                      send a message on the current thread
+#   /thread <name>              switch to another conversation
+#   /pending                    list pending actions, numbered
+#   /approve all | /approve 1 3 approve actions
+#   /reject 2 <reason>          reject an action, with a reason for the model
+#   /edit 2 <new query>         run an action with a different query
+#   /policy                     show how many calls the approval policy let through
+# A thread resumes as soon as all of its actions are decided, with one resume call. A new
+# message on a thread that is still answering or waiting for approval is refused.
+# Searches the approval policy allows (routine travel lookups, or a search you already
+# approved in the last 12 hours) run without asking.
 
 load_dotenv()
 logging.getLogger("tavily").setLevel(logging.WARNING)
@@ -22,153 +38,173 @@ print("TAVILY_API_KEY: ", os.getenv("TAVILY_API_KEY"))
 
 tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
 
-@tool
-def internet_search(
-    query: str,
-    max_results: int = 5,
-    topic: Literal["general", "finance", "news"] = "general",
-    include_raw_content: bool = False):
-    """Search the internet for information on a given topic"""
-    results = tavily_client.search(
-        query=query,
-        max_results=max_results,
-        topic=topic,
-        include_raw_content=include_raw_content
-    )
-    return results
+# Searches are cached in memory and in .search_cache/ (survives restarts),
+# and identical concurrent searches are sent to Tavily only once.
+# Results are trimmed to the passages most relevant to the query, about 2000 tokens per search.
+# Under astream the tool uses a pooled async client, so a search never blocks the event loop.
+search_cache = CachedSearch(
+    tavily_client,
+    async_client=PooledAsyncTavilyClient(os.getenv("TAVILY_API_KEY")),
+    db_path=Path(__file__).parent / ".search_cache" / "tavily.sqlite",
+)
+internet_search = make_internet_search(search_cache, budget=ResultBudget(max_tokens=2000))
+
+# Routine general searches about travel basics are approved by rule; news and finance
+# searches always go to a human. Approved searches are remembered for 12 hours.
+approval_policy = ApprovalPolicy([
+    ApprovalRule("internet_search", {"topic": ["news", "finance"]}, decision="review"),
+    ApprovalRule("internet_search", {
+        "query": r"(?i)\b(weather|climate|visa|currency|time ?zone|flights?|hotels?|things to do|attractions)\b",
+        "max_results": range(1, 6),
+    }),
+], approved_ttl_seconds=12 * 3600)
 
 # Correct middleware configuration
-middleware_human_in_the_loop = [HumanInTheLoopMiddleware(
+middleware_human_in_the_loop = [PolicyHumanInTheLoopMiddleware(
     interrupt_on={"internet_search": True},  # Fixed: Use True for default behavior
+    policy=approval_policy,
     description_prefix="Tool execution pending approval",
 )]
 
 agent = create_agent(
     model="gpt-4o-mini",
-    checkpointer=InMemorySaver(),
+    checkpointer=BoundedInMemorySaver(),
     system_prompt="You are a helpful travel agent that can answer questions about various travel trips planning.",
     tools=[internet_search],
     middleware=middleware_human_in_the_loop,
 )
 
-async def stream_agent(user_input: str):
-    input_messages = {"messages": [{"role": "user", "content": user_input}]}
-    identifier = {"configurable": {"thread_id": "1"}}
-
-    # Use stream_mode="values" for proper interrupt handling
-    async for step in agent.astream(input_messages, identifier, stream_mode="values"):
-        # Check for interruption
-        if "__interrupt__" in step:
-            interrupt = step["__interrupt__"][0]
-
-            print(f"\n\n🛑 INTERRUPTION DETECTED:")
-            print(f"Interrupt ID: {interrupt.id if hasattr(interrupt, 'id') else 'N/A'}")
-
-            # Display action requests
-            if hasattr(interrupt, 'value') and isinstance(interrupt.value, dict):
-                action_requests = interrupt.value.get("action_requests", [])
-                for request in action_requests:
-                    print(f"\n{request.get('description', 'No description')}")
-                    print(f"Tool: {request.get('name', 'Unknown')}")
-                    print(f"Args: {request.get('arguments', {})}")
-
-            # Ask for approval
-            approval = input("\nApprove this action? (approve/reject/edit): ").strip().lower()
-
-            if approval == "approve":
-                # Resume with approval
-                print("\n✅ Approving action...\n")
-                async for resumed_step in agent.astream(
-                    Command(resume={"decisions": [{"type": "approve"}]}),
-                    identifier,
-                    stream_mode="values"
-                ):
-                    # Handle resumed messages
-                    if "messages" in resumed_step:
-                        last_msg = resumed_step["messages"][-1]
-                        if hasattr(last_msg, 'content'):
-                            print(last_msg.content, end="", flush=True)
-
-            elif approval == "reject":
-                # Resume with rejection
-                print("\n❌ Rejecting action...\n")
-                rejection_reason = input("Reason for rejection: ").strip()
-                async for resumed_step in agent.astream(
-                    Command(resume={"decisions": [{"type": "reject", "feedback": rejection_reason}]}),
-                    identifier,
-                    stream_mode="values"
-                ):
-                    if "messages" in resumed_step:
-                        last_msg = resumed_step["messages"][-1]
-                        if hasattr(last_msg, 'content'):
-                            print(last_msg.content, end="", flush=True)
-
-            elif approval == "edit":
-                # Resume with edited arguments
-                print("\n✏️ Editing action...")
-                print("Enter new query (or press Enter to keep original):")
-                new_query = input().strip()
-
-                if new_query:
-                    # Get original action request
-                    if hasattr(interrupt, 'value') and isinstance(interrupt.value, dict):
-                        action_requests = interrupt.value.get("action_requests", [])
-                        if action_requests:
-                            original_action = action_requests[0]
-
-                            # Create edited action with modified query
-                            # Need to properly copy the nested structure
-                            import copy
-                            edited_action = copy.deepcopy(original_action)
-
-                            # Update the query argument
-                            if 'arguments' in edited_action:
-                                edited_action['arguments']['query'] = new_query
-                            elif 'args' in edited_action:
-                                edited_action['args']['query'] = new_query
-                            else:
-                                # Debug: print structure if neither key exists
-                                print(f"DEBUG: action structure = {original_action}")
-                                print("Cannot find arguments field!")
-                                continue
-
-                            async for resumed_step in agent.astream(
-                                Command(resume={"decisions": [{"type": "edit", "edited_action": edited_action}]}),
-                                identifier,
-                                stream_mode="values"
-                            ):
-                                if "messages" in resumed_step:
-                                    last_msg = resumed_step["messages"][-1]
-                                    if hasattr(last_msg, 'content'):
-                                        print(last_msg.content, end="", flush=True)
-                else:
-                    print("No changes made, approving original...")
-                    async for resumed_step in agent.astream(
-                        Command(resume={"decisions": [{"type": "approve"}]}),
-                        identifier,
-                        stream_mode="values"
-                    ):
-                        if "messages" in resumed_step:
-                            last_msg = resumed_step["messages"][-1]
-                            if hasattr(last_msg, 'content'):
-                                print(last_msg.content, end="", flush=True)
-
-            break  # Exit after handling interrupt
-
-        # Normal message handling
-        elif "messages" in step:
-            last_msg = step["messages"][-1]
-            if hasattr(last_msg, 'type') and last_msg.type == "ai":
-                if hasattr(last_msg, 'content'):
-                    print(last_msg.content, end="", flush=True)
-
-    print()  # Add a newline at the end
+@dataclass
+class Session:
+    """State of the console: drafted decisions, turns in flight and the thread printed last."""
+
+    approvals: ApprovalQueue
+    # thread ID -> action index -> decision, until every action of the thread is decided
+    drafts: dict[str, dict[int, dict]] = field(default_factory=dict)
+    # thread ID -> its turn or resume in flight
+    turns: dict[str, asyncio.Task] = field(default_factory=dict)
+    # Thread whose tokens were printed last, so interleaved replies get a new prefixed line.
+    printing: str | None = None
+
+
+def print_token(session: Session, thread_id: str, text: str) -> None:
+    if session.printing != thread_id:
+        session.printing = thread_id
+        print(f"\n[{thread_id}] ", end="")
+    print(text, end="", flush=True)
+
+
+async def print_messages(session: Session, thread_id: str, chunks) -> None:
+    # Tokens are printed as they stream, for new turns and for resumed ones alike.
+    try:
+        async for chunk in chunks:
+            print_token(session, thread_id, chunk.text)
+        session.printing = None
+    except Exception as e:
+        print(f"\n[{thread_id}] Turn failed: {e}", flush=True)
+        return
+    pending = [p for p in await session.approvals.pending() if p.thread_id == thread_id]
+    if pending:
+        print(f"\n🛑 [{thread_id}] {len(pending[0].action_requests)} action(s) waiting for approval, see /pending", flush=True)
+
+
+def run_in_background(session: Session, thread_id: str, coroutine) -> None:
+    # Turns run as tasks, so the prompt comes back while they stream or wait for approval.
+    task = session.turns[thread_id] = asyncio.create_task(coroutine)
+
+    def finished(_: asyncio.Task) -> None:
+        if session.turns.get(thread_id) is task:
+            del session.turns[thread_id]
+
+    task.add_done_callback(finished)
+
+
+async def send(session: Session, thread_id: str, text: str) -> None:
+    # A thread waiting for approval is interrupted in its checkpoint: a new message would
+    # run the graph past the interrupt and orphan the parked actions.
+    if thread_id in session.turns:
+        print(f"[{thread_id}] is still answering; wait for it or switch with /thread.")
+    elif any(p.thread_id == thread_id for p in await session.approvals.pending()):
+        print(f"[{thread_id}] has actions waiting for approval; decide them first (/pending), or switch with /thread.")
+    else:
+        input_messages = {"messages": [{"role": "user", "content": text}]}
+        run_in_background(session, thread_id, print_messages(session, thread_id, session.approvals.stream(thread_id, input_messages)))
+
+
+async def numbered_actions(session: Session) -> list[tuple[str, int, dict]]:
+    return [(p.thread_id, index, action) for p in await session.approvals.pending() for index, action in enumerate(p.action_requests)]
+
+
+async def list_pending(session: Session) -> None:
+    actions = await numbered_actions(session)
+    if not actions:
+        print("No pending actions.")
+    for number, (thread_id, index, action) in enumerate(actions, 1):
+        print(f"{number}. [{thread_id}] {action['name']} {action['args']}")
+
+
+def numbered(actions: list[tuple[str, int, dict]], number: str | int) -> tuple[str, int, dict]:
+    # Numbers are 1-based as in /pending; 0 or a negative number would index from the end.
+    if not 1 <= int(number) <= len(actions):
+        raise IndexError(f"no action {number}, see /pending")
+    return actions[int(number) - 1]
+
+
+async def decide(session: Session, command: str, rest: str) -> None:
+    actions = await numbered_actions(session)
+    if command == "approve":
+        numbers = range(1, len(actions) + 1) if rest.strip() == "all" else [int(n) for n in rest.split()]
+        chosen = [(numbered(actions, number), {"type": "approve"}) for number in numbers]
+    else:
+        number, _, text = rest.partition(" ")
+        action = numbered(actions, number)
+        if command == "reject":
+            chosen = [(action, {"type": "reject", "message": text or "The user rejected this action."})]
+        else:
+            edited_action = {"name": action[2]["name"], "args": {**action[2]["args"], "query": text}}
+            chosen = [(action, {"type": "edit", "edited_action": edited_action})]
+    for (thread_id, index, _), decision in chosen:
+        # A thread still listed while its resume runs must not be resumed a second time.
+        if thread_id in session.turns:
+            print(f"[{thread_id}] is still running; decide its actions once it is done.")
+            continue
+        session.drafts.setdefault(thread_id, {})[index] = decision
+
+    # Every thread whose actions are all decided is resumed, concurrently, one call per thread.
+    counts = {p.thread_id: len(p.action_requests) for p in await session.approvals.pending()}
+    for thread_id, decided in list(session.drafts.items()):
+        if len(decided) == counts.get(thread_id) and thread_id not in session.turns:
+            del session.drafts[thread_id]
+            decisions = [decided[index] for index in range(len(decided))]
+            run_in_background(session, thread_id, print_messages(session, thread_id, session.approvals.decide(thread_id, decisions)))
 
 
 # Main loop
-while True:
-    print("\n>>> ", flush=True, end="")
-    user_input = input()
-    if user_input.strip().lower() == "exit":
-        break
-    asyncio.run(stream_agent(user_input))
+# Runs on a single event loop, so the pooled search client keeps its connections between turns.
+# input() runs on a worker thread, so conversations keep streaming while you type.
+async def main():
+    session = Session(ApprovalQueue(agent))
+    thread_id = "1"
+    while True:
+        user_input = (await asyncio.to_thread(input, f"\n[{thread_id}] >>> ")).strip()
+        command, _, rest = user_input.partition(" ")
+        if user_input.lower() == "exit":
+            break
+        try:
+            if command == "/thread" and rest:
+                thread_id = rest.strip()
+            elif command == "/pending":
+                await list_pending(session)
+            elif command == "/policy":
+                print(approval_policy.stats())
+            elif command in ("/approve", "/reject", "/edit"):
+                await decide(session, command[1:], rest)
+            elif user_input:
+                await send(session, thread_id, user_input)
+        except (ValueError, IndexError, KeyError) as e:
+            print(f"Invalid command: {e}")
+    await asyncio.gather(*session.turns.values())
+    await search_cache.aclose()
+
+
+asyncio.run(main())
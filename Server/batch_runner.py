@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_registry import AgentRegistry
+from Server.chat_server import build_agent
+
+
+# Offline batch runner: pushes a JSONL file of prompts through one agent, for evaluations
+# and backfills. Input lines are {"prompt": "..."} or {"messages": [...]}, with an optional
+# "id" (the line number otherwise). Output lines are {"id", "line", "output", "seconds",
+# "attempts"} or {"id", "line", "error", "attempts"}, in completion order. A line that is not
+# valid JSON, or has neither "prompt" nor "messages", gets an error line with 0 attempts, so
+# it is done like any other and a rerun does not stop on it again.
+#   - Prompts are read lazily and fed to `concurrency` workers through a bounded queue, so
+#     memory stays flat however long the file is (agent.abatch would hold the whole batch).
+#   - requests_per_second caps how fast turns start (token bucket); failed turns are
+#     retried with exponential backoff before an error line is written.
+#   - Progress is checkpointed to <output>.progress.json after every `checkpoint_every`
+#     results: the line below which everything is done, the done lines above it and the
+#     size of the output file. A rerun truncates the output to that size (dropping lines
+#     written after the last checkpoint) and skips what is done, so nothing is lost or
+#     written twice.
+#
+#   uv run Server/batch_runner.py prompts.jsonl results.jsonl --concurrency 32 --requests-per-second 20
+#   uv run Server/batch_runner.py prompts.jsonl results.jsonl --fake --fake-latency-ms 50   # no API key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchStats:
+    read: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return (self.succeeded + self.failed) / self.seconds if self.seconds else 0.0
+
+
+class RateLimiter:
+    """Token bucket: on average `rate` acquisitions per second, in bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class Progress:
+    """What is done: every line below `watermark`, the lines in `done`, and `output_bytes` of output."""
+
+    watermark: int = 0
+    done: set[int] = field(default_factory=set)
+    output_bytes: int = 0
+
+    def mark(self, line: int) -> None:
+        self.done.add(line)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def is_done(self, line: int) -> bool:
+        return line < self.watermark or line in self.done
+
+    @classmethod
+    def load(cls, path: Path) -> Progress:
+        if not path.exists():
+            return cls()
+        saved = json.loads(path.read_text())
+        return cls(saved["watermark"], set(saved["done"]), saved["output_bytes"])
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"watermark": self.watermark, "done": sorted(self.done), "output_bytes": self.output_bytes}))
+        os.replace(tmp, path)
+
+
+def read_prompts(path: Path) -> Iterator[tuple[int, dict[str, Any], str | None]]:
+    """(line number, item, error) of every non-blank line; error says why the line cannot run."""
+    with path.open() as f:
+        for line, text in enumerate(f):
+            if not text.strip():
+                continue
+            try:
+                item = json.loads(text)
+            except json.JSONDecodeError as e:
+                yield line, {}, f"JSONDecodeError: {e}"
+                continue
+            if not isinstance(item, dict):
+                yield line, {}, "Invalid item: expected a JSON object"
+            elif not isinstance(item.get("prompt"), str) and not item.get("messages"):
+                yield line, item, 'Invalid item: expected "prompt" or "messages"'
+            else:
+                yield line, item, None
+
+
+class BatchRunner:
+    """Runs the prompts of a JSONL file through an agent, writing results to JSONL.
+
+    Args:
+        agent: A compiled agent or graph with a messages state.
+        concurrency: Turns in flight at once.
+        requests_per_second: Cap on turns started per second. None for no cap.
+        max_retries: Retries of a failed turn before its error is written.
+        timeout_seconds: Time a turn may take, per attempt.
+        checkpoint_every: Results between two progress checkpoints.
+    """
+
+    def __init__(
+        self,
+        agent: Any,
+        *,
+        concurrency: int = 16,
+        requests_per_second: float | None = None,
+        max_retries: int = 2,
+        timeout_seconds: float = 120,
+        checkpoint_every: int = 100,
+    ) -> None:
+        self.agent = agent
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(requests_per_second, burst=max(1, int(requests_per_second))) if requests_per_second else None
+        self.max_retries = max_retries
+        self.timeout_seconds = timeout_seconds
+        self.checkpoint_every = checkpoint_every
+        self._stats = BatchStats()
+
+    def stats(self) -> BatchStats:
+        """Return a snapshot of the batch counters."""
+        return BatchStats(**vars(self._stats))
+
+    async def run_one(self, line: int, item: dict[str, Any]) -> dict[str, Any]:
+        messages = item.get("messages") or [{"role": "user", "content": item["prompt"]}]
+        record: dict[str, Any] = {"id": item.get("id", line), "line": line}
+        for attempt in range(self.max_retries + 1):
+            if self.limiter:
+                await self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                config = {"configurable": {"thread_id": f"batch-{record['id']}"}}
+                async with asyncio.timeout(self.timeout_seconds):
+                    result = await self.agent.ainvoke({"messages": messages}, config)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    return {**record, "error": f"{type(e).__name__}: {e}", "attempts": attempt + 1}
+                self._stats.retries += 1
+                await asyncio.sleep(min(30, 0.5 * 2**attempt) * random.uniform(0.5, 1.5))
+                continue
+            answer = next((m for m in reversed(result["messages"]) if isinstance(m, AIMessage)), None)
+            return {
+                **record,
+                "output": answer.text if answer else None,
+                "seconds": round(time.perf_counter() - start, 4),
+                "attempts": attempt + 1,
+            }
+
+    async def run(self, input_path: str | Path, output_path: str | Path) -> BatchStats:
+        """Run every prompt of input_path not done yet, appending results to output_path."""
+        input_path, output_path = Path(input_path), Path(output_path)
+        progress_path = output_path.with_name(output_path.name + ".progress.json")
+        progress = Progress.load(progress_path)
+        output_path.touch()
+        start = time.perf_counter()
+
+        queue: asyncio.Queue[tuple[int, dict[str, Any], str | None] | None] = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def produce() -> None:
+            for line, item, error in read_prompts(input_path):
+                self._stats.read += 1
+                if progress.is_done(line):
+                    self._stats.skipped += 1
+                    continue
+                await queue.put((line, item, error))
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        with output_path.open("r+b") as out:
+            # Lines written after the last checkpoint are run again, so they are dropped here.
+            out.truncate(progress.output_bytes)
+            out.seek(progress.output_bytes)
+            since_checkpoint = 0
+
+            async def work() -> None:
+                nonlocal since_checkpoint
+                while (entry := await queue.get()) is not None:
+                    line, item, error = entry
+                    if error is None:
+                        record = await self.run_one(line, item)
+                    else:
+                        record = {"id": item.get("id", line), "line": line, "error": error, "attempts": 0}
+                    out.write((json.dumps(record, ensure_ascii=False) + "\n").encode())
+                    progress.mark(line)
+                    if "error" in record:
+                        self._stats.failed += 1
+                    else:
+                        self._stats.succeeded += 1
+                    since_checkpoint += 1
+                    if since_checkpoint >= self.checkpoint_every:
+                        since_checkpoint = 0
+                        self._checkpoint(out, progress, progress_path)
+
+            tasks = [asyncio.create_task(produce()), *(asyncio.create_task(work()) for _ in range(self.concurrency))]
+            try:
+                # Returns when every task is done, or on the first failure.
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    task.result()
+            finally:
+                # After a failure, turns in flight are cancelled; they are not marked done,
+                # so the next run does them again.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self._checkpoint(out, progress, progress_path)
+                self._stats.seconds += time.perf_counter() - start
+        return self.stats()
+
+    def _checkpoint(self, out: Any, progress: Progress, progress_path: Path) -> None:
+        # The output is flushed before the progress that points past it is saved.
+        out.flush()
+        os.fsync(out.fileno())
+        progress.output_bytes = out.tell()
+        progress.save(progress_path)
+
+
+def build_fake_graph(latency_seconds: float = 0.0, failure_rate: float = 0.0) -> Any:
+    """A mock_llm graph like Langgraph/simple_graph.py, with latency and random failures."""
+
+    async def mock_llm(state: MessagesState):
+        await asyncio.sleep(latency_seconds)
+        if random.random() < failure_rate:
+            raise RuntimeError("mock_llm failed")
+        return {"messages": [{"role": "assistant", "content": f"Hello World, you said: {state['messages'][-1].text}"}]}
+
+    graph = StateGraph(MessagesState)
+    graph.add_node(mock_llm)
+    graph.add_edge(START, "mock_llm")
+    graph.add_edge("mock_llm", END)
+    return graph.compile()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the agent")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests-per-second", type=float, help="Cap on turns started per second")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds per attempt")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--fake", action="store_true", help="Use a mock_llm graph instead of the model")
+    parser.add_argument("--fake-latency-ms", type=float, default=50)
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        registry = None
+        if args.fake:
+            agent = build_fake_graph(args.fake_latency_ms / 1000, args.fake_failure_rate)
+        else:
+            registry = AgentRegistry()
+            agent = build_agent(registry, args.model, None)
+            await registry.awarm(connections=args.concurrency)
+        runner = BatchRunner(
+            agent,
+            concurrency=args.concurrency,
+            requests_per_second=args.requests_per_second,
+            max_retries=args.max_retries,
+            timeout_seconds=args.timeout,
+            checkpoint_every=args.checkpoint_every,
+        )
+        try:
+            stats = await runner.run(args.input, args.output)
+        finally:
+            if registry:
+                await registry.aclose()
+        logger.info("%s, %.1f prompts/s", stats, stats.throughput)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from dotenv import load_dotenv
+from aiohttp import WSMsgType, web
+from contextlib import aclosing
+from langchain_core.messages import AIMessageChunk
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+from typing import Any
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import weakref
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_registry import AgentRegistry
+from Agent.response_cache import CachedChatModel, MemoryCacheBackend, RedisCacheBackend, ResponseCache
+from Agent_Memory.bounded_saver import BoundedInMemorySaver
+from Agent_Memory.write_behind_saver import WriteBehindSaver
+
+
+# Long-lived chat server: one event loop, one compiled agent and one checkpointer
+# shared by every conversation. The REPL scripts call asyncio.run() for every message
+# and hard-code thread_id "1"; here each conversation is keyed by its own thread_id and
+# many of them stream concurrently.
+#
+#   POST /threads/{thread_id}/messages   {"content": "..."}  -> Server-Sent Events
+#   GET  /threads/{thread_id}/ws                              -> WebSocket, one text message per turn
+#   GET  /stats
+#
+# Backpressure is per connection: tokens are pulled from agent.astream only as fast as
+# the socket accepts them, so a slow client slows down its own turn and nobody else's.
+# A client that stops reading for send_timeout_seconds is dropped.
+#
+#   uv run Server/chat_server.py --port 8080
+#   uv run Server/chat_server.py --redis          # WriteBehindSaver on REDIS_URL instead of memory
+#   uv run Server/chat_server.py --cache memory   # answer repeated questions from a ResponseCache
+#   curl -N -X POST localhost:8080/threads/alice/messages -d '{"content": "Hi! My name is Alice."}'
+
+logger = logging.getLogger(__name__)
+
+
+class ClientGone(Exception):
+    """The client closed the connection or stopped reading for send_timeout_seconds."""
+
+
+class ChatServer:
+    """Serves one compiled agent to many concurrent conversations.
+
+    Args:
+        agent: The compiled agent, created with a checkpointer.
+        max_concurrent_turns: Maximum number of turns streaming at once; later turns wait.
+        send_timeout_seconds: A client that does not accept a token for this long is dropped.
+        response_cache: The agent model's ResponseCache, if any, reported in /stats.
+    """
+
+    def __init__(
+        self,
+        agent: Any,
+        *,
+        max_concurrent_turns: int = 10_000,
+        send_timeout_seconds: float = 30,
+        response_cache: ResponseCache | None = None,
+    ) -> None:
+        self.agent = agent
+        self.response_cache = response_cache
+        self.max_concurrent_turns = max_concurrent_turns
+        self.send_timeout_seconds = send_timeout_seconds
+        self.turn_slots = asyncio.Semaphore(max_concurrent_turns)
+        # thread ID -> lock, so two turns of the same conversation never interleave
+        self.thread_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+        self.open_connections = 0
+        self.active_turns = 0
+        self.completed_turns = 0
+        self.failed_turns = 0
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            "open_connections": self.open_connections,
+            "active_turns": self.active_turns,
+            "completed_turns": self.completed_turns,
+            "failed_turns": self.failed_turns,
+        }
+        if hasattr(self.agent.checkpointer, "stats"):
+            stats["checkpointer"] = vars(self.agent.checkpointer.stats())
+        if self.response_cache is not None:
+            cache_stats = self.response_cache.stats()
+            stats["response_cache"] = {**vars(cache_stats), "hit_rate": cache_stats.hit_rate}
+        return stats
+
+    async def stream_turn(self, thread_id: str, content: str) -> AsyncIterator[str]:
+        """Run one turn of a conversation and yield the model's tokens."""
+        if (lock := self.thread_locks.get(thread_id)) is None:
+            lock = self.thread_locks[thread_id] = asyncio.Lock()
+        async with lock, self.turn_slots:
+            self.active_turns += 1
+            try:
+                input = {"messages": [{"role": "user", "content": content}]}
+                identifier = {"configurable": {"thread_id": thread_id}}
+                async for message, _ in self.agent.astream(input, identifier, stream_mode="messages"):
+                    if isinstance(message, AIMessageChunk) and message.content:
+                        yield message.content
+                # Durability barrier for write-behind checkpointers.
+                if isinstance(self.agent.checkpointer, WriteBehindSaver):
+                    await self.agent.checkpointer.aflush(thread_id)
+                self.completed_turns += 1
+            except Exception:
+                self.failed_turns += 1
+                raise
+            finally:
+                self.active_turns -= 1
+
+    # ---------------------------------------------------------------- handlers
+
+    async def _send(self, send: Callable[[Any], Awaitable[Any]], payload: Any) -> None:
+        # Only a failed send means the client went away; errors of the turn itself go to the client.
+        try:
+            async with asyncio.timeout(self.send_timeout_seconds):
+                await send(payload)
+        except (ConnectionResetError, TimeoutError) as e:
+            raise ClientGone from e
+
+    async def handle_sse(self, request: web.Request) -> web.StreamResponse:
+        thread_id = request.match_info["thread_id"]
+        try:
+            content = (await request.json())["content"]
+        except (ValueError, KeyError, TypeError):
+            raise web.HTTPBadRequest(text='Expected a JSON body like {"content": "..."}')
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        self.open_connections += 1
+        try:
+            try:
+                async with aclosing(self.stream_turn(thread_id, content)) as tokens:
+                    async for token in tokens:
+                        await self._send(response.write, f"data: {json.dumps({'token': token})}\n\n".encode())
+                await self._send(response.write, b"event: end\ndata: {}\n\n")
+            except ClientGone:
+                raise
+            except Exception as e:
+                logger.exception("Turn failed for thread %s", thread_id)
+                await self._send(response.write, f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n".encode())
+        except ClientGone:
+            logger.info("Client of thread %s went away", thread_id)
+        finally:
+            self.open_connections -= 1
+        return response
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        thread_id = request.match_info["thread_id"]
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self.open_connections += 1
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    async with aclosing(self.stream_turn(thread_id, msg.data)) as tokens:
+                        async for token in tokens:
+                            await self._send(ws.send_json, {"type": "token", "content": token})
+                    await self._send(ws.send_json, {"type": "end"})
+                except ClientGone:
+                    raise
+                except Exception as e:
+                    logger.exception("Turn failed for thread %s", thread_id)
+                    await self._send(ws.send_json, {"type": "error", "error": str(e)})
+        except ClientGone:
+            logger.info("Client of thread %s went away", thread_id)
+        finally:
+            self.open_connections -= 1
+        return ws
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/threads/{thread_id}/messages", self.handle_sse)
+        app.router.add_get("/threads/{thread_id}/ws", self.handle_ws)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+
+def build_agent(registry: AgentRegistry, model: Any, checkpointer: Any) -> Any:
+    return registry.agent(
+        model=model,
+        system_prompt="You are an AI chatbot that will response to user query.",
+        checkpointer=checkpointer,
+        debug=False
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-conversation chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--max-concurrent-turns", type=int, default=10_000)
+    parser.add_argument("--redis", action="store_true", help="Store checkpoints in REDIS_URL")
+    parser.add_argument("--cache", choices=["memory", "redis"], help="Cache model answers in memory or in REDIS_URL")
+    parser.add_argument("--similarity-threshold", type=float, default=0, help="0 (default) caches exact matches only")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    registry = AgentRegistry()
+    model, response_cache = args.model, None
+    if args.cache:
+        backend = RedisCacheBackend(os.environ["REDIS_URL"]) if args.cache == "redis" else MemoryCacheBackend()
+        response_cache = ResponseCache(backend, similarity_threshold=args.similarity_threshold or None)
+        model = CachedChatModel(model=registry.model(args.model), response_cache=response_cache)
+    server = ChatServer(
+        build_agent(registry, model, BoundedInMemorySaver()),
+        max_concurrent_turns=args.max_concurrent_turns,
+        response_cache=response_cache,
+    )
+    app = server.create_app()
+
+    if args.redis:
+        # The Redis client must be created on the server's event loop.
+        async def redis_checkpointer(app: web.Application):
+            async with WriteBehindSaver.from_conn_string(os.environ["REDIS_URL"]) as checkpointer:
+                server.agent = build_agent(registry, model, checkpointer)
+                yield
+
+        app.cleanup_ctx.append(redis_checkpointer)
+
+    # Open connections to the model provider before the first conversation arrives.
+    async def model_connections(app: web.Application):
+        await registry.awarm()
+        yield
+        await registry.aclose()
+
+    app.cleanup_ctx.append(model_connections)
+
+    web.run_app(app, host=args.host, port=args.port, backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
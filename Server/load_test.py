@@ -0,0 +1,93 @@
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, web
+from langchain_core.messages import AIMessage
+from pathlib import Path
+import argparse
+import asyncio
+import resource
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Agent.agent_registry import AgentRegistry
+from Agent_Memory.bounded_saver import BoundedInMemorySaver
+from Benchmarks.fake_chat_model import ScriptedChatModel
+from Server.chat_server import ChatServer, build_agent
+
+
+# Load test for chat_server.py with a fake model (no API key, no network).
+# Starts the server in-process, opens N concurrent conversations over SSE, each with
+# its own thread_id, and runs several turns per conversation. Reports turn latency,
+# time to first token and throughput for each concurrency level.
+#
+#   uv run Server/load_test.py --sessions 100 1000 2000 --turns 3
+#   uv run Server/load_test.py --sessions 1000 --tokens-per-second 50   # model-bound, like a real LLM
+
+ANSWER = "The capital of the USA is Washington, D.C. It has been the capital since 1800."
+
+
+def percentile(samples: list[float], q: int) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def conversation(http: ClientSession, base_url: str, thread_id: str, turns: int, latencies, ttfts) -> None:
+    for turn in range(turns):
+        start = time.perf_counter()
+        first_token = None
+        async with http.post(f"{base_url}/threads/{thread_id}/messages", json={"content": f"Question {turn}"}) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                if first_token is None and line.startswith(b"data: {\"token\""):
+                    first_token = time.perf_counter() - start
+                if line.startswith(b"event: end"):
+                    break
+        latencies.append(time.perf_counter() - start)
+        ttfts.append(first_token or 0.0)
+
+
+async def run(sessions: int, turns: int, tokens_per_second: float) -> None:
+    model = ScriptedChatModel(script=[AIMessage(content=ANSWER)], tokens_per_second=tokens_per_second)
+    server = ChatServer(build_agent(AgentRegistry(), model, BoundedInMemorySaver(max_threads=sessions * 2)))
+    runner = web.AppRunner(server.create_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, backlog=4096)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    latencies: list[float] = []
+    ttfts: list[float] = []
+    async with ClientSession(connector=TCPConnector(limit=sessions), timeout=ClientTimeout(total=None)) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            conversation(http, base_url, f"session-{i}", turns, latencies, ttfts) for i in range(sessions)
+        ))
+        elapsed = time.perf_counter() - start
+    stats = server.stats()
+    await runner.cleanup()
+
+    print(
+        f"{sessions:>6} sessions: {len(latencies) / elapsed:8.1f} turns/s  "
+        f"turn p50={percentile(latencies, 50) * 1000:7.1f} ms p99={percentile(latencies, 99) * 1000:7.1f} ms  "
+        f"ttft p50={percentile(ttfts, 50) * 1000:7.1f} ms  "
+        f"completed={stats['completed_turns']} failed={stats['failed_turns']} "
+        f"threads in memory={stats['checkpointer']['threads']}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test chat_server.py with a fake model")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Streaming rate of the fake model, 0 for no delay")
+    args = parser.parse_args()
+
+    # Every session holds a client and a server socket open.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    for sessions in args.sessions:
+        await run(sessions, args.turns, args.tokens_per_second)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
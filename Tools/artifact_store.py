@@ -0,0 +1,436 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from deepagents.backends import StateBackend
+from deepagents.backends.protocol import EditResult, FileInfo, GrepMatch, WriteResult
+from deepagents.backends.utils import (
+    create_file_data,
+    file_data_to_string,
+    format_content_with_line_numbers,
+    grep_matches_from_files,
+    perform_string_replacement,
+)
+from langchain.tools import ToolRuntime
+
+
+# Content-addressed artifact store that keeps large payloads out of graph state.
+# A deep agent's virtual files (notes, drafts, the report, large tool results evicted by
+# FilesystemMiddleware) live in the `files` channel, and every write re-serializes the
+# whole channel into the next checkpoint. With ArtifactBackend, files of min_chars or more
+# are stored once in an ArtifactStore under the blake2b hash of their text, and the state
+# only holds a reference: {"artifact": <hash>, "size", "lines", "created_at", "modified_at"}.
+# Raw search pages can be stashed too (make_internet_search(..., artifacts=store)): each
+# result then carries an `artifact` path under /artifacts/ that read_file opens on demand.
+#   - Payloads are loaded only when a tool needs them. On disk, read_file maps the blob and
+#     decodes just the lines asked for; full texts (grep, edit) are kept in an LRU cache.
+#   - Blobs live in memory, in a directory (DiskBlobs) or in Redis (RedisBlobs).
+#   - collect() deletes the blobs no checkpoint refers to any more, once they are older
+#     than a grace period (so blobs written by a step in flight are kept).
+#
+# Usage:
+#   artifacts = ArtifactStore(DiskBlobs(".artifacts"))
+#   agent = create_deep_agent(..., backend=lambda runtime: ArtifactBackend(runtime, artifacts))
+#   artifacts.collect(referenced_artifacts(checkpointer), grace_seconds=3600)
+#   print(artifacts.stats())
+
+ARTIFACT_DIR = "/artifacts/"
+ARTIFACT_PATH = re.compile(re.escape(ARTIFACT_DIR) + r"([0-9a-f]{32})")
+
+
+def digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@dataclass
+class ArtifactStats:
+    puts: int = 0
+    blobs_written: int = 0
+    bytes_written: int = 0
+    reads: int = 0
+    cache_hits: int = 0
+    bytes_read: int = 0
+    blobs_collected: int = 0
+
+
+def _split_lines(data: bytes, offset: int, limit: int) -> tuple[list[str], int | None]:
+    lines = data.decode().split("\n")
+    return lines[offset : offset + limit], None if offset < len(lines) else len(lines)
+
+
+class MemoryBlobs:
+    """Blobs of this process, kept until collected."""
+
+    def __init__(self) -> None:
+        # digest -> (written at, data)
+        self.blobs: dict[str, tuple[float, bytes]] = {}
+
+    def put(self, key: str, data: bytes) -> bool:
+        new = key not in self.blobs
+        self.blobs[key] = (time.time(), data)
+        return new
+
+    def get(self, key: str) -> bytes | None:
+        entry = self.blobs.get(key)
+        return entry[1] if entry else None
+
+    def lines(self, key: str, offset: int, limit: int) -> tuple[list[str], int | None] | None:
+        data = self.get(key)
+        return None if data is None else _split_lines(data, offset, limit)
+
+    def scan(self) -> Iterator[tuple[str, float]]:
+        return ((key, written_at) for key, (written_at, _) in list(self.blobs.items()))
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.blobs.pop(key, None)
+
+
+class DiskBlobs:
+    """Blobs as files under root/<2 hex>/<30 hex>. Line reads map the file instead of loading it.
+
+    Args:
+        root: Directory of the blobs, created if needed.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:]
+
+    def put(self, key: str, data: bytes) -> bool:
+        path = self.path(key)
+        if path.exists():
+            # Refresh the write time, which the grace period of collect() goes by.
+            os.utime(path)
+            return False
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return True
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def lines(self, key: str, offset: int, limit: int) -> tuple[list[str], int | None] | None:
+        try:
+            f = self.path(key).open("rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return _split_lines(b"", offset, limit)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Only the pages up to the last line asked for are touched.
+                start = 0
+                for line in range(offset):
+                    end = mm.find(b"\n", start)
+                    if end < 0:
+                        return [], line + 1
+                    start = end + 1
+                selected = []
+                while len(selected) < limit:
+                    end = mm.find(b"\n", start)
+                    if end < 0:
+                        selected.append(mm[start:].decode())
+                        break
+                    selected.append(mm[start:end].decode())
+                    start = end + 1
+                return selected, None
+
+    def scan(self) -> Iterator[tuple[str, float]]:
+        for folder in self.root.iterdir():
+            if folder.is_dir() and len(folder.name) == 2:
+                for entry in os.scandir(folder):
+                    if not entry.name.endswith(".tmp"):
+                        yield folder.name + entry.name, entry.stat().st_mtime
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.path(key).unlink(missing_ok=True)
+
+
+class RedisBlobs:
+    """Blobs in Redis, one key each, plus a sorted set of their write times for collect().
+
+    Args:
+        redis_url: Redis connection URL, usually REDIS_URL.
+        prefix: Key prefix.
+    """
+
+    def __init__(self, redis_url: str, *, prefix: str = "artifact:") -> None:
+        from redis import Redis
+
+        self.client = Redis.from_url(redis_url)
+        self.prefix = prefix
+        self.index = prefix + "index"
+
+    def put(self, key: str, data: bytes) -> bool:
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, data, nx=True)
+            pipe.zadd(self.index, {key: time.time()})
+            new, _ = pipe.execute()
+        return bool(new)
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def lines(self, key: str, offset: int, limit: int) -> tuple[list[str], int | None] | None:
+        data = self.get(key)
+        return None if data is None else _split_lines(data, offset, limit)
+
+    def scan(self) -> Iterator[tuple[str, float]]:
+        for key, written_at in self.client.zscan_iter(self.index):
+            yield key.decode(), written_at
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.delete(*(self.prefix + key for key in keys))
+                pipe.zrem(self.index, *keys)
+                pipe.execute()
+
+
+class ArtifactStore:
+    """Content-addressed texts on a blob backend, with an LRU cache of the texts read in full.
+
+    Args:
+        blobs: Where blobs are kept. Defaults to memory.
+        cache_bytes: Size of the text cache.
+    """
+
+    def __init__(self, blobs: MemoryBlobs | DiskBlobs | RedisBlobs | None = None, *, cache_bytes: int = 64 * 2**20) -> None:
+        self.blobs = blobs or MemoryBlobs()
+        self.cache_bytes = cache_bytes
+        self.cache: OrderedDict[str, str] = OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+        self._stats = ArtifactStats()
+
+    def stats(self) -> ArtifactStats:
+        """Return a snapshot of the store counters."""
+        with self.lock:
+            return ArtifactStats(**vars(self._stats))
+
+    def _cache(self, key: str, text: str) -> None:
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return
+        self.cache[key] = text
+        self.cached_bytes += len(text)
+        while self.cached_bytes > self.cache_bytes and self.cache:
+            self.cached_bytes -= len(self.cache.popitem(last=False)[1])
+
+    def put(self, text: str) -> str:
+        """Store a text, return its hash."""
+        data = text.encode()
+        key = digest(data)
+        new = self.blobs.put(key, data)
+        with self.lock:
+            self._stats.puts += 1
+            if new:
+                self._stats.blobs_written += 1
+                self._stats.bytes_written += len(data)
+            self._cache(key, text)
+        return key
+
+    def text(self, key: str) -> str | None:
+        """The whole text of a hash, or None when it is not in the store."""
+        with self.lock:
+            self._stats.reads += 1
+            if (text := self.cache.get(key)) is not None:
+                self._stats.cache_hits += 1
+                self.cache.move_to_end(key)
+                return text
+        data = self.blobs.get(key)
+        if data is None:
+            return None
+        text = data.decode()
+        with self.lock:
+            self._stats.bytes_read += len(data)
+            self._cache(key, text)
+        return text
+
+    def lines(self, key: str, offset: int, limit: int) -> tuple[list[str], int | None] | None:
+        """Lines offset..offset+limit of a text, and its line count when offset is past its end."""
+        with self.lock:
+            text = self.cache.get(key)
+            self._stats.reads += 1
+            self._stats.cache_hits += text is not None
+        if text is not None:
+            lines = text.split("\n")
+            return lines[offset : offset + limit], None if offset < len(lines) else len(lines)
+        return self.blobs.lines(key, offset, limit)
+
+    def collect(self, live: Iterable[str], *, grace_seconds: float = 3600) -> int:
+        """Delete the blobs not in `live` written more than grace_seconds ago. Returns how many."""
+        live = set(live)
+        cutoff = time.time() - grace_seconds
+        dead = [key for key, written_at in self.blobs.scan() if key not in live and written_at < cutoff]
+        self.blobs.delete(dead)
+        with self.lock:
+            for key in dead:
+                if (text := self.cache.pop(key, None)) is not None:
+                    self.cached_bytes -= len(text)
+            self._stats.blobs_collected += len(dead)
+        return len(dead)
+
+
+# ---------------------------------------------------------------- references
+
+
+def _references(values: dict[str, Any], found: set[str]) -> None:
+    for file_data in (values.get("files") or {}).values():
+        if file_data and "artifact" in file_data:
+            found.add(file_data["artifact"])
+    for message in values.get("messages") or []:
+        content = getattr(message, "content", message)
+        found.update(ARTIFACT_PATH.findall(content if isinstance(content, str) else str(content)))
+
+
+def _checkpoint_references(checkpoint_tuple: Any, found: set[str]) -> None:
+    _references(checkpoint_tuple.checkpoint["channel_values"], found)
+    for _, channel, value in checkpoint_tuple.pending_writes or []:
+        if channel == "files":
+            _references({"files": value}, found)
+        elif channel == "messages":
+            _references({"messages": value if isinstance(value, list) else [value]}, found)
+
+
+def referenced_artifacts(checkpointer: Any) -> set[str]:
+    """Hashes referred to by any checkpoint of any thread: file references and /artifacts/ paths in messages."""
+    found: set[str] = set()
+    for checkpoint_tuple in checkpointer.list(None):
+        _checkpoint_references(checkpoint_tuple, found)
+    return found
+
+
+async def areferenced_artifacts(checkpointer: Any) -> set[str]:
+    """Async version of referenced_artifacts, for AsyncRedisSaver."""
+    found: set[str] = set()
+    async for checkpoint_tuple in checkpointer.alist(None):
+        _checkpoint_references(checkpoint_tuple, found)
+    return found
+
+
+# ---------------------------------------------------------------- deepagents backend
+
+
+class _LazyFile(dict):
+    """File data of a reference, whose `content` lines are loaded from the store on first use."""
+
+    def __init__(self, file_data: dict[str, Any], store: ArtifactStore) -> None:
+        super().__init__(file_data)
+        self.store = store
+
+    def __missing__(self, key: str) -> Any:
+        if key != "content":
+            raise KeyError(key)
+        self["content"] = lines = (self.store.text(self["artifact"]) or "").split("\n")
+        return lines
+
+
+class ArtifactBackend(StateBackend):
+    """StateBackend that keeps files of min_chars or more in an ArtifactStore, with only a reference in state.
+
+    Args:
+        runtime: The tool runtime, as passed to backend factories.
+        store: Where file contents and raw search pages are kept.
+        min_chars: Smaller files stay in state, where reading them needs no round trip.
+    """
+
+    def __init__(self, runtime: ToolRuntime, store: ArtifactStore, *, min_chars: int = 1024) -> None:
+        super().__init__(runtime)
+        self.store = store
+        self.min_chars = min_chars
+
+    def _file_data(self, content: str, created_at: str | None = None) -> dict[str, Any]:
+        if len(content) < self.min_chars:
+            return create_file_data(content, created_at)
+        now = datetime.now(UTC).isoformat()
+        return {
+            "artifact": self.store.put(content),
+            "size": len(content),
+            "lines": content.count("\n") + 1,
+            "created_at": created_at or now,
+            "modified_at": now,
+        }
+
+    def _text(self, file_data: dict[str, Any]) -> str | None:
+        if "artifact" in file_data:
+            return self.store.text(file_data["artifact"])
+        return file_data_to_string(file_data)
+
+    def _with_sizes(self, infos: list[FileInfo]) -> list[FileInfo]:
+        files = self.runtime.state.get("files", {})
+        for info in infos:
+            file_data = files.get(info["path"])
+            if file_data and "artifact" in file_data:
+                info["size"] = file_data["size"]
+        return infos
+
+    def ls_info(self, path: str) -> list[FileInfo]:
+        return self._with_sizes(super().ls_info(path))
+
+    def glob_info(self, pattern: str, path: str = "/") -> list[FileInfo]:
+        return self._with_sizes(super().glob_info(pattern, path))
+
+    def read(self, file_path: str, offset: int = 0, limit: int = 2000) -> str:
+        file_data = self.runtime.state.get("files", {}).get(file_path)
+        if file_data is None and (match := ARTIFACT_PATH.fullmatch(file_path)):
+            key = match.group(1)
+        elif file_data is not None and "artifact" in file_data:
+            key = file_data["artifact"]
+        else:
+            return super().read(file_path, offset, limit)
+        result = self.store.lines(key, offset, limit)
+        if result is None:
+            return f"Error: File '{file_path}' is missing from the artifact store"
+        selected, line_count = result
+        if line_count is not None:
+            return f"Error: Line offset {offset} exceeds file length ({line_count} lines)"
+        return format_content_with_line_numbers(selected, start_line=offset + 1)
+
+    def write(self, file_path: str, content: str) -> WriteResult:
+        if file_path in self.runtime.state.get("files", {}):
+            return WriteResult(error=f"Cannot write to {file_path} because it already exists. Read and then make an edit, or write to a new path.")
+        return WriteResult(path=file_path, files_update={file_path: self._file_data(content)})
+
+    def edit(self, file_path: str, old_string: str, new_string: str, replace_all: bool = False) -> EditResult:
+        file_data = self.runtime.state.get("files", {}).get(file_path)
+        if file_data is None:
+            return EditResult(error=f"Error: File '{file_path}' not found")
+        content = self._text(file_data)
+        if content is None:
+            return EditResult(error=f"Error: File '{file_path}' is missing from the artifact store")
+        result = perform_string_replacement(content, old_string, new_string, replace_all)
+        if isinstance(result, str):
+            return EditResult(error=result)
+        new_content, occurrences = result
+        new_file_data = self._file_data(new_content, file_data["created_at"])
+        return EditResult(path=file_path, files_update={file_path: new_file_data}, occurrences=int(occurrences))
+
+    def grep_raw(self, pattern: str, path: str = "/", glob: str | None = None) -> list[GrepMatch] | str:
+        files = {
+            file_path: _LazyFile(file_data, self.store) if "artifact" in file_data else file_data
+            for file_path, file_data in self.runtime.state.get("files", {}).items()
+        }
+        return grep_matches_from_files(files, pattern, path, glob)
@@ -0,0 +1,114 @@
+from aiohttp import web
+from tavily import TavilyClient
+from pathlib import Path
+import asyncio
+import sys
+import threading
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Tools.internet_search import CachedSearch, PooledAsyncTavilyClient
+
+
+# Compares the blocking internet_search with the async, pooled one against a local
+# stub of the Tavily /search endpoint. For each mode it reports the wall time of one
+# agent step that emits 5 internet_search calls, how long the event loop was frozen
+# meanwhile, and the throughput of 200 searches.
+#
+#   uv run Tools/bench_async_search.py
+
+SEARCH_SECONDS = 0.05
+FAN_OUT = 5
+SEARCHES = 200
+
+
+def start_stub_server() -> str:
+    """Run a fake Tavily API on its own thread and return its base URL."""
+    started = threading.Event()
+    base_url = []
+
+    async def search(request: web.Request) -> web.Response:
+        data = await request.json()
+        await asyncio.sleep(SEARCH_SECONDS)
+        return web.json_response({"query": data["query"], "results": [{"title": data["query"], "content": "..."}]})
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post("/search", search)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        base_url.append(f"http://127.0.0.1:{port}")
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+    return base_url[0]
+
+
+async def max_loop_lag(stop: asyncio.Event) -> float:
+    """Longest time the event loop could not run this heartbeat."""
+    lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lag = max(lag, time.perf_counter() - start - 0.001)
+    return lag
+
+
+async def measure(name: str, step, searches) -> None:
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(max_loop_lag(stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await step()
+    step_seconds = time.perf_counter() - start
+    stop.set()
+    lag = await heartbeat
+
+    start = time.perf_counter()
+    await searches()
+    throughput = SEARCHES / (time.perf_counter() - start)
+    print(f"{name:>16}: step with {FAN_OUT} searches={step_seconds * 1000:7.1f} ms  "
+          f"max loop stall={lag * 1000:7.1f} ms  throughput={throughput:7.1f} searches/s")
+
+
+async def main():
+    base_url = start_stub_server()
+
+    # Before: the tool called TavilyClient.search directly inside the running event loop.
+    blocking = TavilyClient(api_key="stub", base_url=base_url)
+
+    async def blocking_step():
+        for i in range(FAN_OUT):
+            blocking.search(query=f"step {i}", max_results=5, topic="general", include_raw_content=False)
+
+    async def blocking_searches():
+        for i in range(SEARCHES):
+            blocking.search(query=f"blocking {i}", max_results=5, topic="general", include_raw_content=False)
+
+    await measure("blocking", blocking_step, blocking_searches)
+
+    # After: asearch on a pooled keep-alive client, with the model's tool calls run concurrently.
+    for max_concurrency in (8, 32):
+        search = CachedSearch(
+            None,
+            async_client=PooledAsyncTavilyClient("stub", base_url=base_url, max_connections=max_concurrency),
+            max_concurrency=max_concurrency,
+        )
+
+        async def async_step():
+            await asyncio.gather(*(search.asearch(f"async step {i}") for i in range(FAN_OUT)))
+
+        async def async_searches():
+            await asyncio.gather(*(search.asearch(f"async {i}") for i in range(SEARCHES)))
+
+        await measure(f"async, limit={max_concurrency}", async_step, async_searches)
+        await search.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+from pathlib import Path
+import json
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Tools.result_budget import ResultBudget, estimate_tokens
+
+
+# How much ResultBudget cuts from include_raw_content=True search results, how long it
+# takes, and whether the answer survives. Pages are synthetic but shaped like Tavily's
+# raw_content: navigation, cookie banners and footers shared across sites, long off-topic
+# sections, a duplicate result, and a few paragraphs that answer the query. Each of those
+# carries a fact marker, and "facts kept" counts the markers left after trimming.
+#
+#   uv run Tools/bench_result_budget.py
+
+CALLS = 200
+SEED = 3
+QUERY = "How does LangGraph checkpointing persist agent state between turns?"
+
+NAVIGATION = ["[Home](/) | [Docs](/docs) | [Blog](/blog) | [Pricing](/pricing)", "Skip to main content", "Menu", "Search"]
+BANNERS = ["We use cookies to improve your experience. Accept all cookies or manage preferences.",
+           "Subscribe to our newsletter for weekly updates!"]
+FOOTER = ["Copyright 2025 Example Inc. All rights reserved.", "[Privacy Policy](/privacy) · [Terms of Service](/terms)",
+          "Follow us on [X](https://x.com) and [GitHub](https://github.com)"]
+RELEVANT = [
+    "A LangGraph checkpointer saves a checkpoint of the graph state after every superstep, keyed by thread_id, "
+    "so the next turn of the same thread resumes from the persisted agent state. FACT-{n}",
+    "Checkpointing in LangGraph persists state between turns: InMemorySaver keeps checkpoints in memory, while "
+    "PostgresSaver and RedisSaver persist them so conversations survive restarts. FACT-{n}",
+    "Because every checkpoint is stored with its thread, LangGraph can replay, fork or resume an agent from any "
+    "earlier checkpoint, which also powers human-in-the-loop interrupts. FACT-{n}",
+]
+OFF_TOPIC = [
+    "Our team met in Lisbon this spring to plan the next release and enjoyed the local food.",
+    "Pricing is based on seats, with discounts for annual plans and for non-profit organizations.",
+    "The history of graph theory starts with Euler and the seven bridges of Königsberg.",
+    "Vector databases index embeddings so that similar documents can be retrieved quickly.",
+    "Prompt engineering covers instructions, examples and output formats for large language models.",
+    "Kubernetes schedules containers on nodes and restarts them when health checks fail.",
+    "Our webinar series covers observability, tracing and evaluation of production applications.",
+]
+
+
+def page(rng: random.Random, facts: list[int]) -> str:
+    lines = [*NAVIGATION, "", rng.choice(BANNERS), "", "# " + rng.choice(["Guide", "Overview", "Tutorial"]), ""]
+    sections = [" ".join(rng.choices(OFF_TOPIC, k=rng.randint(4, 9))) for _ in range(rng.randint(8, 16))]
+    for fact in facts:
+        sections.insert(rng.randrange(len(sections) + 1), rng.choice(RELEVANT).format(n=fact))
+    for section in sections:
+        lines += [section, ""]
+    return "\n".join(lines + FOOTER)
+
+
+def search_result(rng: random.Random) -> tuple[dict, set[str]]:
+    results, facts = [], set()
+    for site in range(5):
+        page_facts = [site * 10 + i for i in range(rng.randint(0, 2))]
+        facts |= {f"FACT-{n}" for n in page_facts}
+        results.append({
+            "url": f"https://www.site{site}.example/langgraph/checkpoints",
+            "title": f"LangGraph checkpoints #{site}",
+            "content": "LangGraph checkpointers persist graph state per thread.",
+            "raw_content": page(rng, page_facts),
+        })
+    results.append({**results[0], "url": results[0]["url"] + "/"})  # the same page again
+    return {"query": QUERY, "results": results}, facts
+
+
+def main():
+    rng = random.Random(SEED)
+    calls = [search_result(rng) for _ in range(CALLS)]
+    for max_tokens in (4000, 2000, 1000):
+        budget = ResultBudget(max_tokens=max_tokens)
+        samples, kept, total = [], 0, 0
+        for result, facts in calls:
+            start = time.perf_counter()
+            trimmed = budget.apply(result, QUERY)
+            samples.append(time.perf_counter() - start)
+            text = json.dumps(trimmed)
+            kept += sum(fact in text for fact in facts)
+            total += len(facts)
+        stats = budget.stats()
+        before = statistics.median(estimate_tokens(json.dumps(result)) for result, _ in calls)
+        after = statistics.median(estimate_tokens(json.dumps(budget.apply(result, QUERY))) for result, _ in calls)
+        print(
+            f"max_tokens={max_tokens:5}: tool message p50 {before:6.0f} -> {after:5.0f} tokens ({stats.reduction:.0%} cut)"
+            f"  facts kept={kept}/{total}  p50={statistics.median(samples) * 1000:5.2f} ms"
+            f"  duplicates={stats.duplicates_removed} boilerplate lines={stats.boilerplate_lines_removed}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from Tools.internet_search import CachedSearch
+
+
+# Replays a deep-research style workload (many near-identical queries, several
+# searches in flight at once) through CachedSearch with a stub Tavily client,
+# then restarts the cache on the same SQLite file to show the on-disk tier.
+#
+#   uv run Tools/bench_search_cache.py
+
+SEARCH_SECONDS = 0.05
+QUERIES = [
+    "What is langgraph?",
+    "what is LangGraph?",
+    "langgraph checkpointer",
+    "LangGraph  checkpointer ",
+    "langchain v1 create_agent",
+    "deepagents subagents",
+]
+
+
+class StubTavilyClient:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def search(self, query, max_results, topic, include_raw_content):
+        with self.lock:
+            self.calls += 1
+        time.sleep(SEARCH_SECONDS)
+        return {"query": query, "results": [{"title": f"{query} #{i}", "content": "..."} for i in range(max_results)]}
+
+
+def run(search: CachedSearch, requests: int) -> float:
+    rng = random.Random(0)
+    queries = [rng.choice(QUERIES) for _ in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(search.search, queries))
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        db_path = Path(cache_dir) / "tavily.sqlite"
+
+        client = StubTavilyClient()
+        search = CachedSearch(client, db_path=db_path)
+        elapsed = run(search, 200)
+        stats = search.stats()
+        print(f"cold: {elapsed:.2f}s, upstream calls={client.calls}, hit rate={stats.hit_rate:.1%}, "
+              f"time saved={stats.seconds_saved:.2f}s")
+        print(f"  {stats}")
+        search.close()
+
+        client = StubTavilyClient()
+        search = CachedSearch(client, db_path=db_path)
+        elapsed = run(search, 200)
+        stats = search.stats()
+        print(f"after restart: {elapsed:.2f}s, upstream calls={client.calls}, hit rate={stats.hit_rate:.1%}, "
+              f"time saved={stats.seconds_saved:.2f}s")
+        print(f"  {stats}")
+        search.close()
+
+    print(f"uncached: {200 * SEARCH_SECONDS / 8:.2f}s for 200 searches on 8 threads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+import httpx
+from langchain_core.tools import StructuredTool
+from tavily import TavilyError
+
+from Tools.artifact_store import ARTIFACT_DIR, ArtifactStore
+from Tools.result_budget import ResultBudget
+
+
+# Shared internet_search tool for the HumanInTheLoop and DeepAgent agents.
+# Search results are cached in two tiers:
+#   1. an in-memory LRU with TTL, for repeated queries within one run;
+#   2. an optional SQLite file that survives restarts.
+# Cache keys are normalized on (query, topic, max_results, include_raw_content), so
+# "What is LangGraph?" and "  what is   langgraph? " share one entry. Identical
+# concurrent searches are coalesced into one upstream call (single-flight).
+#
+# The tool also has an async path (asearch) so agents running under astream never
+# block the event loop on a search. It uses PooledAsyncTavilyClient, which keeps
+# connections alive in one shared pool, or a bounded thread pool for sync clients.
+# Every upstream call has a timeout and goes through a concurrency limiter, and
+# several internet_search calls emitted in one step run concurrently.
+#
+# With a ResultBudget, the tool returns only the passages of the pages most relevant to
+# the query (see result_budget.py); the cache keeps the full results. With an ArtifactStore,
+# the full pages are stashed in it first, and each result gets an `artifact` path the agent
+# can open with read_file when the passages are not enough (see artifact_store.py).
+#
+# Usage:
+#   search = CachedSearch(TavilyClient(api_key=...), async_client=PooledAsyncTavilyClient(api_key=...),
+#                         db_path=".search_cache/tavily.sqlite")
+#   internet_search = make_internet_search(search, budget=ResultBudget(max_tokens=2000))
+#   agent = create_deep_agent(tools=[internet_search], ...)
+#   print(search.stats())
+
+
+@dataclass
+class SearchCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    upstream_seconds: float = 0.0
+    seconds_saved: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.coalesced + self.misses
+        return (self.memory_hits + self.disk_hits + self.coalesced) / lookups if lookups else 0.0
+
+
+class PooledAsyncTavilyClient:
+    """Async Tavily client that reuses keep-alive connections from one pool.
+
+    AsyncTavilyClient opens a new session, and so a new TLS connection, for every search.
+
+    Args:
+        api_key: Tavily API key.
+        base_url: Base URL of the Tavily API.
+        timeout: Request timeout in seconds.
+        max_connections: Size of the connection pool.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None,
+        *,
+        base_url: str = "https://api.tavily.com",
+        timeout: float = 60,
+        max_connections: int = 20,
+    ) -> None:
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def search(
+        self,
+        query: str,
+        max_results: int = 5,
+        topic: str = "general",
+        include_raw_content: bool = False,
+        **kwargs: Any,
+    ) -> dict:
+        data = {
+            "query": query,
+            "max_results": max_results,
+            "topic": topic,
+            "include_raw_content": include_raw_content,
+            **kwargs,
+        }
+        try:
+            response = await self.http.post("/search", json=data)
+        except httpx.HTTPError as e:
+            raise TavilyError(f"Request failed: {e}") from e
+        if response.status_code != 200:
+            raise TavilyError(f"Search failed with status {response.status_code}: {response.text}")
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+
+def search_key(query: str, topic: str, max_results: int, include_raw_content: bool) -> str:
+    """Normalized cache key of one search."""
+    normalized = " ".join(query.lower().split())
+    payload = json.dumps([normalized, topic, int(max_results), bool(include_raw_content)])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CachedSearch:
+    """Two-tier, single-flight cache in front of a Tavily-compatible search client.
+
+    Args:
+        client: Any object with a `search(query=..., max_results=..., topic=..., include_raw_content=...)` method.
+        async_client: Same, with an async `search` method. Used by asearch; without it, asearch
+            runs `client.search` on a bounded thread pool.
+        max_entries: Size of the in-memory LRU.
+        ttl_seconds: How long a result stays valid, in memory and on disk.
+        db_path: SQLite file for the on-disk tier. None keeps the cache in memory only.
+        max_concurrency: Maximum number of upstream searches asearch runs at once.
+        timeout_seconds: Timeout of one upstream search made by asearch.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        async_client: Any = None,
+        max_entries: int = 1024,
+        ttl_seconds: float = 24 * 3600,
+        db_path: str | Path | None = None,
+        max_concurrency: int = 8,
+        timeout_seconds: float = 30,
+    ) -> None:
+        if async_client is not None and not inspect.iscoroutinefunction(async_client.search):
+            raise TypeError("async_client.search must be a coroutine function")
+        self.client = client
+        self.async_client = async_client
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        # event loop -> concurrency limiter, since the scripts may run one loop per turn
+        self.limiters: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+        self.executor: ThreadPoolExecutor | None = None
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires at, upstream seconds, result), least recently used first
+        self.memory: OrderedDict[str, tuple[float, float, dict]] = OrderedDict()
+        # key -> future of the upstream call in flight
+        self.in_flight: dict[str, Future] = {}
+        # Detached upstream calls of asearch, referenced until they finish.
+        self.fetches: set[asyncio.Task] = set()
+        self.lock = threading.Lock()
+        self._stats = SearchCacheStats()
+        self.db: sqlite3.Connection | None = None
+        # SQLite calls are serialized on their own lock, so they never hold up memory hits.
+        self.db_lock = threading.Lock()
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache "
+                "(key TEXT PRIMARY KEY, expires_at REAL, upstream_seconds REAL, result TEXT)"
+            )
+            self.db.commit()
+
+    def stats(self) -> SearchCacheStats:
+        """Return a snapshot of the cache counters."""
+        with self.lock:
+            return SearchCacheStats(**vars(self._stats))
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    async def aclose(self) -> None:
+        self.close()
+        if self.async_client is not None and hasattr(self.async_client, "aclose"):
+            await self.async_client.aclose()
+
+    # ---------------------------------------------------------------- tiers
+
+    def _get_memory(self, key: str, now: float) -> tuple[float, float, dict] | None:
+        entry = self.memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self.memory[key]
+            return None
+        self.memory.move_to_end(key)
+        return entry
+
+    def _put_memory(self, key: str, entry: tuple[float, float, dict]) -> None:
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _get_disk(self, key: str, now: float) -> tuple[float, float, dict] | None:
+        if self.db is None:
+            return None
+        row = self.db.execute(
+            "SELECT expires_at, upstream_seconds, result FROM search_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] < now:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def _put_disk(self, key: str, entry: tuple[float, float, dict]) -> None:
+        if self.db is None:
+            return
+        self.db.execute(
+            "INSERT OR REPLACE INTO search_cache (key, expires_at, upstream_seconds, result) VALUES (?, ?, ?, ?)",
+            (key, entry[0], entry[1], json.dumps(entry[2])),
+        )
+        self.db.commit()
+
+    def _lookup(self, key: str) -> tuple[dict | None, Future | None, bool]:
+        """Return (result cached in memory, in-flight future, whether this caller must look further).
+
+        The caller that must look further checks the disk tier, then calls upstream.
+        """
+        now = time.time()
+        with self.lock:
+            # A hit saves the time the original upstream call took.
+            if (entry := self._get_memory(key, now)) is not None:
+                self._stats.memory_hits += 1
+                self._stats.seconds_saved += entry[1]
+                return entry[2], None, False
+            if (future := self.in_flight.get(key)) is not None:
+                self._stats.coalesced += 1
+                return None, future, False
+            future = self.in_flight[key] = Future()
+            return None, future, True
+
+    def _load_disk(self, key: str) -> dict | None:
+        if self.db is None:
+            return None
+        with self.db_lock:
+            entry = self._get_disk(key, time.time())
+        if entry is None:
+            return None
+        with self.lock:
+            self._put_memory(key, entry)
+            self._stats.disk_hits += 1
+            self._stats.seconds_saved += entry[1]
+        return entry[2]
+
+    def _store(self, key: str, result: dict, elapsed: float) -> None:
+        entry = (time.time() + self.ttl_seconds, elapsed, result)
+        with self.lock:
+            self._stats.misses += 1
+            self._stats.upstream_seconds += elapsed
+            self._put_memory(key, entry)
+        if self.db is not None:
+            with self.db_lock:
+                self._put_disk(key, entry)
+
+    async def _off_loop(self, func, *args):
+        """Run a function that touches the disk tier on a worker thread; SQLite blocks."""
+        if self.db is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _finish(self, key: str, future: Future, result: dict | None, error: BaseException | None) -> None:
+        with self.lock:
+            self.in_flight.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    # ---------------------------------------------------------------- search
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 5,
+        topic: str = "general",
+        include_raw_content: bool = False,
+    ) -> dict:
+        """Search through the cache, calling the client only on a miss."""
+        key = search_key(query, topic, max_results, include_raw_content)
+        result, future, leader = self._lookup(key)
+        if result is not None:
+            return result
+        if not leader:
+            return future.result(timeout=self.timeout_seconds)
+
+        try:
+            if (result := self._load_disk(key)) is None:
+                start = time.perf_counter()
+                result = self.client.search(
+                    query=query,
+                    max_results=max_results,
+                    topic=topic,
+                    include_raw_content=include_raw_content,
+                )
+                self._store(key, result, time.perf_counter() - start)
+        except BaseException as e:
+            self._finish(key, future, None, e)
+            raise
+        self._finish(key, future, result, None)
+        return result
+
+    async def asearch(
+        self,
+        query: str,
+        max_results: int = 5,
+        topic: str = "general",
+        include_raw_content: bool = False,
+    ) -> dict:
+        """Async version of search that never blocks the event loop."""
+        key = search_key(query, topic, max_results, include_raw_content)
+        result, future, leader = self._lookup(key)
+        if result is not None:
+            return result
+        if leader:
+            kwargs = {
+                "query": query,
+                "max_results": max_results,
+                "topic": topic,
+                "include_raw_content": include_raw_content,
+            }
+            task = asyncio.create_task(self._fetch(key, future, kwargs))
+            self.fetches.add(task)
+            task.add_done_callback(self.fetches.discard)
+        # Shielded: a caller cancelled by a timeout or a disconnect, the leader included,
+        # must not cancel the upstream call the other callers wait on.
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    async def _fetch(self, key: str, future: Future, kwargs: dict) -> None:
+        """Disk tier, then upstream call of asearch, run as its own task; resolves future."""
+        try:
+            if (result := await self._off_loop(self._load_disk, key)) is None:
+                loop = asyncio.get_running_loop()
+                if (limiter := self.limiters.get(loop)) is None:
+                    limiter = self.limiters[loop] = asyncio.Semaphore(self.max_concurrency)
+                async with limiter:
+                    start = time.perf_counter()
+                    async with asyncio.timeout(self.timeout_seconds):
+                        if self.async_client is not None:
+                            result = await self.async_client.search(**kwargs)
+                        else:
+                            result = await loop.run_in_executor(self._executor(), lambda: self.client.search(**kwargs))
+                    elapsed = time.perf_counter() - start
+                await self._off_loop(self._store, key, result, elapsed)
+        except BaseException as e:
+            self._finish(key, future, None, e)
+            # Errors reach the callers through the future; only cancellation ends the task.
+            if not isinstance(e, Exception):
+                raise
+            return
+        self._finish(key, future, result, None)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="internet_search")
+            return self.executor
+
+
+def make_internet_search(
+    search: CachedSearch, budget: ResultBudget | None = None, artifacts: ArtifactStore | None = None
+) -> StructuredTool:
+    """Build the internet_search tool on top of a CachedSearch.
+
+    The tool runs search() when the agent is invoked synchronously and asearch()
+    under ainvoke/astream, where several calls from one step run concurrently.
+    With a budget, results are trimmed to it before they are returned to the model.
+    With artifacts, raw pages are stored there and replaced by their `artifact` path
+    (or by the budget's passages and the path).
+    """
+
+    def stashed(result: dict) -> dict:
+        results = []
+        for item in result.get("results") or []:
+            if item.get("raw_content"):
+                item = {**item, "artifact": ARTIFACT_DIR + artifacts.put(item["raw_content"])}
+                if budget is None:
+                    item.pop("raw_content")
+            results.append(item)
+        return {**result, "results": results}
+
+    def trimmed(result: dict, query: str) -> dict:
+        if artifacts is not None:
+            result = stashed(result)
+        return result if budget is None else budget.apply(result, query)
+
+    def internet_search(
+        query: str,
+        max_results: int = 5,
+        topic: Literal["general", "news", "finance"] = "general",
+        include_raw_content: bool = False):
+        """Search the internet for information on a given topic"""
+        return trimmed(search.search(
+            query=query,
+            max_results=max_results,
+            topic=topic,
+            include_raw_content=include_raw_content
+        ), query)
+
+    async def ainternet_search(
+        query: str,
+        max_results: int = 5,
+        topic: Literal["general", "news", "finance"] = "general",
+        include_raw_content: bool = False):
+        """Search the internet for information on a given topic"""
+        result = await search.asearch(
+            query=query,
+            max_results=max_results,
+            topic=topic,
+            include_raw_content=include_raw_content
+        )
+        if artifacts is None:
+            return trimmed(result, query)
+        # Raw pages are written to the artifact store (disk or Redis) on a worker thread.
+        return await asyncio.get_running_loop().run_in_executor(None, trimmed, result, query)
+
+    return StructuredTool.from_function(func=internet_search, coroutine=ainternet_search)
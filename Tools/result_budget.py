@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlsplit
+
+
+# Budgeting stage for search results, applied before they reach the model.
+# internet_search with include_raw_content=True returns whole web pages (navigation,
+# cookie banners, footers and all), which inflates prompt tokens and time to first token.
+# ResultBudget passes each Tavily-style result dict through a pipeline of generator stages:
+#   1. dedupe       drops results whose URL or text was already seen in this call;
+#   2. clean        strips boilerplate lines from raw_content (menus, link lists, cookie and
+#                   newsletter banners, copyright lines, lines seen in several results);
+#   3. passages     splits what is left into passages of about passage_words words;
+#   4. select       scores passages against the query with BM25 and keeps the best ones
+#                   within max_tokens for the whole call, in their original order.
+# Tavily's own `content` snippet of each result is always kept. Results are copied, never
+# modified, so cached search results stay intact.
+#
+# Usage:
+#   budget = ResultBudget(max_tokens=2000)
+#   internet_search = make_internet_search(search_cache, budget=budget)
+#   print(budget.stats())
+
+BOILERPLATE = re.compile(
+    r"cookie|subscribe|newsletter|sign (in|up)|log ?in|privacy policy|terms of (use|service)|all rights reserved"
+    r"|©|copyright|skip to (main )?content|share (on|this)|follow us|advertisement|accept all",
+    re.IGNORECASE,
+)
+LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+WORD = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an the is are was were be been do does did can how what which who when where why of in on at to "
+    "for from by with about as and or it its this that these those i you we they".split()
+)
+
+
+@dataclass
+class BudgetStats:
+    calls: int = 0
+    results_in: int = 0
+    duplicates_removed: int = 0
+    boilerplate_lines_removed: int = 0
+    passages_kept: int = 0
+    passages_dropped: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    seconds: float = 0.0
+
+    @property
+    def reduction(self) -> float:
+        return 1 - self.tokens_out / self.tokens_in if self.tokens_in else 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    """About four characters per token, like count_tokens_approximately."""
+    return math.ceil(len(text) / 4)
+
+
+def terms(text: str) -> list[str]:
+    return [word for word in WORD.findall(text.casefold()) if word not in STOP_WORDS]
+
+
+def _url_key(url: str) -> str:
+    parts = urlsplit(url.strip().lower())
+    return parts.netloc.removeprefix("www.") + parts.path.rstrip("/")
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(" ".join(text.casefold().split()).encode()).hexdigest()
+
+
+@dataclass
+class _Passage:
+    result: int
+    order: int
+    text: str
+    tokens: int
+    score: float = 0.0
+
+
+class ResultBudget:
+    """Trims search results to the passages most relevant to the query, within a token budget.
+
+    Args:
+        max_tokens: Token budget of the raw page text of one call, on top of the snippets.
+        passage_words: Target size of a passage.
+        min_line_words: Lines with fewer words are dropped from raw_content as boilerplate,
+            unless they look like a heading or a sentence.
+        k1: BM25 term frequency saturation.
+        b: BM25 length normalization.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 2000,
+        *,
+        passage_words: int = 80,
+        min_line_words: int = 4,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.passage_words = passage_words
+        self.min_line_words = min_line_words
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self._stats = BudgetStats()
+
+    def stats(self) -> BudgetStats:
+        """Return a snapshot of the budget counters."""
+        with self.lock:
+            return BudgetStats(**vars(self._stats))
+
+    # ---------------------------------------------------------------- stages
+
+    def _dedupe(self, results: Iterable[dict], counts: Counter) -> Iterator[dict]:
+        seen: set[str] = set()
+        for result in results:
+            keys = {_url_key(result["url"])} if result.get("url") else set()
+            if text := result.get("raw_content") or result.get("content"):
+                keys.add(_text_key(text))
+            if keys & seen:
+                counts["duplicates_removed"] += 1
+                continue
+            seen |= keys
+            yield result
+
+    def _is_boilerplate(self, line: str) -> bool:
+        text = LINK.sub(r"\1", line).strip(" #*-|>\t")
+        if not text:
+            return True
+        words = len(text.split())
+        if words < 25 and BOILERPLATE.search(text):
+            return True
+        # Menus and link lists: mostly links, or a few words without sentence punctuation.
+        links = LINK.findall(line)
+        if links and sum(len(label) for label in links) > 0.6 * len(text):
+            return True
+        if words >= self.min_line_words or line.lstrip().startswith("#"):
+            return False
+        return not text.endswith((".", "?", "!", ":"))
+
+    def _clean(self, results: list[dict], counts: Counter) -> Iterator[tuple[int, list[str]]]:
+        pages = [(result.get("raw_content") or "").splitlines() for result in results]
+        # A line that appears on several pages is navigation or a footer.
+        repeated = Counter(line.strip() for lines in pages for line in {line.strip() for line in lines if line.strip()})
+        for index, lines in enumerate(pages):
+            kept = []
+            for line in lines:
+                if not line.strip():
+                    kept.append("")
+                elif (repeated[line.strip()] > 1 and len(pages) > 1) or self._is_boilerplate(line):
+                    counts["boilerplate_lines_removed"] += 1
+                else:
+                    kept.append(LINK.sub(r"\1", line).rstrip())
+            yield index, kept
+
+    def _passages(self, cleaned: Iterable[tuple[int, list[str]]]) -> Iterator[_Passage]:
+        for index, lines in cleaned:
+            paragraphs = [" ".join(block.split()) for block in "\n".join(lines).split("\n\n")]
+            buffer: list[str] = []
+            order = 0
+            for paragraph in filter(None, paragraphs):
+                words = paragraph.split()
+                # Long paragraphs are cut into windows; short ones are merged with the next.
+                for start in range(0, len(words), self.passage_words):
+                    buffer.extend(words[start : start + self.passage_words])
+                    if len(buffer) >= self.passage_words // 2:
+                        text = " ".join(buffer)
+                        yield _Passage(index, order, text, estimate_tokens(text))
+                        order += 1
+                        buffer = []
+            if buffer:
+                text = " ".join(buffer)
+                yield _Passage(index, order, text, estimate_tokens(text))
+
+    def _score(self, query: str, passages: list[_Passage]) -> None:
+        """BM25 of each passage, with the passages of this call as the corpus."""
+        query_terms = set(terms(query))
+        if not passages or not query_terms:
+            return
+        frequencies = [Counter(terms(passage.text)) for passage in passages]
+        lengths = [sum(frequency.values()) for frequency in frequencies]
+        average = sum(lengths) / len(lengths) or 1
+        documents = Counter(term for frequency in frequencies for term in query_terms & frequency.keys())
+        idf = {term: math.log(1 + (len(passages) - n + 0.5) / (n + 0.5)) for term, n in documents.items()}
+        for passage, frequency, length in zip(passages, frequencies, lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / average)
+            passage.score = sum(
+                idf[term] * frequency[term] * (self.k1 + 1) / (frequency[term] + norm)
+                for term in idf
+                if term in frequency
+            )
+
+    def _select(self, passages: list[_Passage]) -> list[_Passage]:
+        kept, used = [], 0
+        for passage in sorted(passages, key=lambda p: (-p.score, p.result, p.order)):
+            if used + passage.tokens <= self.max_tokens:
+                kept.append(passage)
+                used += passage.tokens
+        return sorted(kept, key=lambda p: (p.result, p.order))
+
+    # ---------------------------------------------------------------- apply
+
+    def apply(self, result: dict[str, Any], query: str) -> dict[str, Any]:
+        """Return a trimmed copy of a search result dict ({"results": [...], ...})."""
+        start = time.perf_counter()
+        counts: Counter = Counter()
+        results = result.get("results") or []
+        tokens_in = sum(estimate_tokens(r.get("content") or "") + estimate_tokens(r.get("raw_content") or "") for r in results)
+        unique = list(self._dedupe(results, counts))
+        passages = list(self._passages(self._clean(unique, counts)))
+        self._score(query, passages)
+        kept = self._select(passages)
+
+        pages: dict[int, list[str]] = {}
+        for passage in kept:
+            pages.setdefault(passage.result, []).append(passage.text)
+        trimmed = []
+        for index, item in enumerate(unique):
+            item = dict(item)
+            if "raw_content" in item:
+                item["raw_content"] = "\n\n".join(pages.get(index, [])) or None
+            trimmed.append(item)
+        tokens_out = sum(estimate_tokens(r.get("content") or "") + estimate_tokens(r.get("raw_content") or "") for r in trimmed)
+
+        with self.lock:
+            self._stats.calls += 1
+            self._stats.results_in += len(results)
+            self._stats.duplicates_removed += counts["duplicates_removed"]
+            self._stats.boilerplate_lines_removed += counts["boilerplate_lines_removed"]
+            self._stats.passages_kept += len(kept)
+            self._stats.passages_dropped += len(passages) - len(kept)
+            self._stats.tokens_in += tokens_in
+            self._stats.tokens_out += tokens_out
+            self._stats.seconds += time.perf_counter() - start
+        return {**result, "results": trimmed}